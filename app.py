@@ -1,8 +1,8 @@
 import pandas as pd
+import numpy as np
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.metrics.pairwise import cosine_similarity
 from fpdf import FPDF
-import smtplib
 from email.message import EmailMessage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -16,11 +16,28 @@ from PIL import Image
 from datetime import datetime
 import logging
 import concurrent.futures
-from functools import lru_cache
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from googleapiclient.http import MediaIoBaseUpload
+import threading
+import time
 import io
+import tempfile
+import zlib
+from collections import namedtuple
+from data_sources import LocalBackend, SheetsBackend
+from sheet_cache import SnapshotCache
+from pdf_assets import get_asset, registry as pdf_asset_registry
+from profile_snapshot import ProfileSnapshot, normalize_email
+from derived_columns import age_years, gap_mask, height_cm, submitted_at as submitted_at_column
+from schema_registry import registry as schema_registry, resolve_schema
+from profile_layout import get_render_plan, strip_prefer
+from text_layout import multi_cell, wrap_words
+from render_pool import get_render_pool
+from scoring import (
+    explain_match,
+    field_score_cache_stats,
+    get_scoring_plan,
+    score_candidates,
+    select_top_k,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -38,6 +55,31 @@ SERVICE_ACCOUNT_FILE = "service_account2.json"
 SPREADSHEET_ID = "1b58_GtRw0ZQppXawKUjFgSj-4E6dyXzSdijL1Ne1Zv0"
 RANGE_NAME = "'Form Responses 1'!A1:BH1000"
 STATIC_HEADER_IMAGE = "logo.png"  # Using the existing logo.png file
+# A rendered PDF kept in memory: the name it is attached/uploaded under, its bytes
+# and how many profiles it holds. Rendering, mailing and uploads pass these along,
+# so no PDF touches the working directory. The byte counts are described in
+# EnhancedSinglePageMatchesPDF.image and _putpages.
+RenderedPdf = namedtuple(
+    "RenderedPdf",
+    ["filename", "data", "profiles", "image_bytes_deduplicated", "compression_bytes_saved"],
+    defaults=(1, 0, 0),
+)
+
+# Flate-compress page and form streams (FPDF's default; off only for debugging)
+PDF_COMPRESSION = os.getenv("PDF_COMPRESSION", "1").lower() not in ("0", "false", "no")
+
+# How profiles are delivered: "separate" (one PDF per profile) or "combined"
+# (every profile in one bookmarked PDF sharing the logo, chrome and fonts).
+# Jobs can override it per run.
+PDF_OUTPUT_MODE = os.getenv("PDF_OUTPUT_MODE", "separate")
+COMBINED_PDF_FILENAME = "Match_Profiles.pdf"
+
+# Name of the form XObject holding the static page chrome (border, logo, title)
+CHROME_XOBJECT = "Chrome"
+
+# Match photos are downloaded concurrently as soon as the top matches are known
+PHOTO_PREFETCH_WORKERS = int(os.getenv("PHOTO_PREFETCH_WORKERS", "5"))
+PHOTO_PREFETCH_TIMEOUT = 60  # seconds to wait for all of them before rendering
 
 # Target Google Sheet constants for tracking sent emails
 TARGET_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
@@ -49,98 +91,195 @@ TARGET_RANGE_NAME = "Sheet1!A:M"  # Updated to include column M for email text:
 DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive.file"]
 DRIVE_SERVICE_ACCOUNT_FILE = "service_account_target.json"  # Using same service account for Drive
 
-# Cache for Google Sheets data
-_sheets_data_cache = None
-_last_fetch_time = None
-CACHE_DURATION = 300  # 5 minutes
+# Cache for Google Sheets data. The snapshot never expires on a timer; it is
+# refreshed with a delta fetch when a submission it hasn't seen is reported.
+CACHE_DURATION = None
+SOURCE_SHEET_NAME = "'Form Responses 1'"
+SOURCE_LAST_COLUMN = "BH"
+NEW_ROW_RETRY_ATTEMPTS = 3  # The sheet can lag slightly behind the form webhook
+NEW_ROW_RETRY_DELAY = 2  # seconds
+
+# Where responses are read from and results written to: "sheets" (Google Sheets,
+# Drive and Gmail) or "local" (files under LOCAL_DATA_DIR, for offline runs)
+DATA_BACKEND = os.getenv("DATA_BACKEND", "sheets")
+LOCAL_DATA_DIR = os.getenv("LOCAL_DATA_DIR", "local_data")
+# How full sheet reads are downloaded: "values" (Sheets values().get JSON) or
+# "csv" (Drive CSV export parsed by pandas, much faster for large sheets)
+SHEETS_INGESTION_MODE = os.getenv("SHEETS_INGESTION_MODE", "values")
+
+def create_data_backend(kind=DATA_BACKEND):
+    """Build the configured data source/sink"""
+    if kind == "local":
+        logger.info(f"Using local data backend in {LOCAL_DATA_DIR}")
+        return LocalBackend(LOCAL_DATA_DIR, responses_file=os.getenv("LOCAL_RESPONSES_FILE"))
+    return SheetsBackend(
+        service_account_file=SERVICE_ACCOUNT_FILE,
+        scopes=SCOPES,
+        spreadsheet_id=SPREADSHEET_ID,
+        sheet_name=SOURCE_SHEET_NAME,
+        last_column=SOURCE_LAST_COLUMN,
+        range_name=RANGE_NAME,
+        target_service_account_file=TARGET_SERVICE_ACCOUNT_FILE,
+        target_scopes=TARGET_SCOPES,
+        target_spreadsheet_id=TARGET_SPREADSHEET_ID,
+        target_range_name=TARGET_RANGE_NAME,
+        drive_service_account_file=DRIVE_SERVICE_ACCOUNT_FILE,
+        drive_scopes=DRIVE_SCOPES,
+        ingestion_mode=SHEETS_INGESTION_MODE,
+    )
 
-@lru_cache(maxsize=128)
-def convert_height_to_cm(height_value):
-    """Convert height to centimeters with caching"""
-    if not height_value or pd.isna(height_value):
-        return None
-    try:
-        height_str = str(height_value).lower()
-        if "'" in height_str or '"' in height_str:
-            feet = 0
-            inches = 0
-            if "'" in height_str:
-                feet = int(height_str.split("'")[0])
-            if '"' in height_str:
-                inches = int(height_str.split('"')[0].split("'")[-1])
-            return (feet * 30.48) + (inches * 2.54)
-        return float(height_str)
-    except:
-        return None
+data_backend = create_data_backend()
 
-def fetch_data_from_google_sheets():
-    """Fetch data from Google Sheets with caching"""
-    global _sheets_data_cache, _last_fetch_time
-    
-    current_time = datetime.now().timestamp()
-    
-    # Return cached data if it's still valid
-    if _sheets_data_cache is not None and _last_fetch_time is not None:
-        if current_time - _last_fetch_time < CACHE_DURATION:
-            logger.info("Using cached Google Sheets data")
-            return _sheets_data_cache
-    
+# Decode the logo and other static PDF art once, shared by every document
+pdf_asset_registry.preload((STATIC_HEADER_IMAGE,))
+
+def _download_sheet_data():
+    """Download the form responses from Google Sheets (uncached)"""
     try:
-        logger.info(f"Attempting to fetch data from Google Sheets using service account: {SERVICE_ACCOUNT_FILE}")
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES
-        )
-        logger.info("Successfully created credentials")
-        
-        service = build("sheets", "v4", credentials=credentials)
-        sheet = service.spreadsheets()
-        logger.info(f"Fetching data from spreadsheet ID: {SPREADSHEET_ID}")
+        logger.info(f"Attempting to fetch data using the {data_backend.name} backend")
+        started = time.monotonic()
+        df = data_backend.read_responses_frame()
         
-        result = sheet.values().get(spreadsheetId=SPREADSHEET_ID, range=RANGE_NAME).execute()
-        values = result.get("values", [])
-        
-        if not values:
+        if df is None or len(df.columns) == 0:
             logger.error("No data found in Google Sheets")
             return None
+        logger.info(f"Downloaded and parsed {len(df)} rows in {time.monotonic() - started:.2f}s")
             
-        # Convert to DataFrame
-        df = pd.DataFrame(values[1:], columns=values[0])
-        logger.info(f"Successfully retrieved {len(df)} rows from Google Sheets")
-        
-        # Update cache
-        _sheets_data_cache = df
-        _last_fetch_time = current_time
-        
-        return df
+        # Clean and compact once for every job that reads this snapshot
+        snapshot = ProfileSnapshot(df, fields=get_scoring_plan().fields)
+        schema_registry.observe(snapshot.source_columns)
+        logger.info(f"Successfully retrieved {len(snapshot)} rows from Google Sheets")
+        logger.info(f"Profile table memory: {snapshot.memory_report()}")
+        return snapshot
     except Exception as e:
         logger.error(f"Error fetching data from Google Sheets: {str(e)}", exc_info=True)
         return None
 
+def _download_new_rows(previous, expect_new_rows=False):
+    """Append only the rows added since `previous` was fetched (delta refresh)"""
+    if previous is None:
+        return _download_sheet_data()
+    
+    try:
+        # Row 1 is the header, so existing data ends at row len(previous) + 1
+        values = []
+        for attempt in range(NEW_ROW_RETRY_ATTEMPTS if expect_new_rows else 1):
+            if attempt:
+                time.sleep(NEW_ROW_RETRY_DELAY)
+            values = data_backend.read_responses_from(len(previous) + 2)
+            if values:
+                break
+        
+        if not values:
+            logger.info("Delta refresh found no new rows in Google Sheets")
+            return previous
+        
+        # The API drops trailing empty cells, so pad each row to the header width
+        width = len(previous.source_columns)
+        rows = [(row + [None] * width)[:width] for row in values]
+        snapshot = previous.append_rows(pd.DataFrame(rows, columns=previous.source_columns))
+        logger.info(f"Delta refresh appended {len(rows)} new rows ({len(snapshot)} total)")
+        return snapshot
+    except Exception as e:
+        logger.error(f"Delta refresh failed, falling back to a full fetch: {e}")
+        return _download_sheet_data()
+
+# Single-flight cache shared by the webhook, periodic check and manual trigger threads
+_sheets_cache = SnapshotCache(_download_sheet_data, ttl=CACHE_DURATION, name="Google Sheets")
+
+def _covering_current_plan(snapshot):
+    """Reload the snapshot in full if a reloaded scoring plan needs a column it dropped"""
+    if snapshot is not None and not snapshot.covers_fields(get_scoring_plan().fields):
+        logger.info("Scoring plan needs columns missing from the profile table; reloading")
+        snapshot = _sheets_cache.get(force_refresh=True, loader=_download_sheet_data)
+    return snapshot
+
+def fetch_snapshot(force_refresh=False, allow_stale=False):
+    """Fetch the cached ProfileSnapshot of the form responses"""
+    return _covering_current_plan(_sheets_cache.get(force_refresh=force_refresh, allow_stale=allow_stale))
+
+def fetch_data_from_google_sheets(force_refresh=False, allow_stale=False):
+    """Fetch data from Google Sheets with caching (shared frame, treat as read-only)"""
+    snapshot = fetch_snapshot(force_refresh=force_refresh, allow_stale=allow_stale)
+    return snapshot.frame if snapshot is not None else None
+
+def sheets_cache_stats():
+    """Hit/miss/refresh-latency counters for the Google Sheets cache"""
+    stats = _sheets_cache.stats()
+    snapshot = _sheets_cache.peek()
+    stats["rows"] = len(snapshot) if snapshot is not None else None
+    stats["version"] = snapshot.version if snapshot is not None else None
+    stats["memory"] = snapshot.memory_report() if snapshot is not None else None
+    return stats
+
+def _find_submission_row(snapshot, email, submitted_at):
+    """Row position of the response from `email` submitted at `submitted_at` (to the second), or None"""
+    email_col = next((col for col in snapshot.columns if "email" in col.lower()), None)
+    target = pd.Timestamp(submitted_at)
+    if email_col is None or pd.isna(target):
+        return None
+    times = snapshot.derived("submitted_at", submitted_at_column)
+    same_time = np.flatnonzero(times == np.datetime64(target.floor("s").tz_localize(None), "ns"))
+    key = normalize_email(email)
+    # Newest first: a resubmission in the same second is the later row
+    for position in same_time[::-1]:
+        if normalize_email(snapshot.frame[email_col].iat[position]) == key:
+            return int(position)
+    return None
+
+def fetch_data_for_submission(response_id=None, submission_count=None, email=None, submitted_at=None):
+    """
+    Return (ProfileSnapshot, row position of the submission), or None if the
+    submission's row isn't in the sheet yet (or the fetch failed).
+    
+    A webhook submission is found by its respondent's email and submission
+    time (in the sheet's time zone), first in the cached snapshot and then
+    after fetching new rows; its position alone is never trusted, as deleted
+    responses, manual sheet edits and webhooks arriving out of order all
+    shift rows. submission_count, the periodic check's count of sheet rows,
+    selects row submission_count - 1. With neither, the newest row is used.
+    """
+    if response_id and not (email and submitted_at):
+        logger.warning(f"Submission {response_id} has no email and submission time to find its row by; "
+                       f"leaving it to the periodic check")
+        return None
+    
+    previous = _covering_current_plan(_sheets_cache.peek())
+    if previous is not None:
+        if email:
+            position = _find_submission_row(previous, email, submitted_at)
+            if position is not None:
+                return previous, position
+        elif submission_count and submission_count <= len(previous):
+            return previous, submission_count - 1
+    
+    snapshot = _sheets_cache.get(
+        force_refresh=True,
+        loader=lambda: _download_new_rows(_sheets_cache.peek(), expect_new_rows=bool(email or submission_count)),
+    )
+    snapshot = _covering_current_plan(snapshot)
+    if snapshot is None or snapshot.frame.empty:
+        return None
+    
+    if email:
+        position = _find_submission_row(snapshot, email, submitted_at)
+    elif submission_count:
+        position = submission_count - 1 if submission_count <= len(snapshot) else None
+    else:
+        position = len(snapshot) - 1
+    if position is None:
+        logger.warning(f"Submission {response_id or email or submission_count} is not in Google Sheets yet "
+                       f"({len(snapshot)} rows); not processing it")
+        return None
+    return snapshot, position
+
 def test_target_sheet_connection():
     """Test the connection to the target Google Sheet and verify its structure"""
     try:
         logger.info("Testing target Google Sheet connection...")
         
-        # Check if target service account file exists
-        if not os.path.exists(TARGET_SERVICE_ACCOUNT_FILE):
-            logger.error(f"Target service account file not found: {TARGET_SERVICE_ACCOUNT_FILE}")
-            return False
-        
-        # Create credentials for target sheet
-        credentials = service_account.Credentials.from_service_account_file(
-            TARGET_SERVICE_ACCOUNT_FILE, scopes=TARGET_SCOPES
-        )
-        
-        service = build("sheets", "v4", credentials=credentials)
-        sheet = service.spreadsheets()
-        
         # Try to read the target sheet
-        result = sheet.values().get(
-            spreadsheetId=TARGET_SPREADSHEET_ID, 
-            range=TARGET_RANGE_NAME
-        ).execute()
-        
-        values = result.get("values", [])
+        values = data_backend.read_target_rows()
         
         if not values:
             logger.warning("Target sheet appears to be empty")
@@ -221,6 +360,9 @@ def extract_compatibility_text_from_email(email_message):
         logger.error(f"Error extracting compatibility text from email: {str(e)}")
         return ""
 
+# Serializes Sr No assignment between concurrent deliveries in this process
+_target_sheet_lock = threading.Lock()
+
 def write_name_to_target_sheet(user_name, whatsapp_number=None, email_address=None, birth_date=None, location=None, pdf_url=None, top_match_urls=None, email_text=None):
     """Write the user name, WhatsApp number, email, birth date, location, PDF URL, top 5 match PDF URLs, and email text to the target Google Sheet with auto-incrementing Sr No"""
     try:
@@ -251,65 +393,40 @@ def write_name_to_target_sheet(user_name, whatsapp_number=None, email_address=No
         
         logger.info(f"Writing name '{user_name}', WhatsApp '{whatsapp_number}', email '{email_address}', birth date '{birth_date}', location '{location}', PDF URL '{pdf_url}', top match URLs, and email text to target Google Sheet")
         
-        # Check if target service account file exists
-        if not os.path.exists(TARGET_SERVICE_ACCOUNT_FILE):
-            logger.error(f"Target service account file not found: {TARGET_SERVICE_ACCOUNT_FILE}")
-            return False
-        
-        # Create credentials for target sheet
-        credentials = service_account.Credentials.from_service_account_file(
-            TARGET_SERVICE_ACCOUNT_FILE, scopes=TARGET_SCOPES
-        )
-        
-        service = build("sheets", "v4", credentials=credentials)
-        sheet = service.spreadsheets()
-        
-        # First, get the current data to determine the next Sr No
-        try:
-            result = sheet.values().get(
-                spreadsheetId=TARGET_SPREADSHEET_ID, 
-                range=TARGET_RANGE_NAME
-            ).execute()
-            
-            values = result.get("values", [])
-        except Exception as e:
-            logger.error(f"Error reading target sheet: {e}")
-            return False
-        
-        # Calculate next Sr No (assuming first column is Sr No)
-        next_sr_no = 1
-        if values and len(values) > 1:  # If there are existing rows (excluding header)
+        # Reading the highest Sr No and appending the next one must not interleave
+        # with another thread's write, or both would get the same Sr No
+        with _target_sheet_lock:
+            # First, get the current data to determine the next Sr No
             try:
-                # Find the highest Sr No in the first column
-                sr_nos = []
-                for row in values[1:]:  # Skip header row
-                    if row and len(row) > 0:
-                        try:
-                            sr_nos.append(int(row[0]))
-                        except (ValueError, IndexError):
-                            continue
-                
-                if sr_nos:
-                    next_sr_no = max(sr_nos) + 1
+                values = data_backend.read_target_rows()
             except Exception as e:
-                logger.warning(f"Error calculating next Sr No, using 1: {e}")
-                next_sr_no = 1
-        
-        # Prepare the new row data: Sr No, Name, WhatsApp Number, Email, Birth Date, Location, PDF URL, Top1 URL, Top2 URL, Top3 URL, Top4 URL, Top5 URL, Email Text
-        new_row = [next_sr_no, user_name, whatsapp_number, email_address, birth_date, location, pdf_url] + top_match_urls + [email_text]
+                logger.error(f"Error reading target sheet: {e}")
+                return False
+        
+            # Calculate next Sr No (assuming first column is Sr No)
+            next_sr_no = 1
+            if values and len(values) > 1:  # If there are existing rows (excluding header)
+                try:
+                    # Find the highest Sr No in the first column
+                    sr_nos = []
+                    for row in values[1:]:  # Skip header row
+                        if row and len(row) > 0:
+                            try:
+                                sr_nos.append(int(row[0]))
+                            except (ValueError, IndexError):
+                                continue
+                
+                    if sr_nos:
+                        next_sr_no = max(sr_nos) + 1
+                except Exception as e:
+                    logger.warning(f"Error calculating next Sr No, using 1: {e}")
+                    next_sr_no = 1
         
-        # Append the new row to the sheet
-        body = {
-            'values': [new_row]
-        }
+            # Prepare the new row data: Sr No, Name, WhatsApp Number, Email, Birth Date, Location, PDF URL, Top1 URL, Top2 URL, Top3 URL, Top4 URL, Top5 URL, Email Text
+            new_row = [next_sr_no, user_name, whatsapp_number, email_address, birth_date, location, pdf_url] + top_match_urls + [email_text]
         
-        result = sheet.values().append(
-            spreadsheetId=TARGET_SPREADSHEET_ID,
-            range=TARGET_RANGE_NAME,
-            valueInputOption='RAW',
-            insertDataOption='INSERT_ROWS',
-            body=body
-        ).execute()
+            # Append the new row to the sheet
+            data_backend.append_target_row(new_row)
         
         logger.info(f"Successfully added name '{user_name}' with Sr No {next_sr_no}, WhatsApp '{whatsapp_number}', email '{email_address}', birth date '{birth_date}', location '{location}', PDF URL '{pdf_url}', top match URLs, and email text to target sheet")
         return True
@@ -318,208 +435,64 @@ def write_name_to_target_sheet(user_name, whatsapp_number=None, email_address=No
         logger.error(f"Error writing to target Google Sheet: {str(e)}", exc_info=True)
         return False
 
-def process_category_matches(new_user, potential_match, category_info=None):
-    """
-    Process matches for three main categories with accurate percentage calculations:
-    1. Personal, Professional & Family (40%)
-    2. Favorites, Likes & Hobbies (35%)
-    3. Others (25%)
+def _lowercase_gender(df):
+    # astype(object) first: fillna("") would fail on a categorical without "" as a category
+    return df["Gender"].astype(object).fillna("").astype(str).str.lower()
+
+def _female_mask(df):
+    return _lowercase_gender(df).str.contains("female", na=False).to_numpy()
+
+def _male_mask(df):
+    gender = _lowercase_gender(df)
+    return (gender.str.contains("male", na=False) & ~gender.str.contains("female", na=False)).to_numpy()
+
+def _gap_filters(snapshot, target_position, plan):
+    """Rows within the plan's age and height gaps of the target (typed columns, no string parsing)"""
+    mask = np.ones(len(snapshot), dtype=bool)
+    if plan.max_age_gap_years is not None:
+        mask &= gap_mask(snapshot.derived("age_years", age_years), target_position, plan.max_age_gap_years)
+    if plan.max_height_gap_cm is not None:
+        mask &= gap_mask(snapshot.derived("height_cm", height_cm), target_position, plan.max_height_gap_cm)
+    return mask
+
+def process_matrimonial_data(df, target_position=None, photo_downloads=None):
     """
-    # Define exact columns for each category from the Google Sheet
-    personal_fields = [
-        'Requirements & Preferences [Own business]',
-        'Requirements & Preferences [Own house]',
-        'Requirements & Preferences [Non-resident national]',
-        'Requirements & Preferences [Staying alone]',
-        'Requirements & Preferences [Financially independent]'
-    ]
-    
-    professional_fields = [
-        'Requirements & Preferences [Higher studies]',
-        'Requirements & Preferences [Government service]',
-        'Requirements & Preferences [Qualified professional]',
-        'Requirements & Preferences [Highly educated]'
-    ]
-    
-    family_fields = [
-        'Requirements & Preferences [Small family]',
-        'Requirements & Preferences [Joint family]',
-        'Requirements & Preferences [With children]',
-        'Requirements & Preferences [W/o children]'
-    ]
-    
-    # Combine all fields for Personal, Professional & Family category
-    ppf_fields = personal_fields + professional_fields + family_fields
-    
-    # Favorites, Likes & Hobbies category
-    fav_likes_fields = [
-        'Requirements & Preferences [Hobbies match]',
-        'Requirements & Preferences [Likes]',
-        'Requirements & Preferences [Dislikes]'
-    ]
-    
-    # Others category
-    others_fields = [
-        'Requirements & Preferences [Re-marriage]',
-        'Requirements & Preferences [Metro city]',
-        'Requirements & Preferences [Kundli match]'
-    ]
-    
-    def normalize_value(value):
-        """Normalize string values for better comparison"""
-        if pd.isna(value) or value is None:
-            return ""
-        value = str(value).strip().lower()
-        # Handle common variations
-        value = value.replace("yes", "true").replace("no", "false")
-        value = value.replace("n/a", "").replace("none", "")
-        return value
-    
-    def calculate_field_score(user_val, match_val):
-        """Calculate score for a single field with enhanced matching logic"""
-        user_val = normalize_value(user_val)
-        match_val = normalize_value(match_val)
-        
-        if not user_val or not match_val:
-            return 0.0
-            
-        # Exact match
-        if user_val == match_val:
-            return 1.0
-            
-        # Partial match for hobbies and likes
-        if any(field in user_val for field in ['hobbies', 'likes']):
-            user_items = set(item.strip() for item in user_val.split(','))
-            match_items = set(item.strip() for item in match_val.split(','))
-            common_items = user_items.intersection(match_items)
-            if common_items:
-                return min(1.0, len(common_items) / max(len(user_items), len(match_items)))
-                
-        # Handle boolean values with partial credit
-        if user_val in ['true', 'false'] and match_val in ['true', 'false']:
-            return 1.0 if user_val == match_val else 0.0
-            
-        # Text similarity for other fields
-        if user_val and match_val:
-            # Calculate similarity based on common words
-            user_words = set(user_val.split())
-            match_words = set(match_val.split())
-            common_words = user_words.intersection(match_words)
-            if common_words:
-                return min(1.0, len(common_words) / max(len(user_words), len(match_words)))
-                
-        return 0.0
+    Process matrimonial data with optimized matching
     
-    def calculate_category_score(fields):
-        matches = 0
-        total_fields = 0
-        field_scores = []
-        
-        for field in fields:
-            # Find matching column in both users' data
-            user_col = next((col for col in new_user.columns if field.lower() in col.lower()), None)
-            match_col = next((col for col in potential_match.index if field.lower() in col.lower()), None)
-            
-            if user_col and match_col:
-                user_val = new_user[user_col].values[0]
-                match_val = potential_match[match_col]
-                
-                # Only count if user has specified a preference
-                if user_val and normalize_value(user_val) not in ['', 'false']:
-                    total_fields += 1
-                    field_score = calculate_field_score(user_val, match_val)
-                    field_scores.append(field_score)
-                    matches += field_score
-        
-        # Calculate weighted average if we have fields to compare
-        if total_fields > 0:
-            # Apply importance weights to fields
-            weights = {
-                'Requirements & Preferences [Own house]': 1.2,
-                'Requirements & Preferences [Own business]': 1.2,
-                'Requirements & Preferences [Financially independent]': 1.2,
-                'Requirements & Preferences [Qualified professional]': 1.1,
-                'Requirements & Preferences [Highly educated]': 1.1,
-                'Requirements & Preferences [Hobbies match]': 1.3,
-                'Requirements & Preferences [Likes]': 1.3,
-                'Requirements & Preferences [Kundli match]': 1.2
-            }
-            
-            # Calculate weighted sum with minimum score of 0.1 for any match
-            weighted_sum = sum(max(0.1, score) * weights.get(field, 1.0) for score, field in zip(field_scores, fields))
-            total_weight = sum(weights.get(field, 1.0) for field in fields)
-            
-            # Calculate percentage based on weighted average
-            percentage = (weighted_sum / total_weight * 100) if total_weight > 0 else 0
-            return min(100, max(10, percentage))  # Ensure percentage is between 10 and 100
-            
-        return 10.0  # Minimum score for any category
+    Accepts a ProfileSnapshot (already cleaned, shared read-only) or a raw
+    DataFrame, which is cleaned into a private snapshot first. The input is
+    never modified.
     
-    # Calculate scores for each category with enhanced weighting
-    ppf_score = calculate_category_score(ppf_fields)
-    fav_likes_score = calculate_category_score(fav_likes_fields)
-    others_score = calculate_category_score(others_fields)
+    target_position is the row of the user to match (default: the last row,
+    i.e. the newest registration); every other row is a candidate.
     
-    # Calculate weighted total with category importance
-    weighted_total = (ppf_score * 0.40) + (fav_likes_score * 0.35) + (others_score * 0.25)
-    
-    # Ensure minimum total score of 10%
-    final_score = max(10.0, weighted_total)
-    
-    # Add detailed breakdown for debugging and transparency
-    return {
-        'matches': [],
-        'total_score': final_score,
-        'total_weight': 1.0,
-        'final_percentage': final_score,
-        'category_scores': {
-            'personal_professional_family': {
-                'score': ppf_score,
-                'weight': 0.40,
-                'fields': ppf_fields
-            },
-            'favorites_likes_hobbies': {
-                'score': fav_likes_score,
-                'weight': 0.35,
-                'fields': fav_likes_fields
-            },
-            'others': {
-                'score': others_score,
-                'weight': 0.25,
-                'fields': others_fields
-            }
-        }
-    }
-
-def process_matrimonial_data(df):
-    """Process matrimonial data with optimized matching"""
-    # Clean up column names and trim string whitespace
-    df.columns = df.columns.str.strip()
-    df = df.apply(lambda x: x.map(lambda v: str(v).strip()) if x.dtype == "object" else x)
+    If a photo_downloads dict is given, the top matches' photos start
+    downloading into it as soon as they are picked (see prefetch_profile_photos).
+    """
+    snapshot = df if isinstance(df, ProfileSnapshot) else ProfileSnapshot(df)
+    df = snapshot.frame
+    schema = resolve_schema(df.columns)
     
     # Find email column
-    possible_email_cols = [col for col in df.columns if "email" in col.lower()]
-    if not possible_email_cols:
+    email_col = schema.get("email")
+    if not email_col:
         raise ValueError("No column containing 'email' found.")
-    email_col = possible_email_cols[0]
-    df[email_col] = df[email_col].astype(str).str.strip()
     
     if len(df) < 2:
         logger.error("Not enough data for matching.")
         return None
     
     # Separate new user and existing users
-    new_user = df.iloc[-1:]
-    existing_users = df.iloc[:-1]
-    new_user_email = new_user[email_col].values[0]
+    if target_position is None:
+        target_position = len(df) - 1
+    new_user = df.iloc[target_position:target_position + 1]
+    candidate_mask = np.ones(len(df), dtype=bool)
+    candidate_mask[target_position] = False
+    new_user_email = str(new_user[email_col].values[0]).strip()
     new_user_name = new_user["Full Name"].values[0] if "Full Name" in new_user.columns else "New User"
     
     # Extract WhatsApp number
-    whatsapp_col = None
-    for col in new_user.columns:
-        if "whatsapp" in col.lower() and "number" in col.lower():
-            whatsapp_col = col
-            break
+    whatsapp_col = schema.get("whatsapp")
     
     new_user_whatsapp = ""
     if whatsapp_col:
@@ -528,11 +501,7 @@ def process_matrimonial_data(df):
         logger.warning("WhatsApp number column not found in source data")
     
     # Extract Birth Date
-    birth_date_col = None
-    for col in new_user.columns:
-        if "birth" in col.lower() and "date" in col.lower():
-            birth_date_col = col
-            break
+    birth_date_col = schema.get("birth_date")
     
     new_user_birth_date = ""
     if birth_date_col:
@@ -541,27 +510,9 @@ def process_matrimonial_data(df):
         logger.warning("Birth date column not found in source data")
     
     # Extract Location (City, State, Country)
-    city_col = None
-    state_col = None
-    country_col = None
-    
-    # Find City column
-    for col in new_user.columns:
-        if (col.strip().lower() == "city" or "city" in col.lower()) and "preference" not in col.lower() and "metro" not in col.lower():
-            city_col = col
-            break
-    
-    # Find State column
-    for col in new_user.columns:
-        if col.strip().lower() == "state" or "state" in col.lower():
-            state_col = col
-            break
-    
-    # Find Country column
-    for col in new_user.columns:
-        if col.strip().lower() == "country" or "country" in col.lower():
-            country_col = col
-            break
+    city_col = schema.get("city")
+    state_col = schema.get("state")
+    country_col = schema.get("country")
     
     # Build location string
     location_parts = []
@@ -591,59 +542,46 @@ def process_matrimonial_data(df):
     
     # Filter by gender
     GENDER_COL = "Gender"
-    filtered_users = existing_users
-    if GENDER_COL in new_user.columns and GENDER_COL in existing_users.columns:
+    filtered_mask = None
+    if GENDER_COL in df.columns:
         new_user_gender = str(new_user[GENDER_COL].values[0]).strip().lower()
-        existing_users_gender = existing_users[GENDER_COL].fillna("").astype(str).str.lower()
         
         if "male" in new_user_gender and "female" not in new_user_gender:
-            filtered_users = existing_users[existing_users_gender.str.contains("female", na=False)]
+            filtered_mask = candidate_mask & snapshot.derived("female_mask", _female_mask)
         elif "female" in new_user_gender:
-            filtered_users = existing_users[
-                existing_users_gender.str.contains("male", na=False) & 
-                ~existing_users_gender.str.contains("female", na=False)
-            ]
-    
-    if filtered_users.empty:
-        filtered_users = existing_users
+            filtered_mask = candidate_mask & snapshot.derived("male_mask", _male_mask)
     
-    # Process matches
-    matches = []
-    match_percentages = []
-    match_details_list = []
-    ppf_scores = []
-    fav_likes_scores = []
-    others_scores = []
+    if filtered_mask is None or not filtered_mask.any():
+        filtered_mask = candidate_mask
     
-    for _, potential_match in filtered_users.iterrows():
-        # Process matches using the enhanced category matching
-        match_result = process_category_matches(new_user, potential_match, None)
-        
-        if match_result['total_weight'] > 0:
-            matches.append(potential_match)
-            match_percentages.append(match_result['final_percentage'])
-            match_details_list.append(match_result)
-            # Store category breakdowns for easy access in DataFrame
-            ppf_scores.append(match_result['category_scores']['personal_professional_family']['score'])
-            fav_likes_scores.append(match_result['category_scores']['favorites_likes_hobbies']['score'])
-            others_scores.append(match_result['category_scores']['others']['score'])
+    # Filter by age and height gap, if the scoring plan sets them
+    scoring_plan = get_scoring_plan()
+    in_range = _gap_filters(snapshot, target_position, scoring_plan)
+    if (filtered_mask & in_range).any():
+        filtered_mask = filtered_mask & in_range
+    else:
+        logger.warning("No candidates within the scoring plan's age/height gaps; ignoring them")
+    candidate_rows = np.flatnonzero(filtered_mask)
     
-    # Sort matches by percentage
-    sorted_indices = sorted(range(len(match_percentages)), key=lambda i: match_percentages[i], reverse=True)
-    top_matches = [matches[i] for i in sorted_indices[:5]]
-    top_percentages = [match_percentages[i] for i in sorted_indices[:5]]
-    top_match_details = [match_details_list[i] for i in sorted_indices[:5]]
-    top_ppf_scores = [ppf_scores[i] for i in sorted_indices[:5]]
-    top_fav_likes_scores = [fav_likes_scores[i] for i in sorted_indices[:5]]
-    top_others_scores = [others_scores[i] for i in sorted_indices[:5]]
+    # Score the whole pool with the totals-only pass, then explain just the winners;
+    # only the winners' rows are ever copied out of the snapshot
+    match_percentages = score_candidates(new_user, df, scoring_plan, rows=candidate_rows)
+    top_positions = select_top_k(match_percentages, 5)
+    top_users = df.iloc[candidate_rows[top_positions]]
+    if photo_downloads is not None:
+        # Overlap the downloads with explaining the matches and rendering
+        photo_downloads.update(prefetch_profile_photos(top_users))
+    top_percentages = [float(match_percentages[i]) for i in top_positions]
+    top_match_details = [explain_match(new_user, top_users.iloc[i], scoring_plan) for i in range(len(top_users))]
     
     # Create DataFrame for top matches
-    top_matches_df = pd.DataFrame(top_matches)
+    top_matches_df = top_users.copy()
     top_matches_df['Match Percentage'] = top_percentages
     top_matches_df['Match Details'] = top_match_details
-    top_matches_df['PPF %'] = top_ppf_scores
-    top_matches_df['FavLikes %'] = top_fav_likes_scores
-    top_matches_df['Others %'] = top_others_scores
+    for category in scoring_plan.categories:
+        top_matches_df[category.column] = [d['category_scores'][category.key]['score'] for d in top_match_details]
+    top_matches_df['Scoring Plan Version'] = scoring_plan.version
+    logger.info(f"Field score cache: {field_score_cache_stats()}")
 
     return (
         new_user,
@@ -657,281 +595,22 @@ def process_matrimonial_data(df):
         top_matches_df
     )
 
+def draw_last_response_profile(pdf, new_user, email_col):
+    """Add the registrant's own profile pages to `pdf`"""
+    draw_profile(pdf, new_user, email_col)
+
+
 def create_last_response_pdf(new_user, email_col):
     """Create a PDF for the last response using the same format as match PDFs"""
     try:
         pdf = EnhancedSinglePageMatchesPDF()
-        pdf.add_page()
-
-        # Add vertical space after BIODATA
-        current_y = 50  # Start below enhanced header
-        current_y += 3  # Reduced extra vertical space after BIODATA
-
-        # Add photo to the right side with enhanced styling
-        photo_added = add_enhanced_photo_to_pdf(pdf, new_user, email_col)
-
-        if photo_added:
-            pdf.left_column_width = 110  # Adjust for larger photo
-        else:
-            pdf.left_column_width = 140
-
-        # First Page Sections
-        # Personal Details Section
-        current_y = add_compact_section(pdf, "Personal Details", current_y)
-
-        personal_fields = [
-            ("Name", "Full Name"),
-            ("Birth Date", "Birth Date"),
-            ("Birth Time", "Birth Time"),
-            ("Birth Place", "Birth Place"),
-            ("Height", "Height"),
-            ("Weight", "Weight"),
-            ("Religion", "Religion"),
-            ("Caste / Community", "Caste / Community / Tribe"),
-            ("Mother Tongue", "Mother Tongue"),
-            ("Nationality", "Nationality"),
-        ]
-
-        for display_name, field_name in personal_fields:
-            matching_field = next(
-                (
-                    col
-                    for col in new_user.columns
-                    if field_name.lower() in col.lower()
-                ),
-                None,
-            )
-            if matching_field:
-                current_y = add_compact_field(
-                    pdf,
-                    display_name,
-                    new_user[matching_field].values[0],
-                    current_y,
-                )
-
-        # Professional Details Section
-        current_y += 5
-        current_y = add_compact_section(pdf, "Professional Details", current_y)
-
-        career_fields = [
-            ("Education", "Education"),
-            ("Qualification", "Qualification"),
-            ("Occupation", "Occupation"),
-        ]
-
-        for display_name, field_name in career_fields:
-            matching_field = next(
-                (
-                    col
-                    for col in new_user.columns
-                    if field_name.lower() in col.lower()
-                ),
-                None,
-            )
-            if matching_field:
-                current_y = add_compact_field(
-                    pdf,
-                    display_name,
-                    new_user[matching_field].values[0],
-                    current_y,
-                )
-
-        # Family Information Section
-        family_fields = [col for col in new_user.columns if "Family Information" in col]
-        if family_fields:
-            current_y += 5
-            current_y = add_compact_section(pdf, "Family Info", current_y)
-            current_y += 3
-
-            family_count = 0
-            for field in family_fields:
-                if family_count >= 20 or current_y > 245:
-                    break
-                value = new_user[field].values[0]
-                if pd.notna(value) and str(value).strip().lower() not in ["", "no", "n/a"]:
-                    match = re.search(r"\[(.*?)\]", field)
-                    if match:
-                        label = match.group(1)[:35]
-                        pdf.set_y(current_y)
-                        pdf.set_x(15)
-                        pdf.set_font("Arial", "B", 10)
-                        pdf.set_text_color(50, 50, 50)
-                        pdf.cell(50, 4, f"{label}", border=0)
-                        pdf.set_x(70)
-                        pdf.set_font("Arial", "", 10)
-                        pdf.set_text_color(0, 0, 0)
-                        value_text = str(value)
-                        if len(value_text) > 40:
-                            value_text = value_text[:37] + "..."
-                        pdf.cell(pdf.left_column_width - 70, 4, value_text, border=0)
-                        current_y += 5
-                        family_count += 1
-
-        # Hobbies Section
-        hobbies_col = next(
-            (
-                col
-                for col in new_user.columns
-                if "favorite" in col.lower() or "hobby" in col.lower()
-            ),
-            None,
-        )
-
-        if hobbies_col:
-            current_y += 5
-            current_y = add_compact_section(pdf, "Hobbies & Interests", current_y)
-            current_y += 3
-
-            hobbies = new_user[hobbies_col].values[0]
-            if pd.notna(hobbies) and str(hobbies).strip():
-                pdf.set_y(current_y)
-                pdf.set_x(15)
-                pdf.set_font("Arial", "", 10)
-                pdf.set_text_color(0)
-                hobbies_text = str(hobbies)
-                if len(hobbies_text) > 120:
-                    hobbies_text = hobbies_text[:117] + "..."
-                pdf.cell(pdf.left_column_width - 15, 4, hobbies_text, border=0)
-
-        # Second Page Sections
-        pdf.add_page()
-        current_y = 50
-        current_y += 8  # Add the same spacing as first page after BIODATA
-
-        # Requirements & Preferences Section
-        preference_fields = [col for col in new_user.columns if "Requirements & Preferences" in col]
-        if preference_fields:
-            current_y = add_compact_section(pdf, "Requirements & Preferences", current_y)
-            current_y += 3
-
-            # Prepare Requirement and Preferences lists
-            requirements = []
-            preferences = {}  # Changed to dict to maintain order
-            for field in preference_fields:
-                value = new_user[field].values[0]
-                # Only include if value is not empty, not 'no', not 'n/a', not 'no other preferences'
-                if pd.notna(value) and str(value).strip().lower() not in ["", "no", "n/a", "no other preferences"]:
-                    match = re.search(r"\[(.*?)\]", field)
-                    if match:
-                        label = match.group(1)[:35]
-                        # Remove "Prefer" from the beginning of the label if it exists
-                        label = re.sub(r'^Prefer\s+', '', label, flags=re.IGNORECASE)
-                        requirements.append(label)
-                        # Clean up the preference value
-                        pref_value = str(value).strip()
-                        # Remove "Prefer" from the beginning of the value if it exists
-                        pref_value = re.sub(r'^Prefer\s+', '', pref_value, flags=re.IGNORECASE)
-                        # Only add if not already in preferences (maintains order of first occurrence)
-                        if pref_value not in preferences:
-                            preferences[pref_value] = None
-
-            # Display as two subfields
-            if requirements:
-                pdf.set_y(current_y)
-                pdf.set_x(15)
-                pdf.set_font("Arial", "B", 10)
-                pdf.set_text_color(50, 50, 50)
-                pdf.cell(0, 5, "Requirement:", ln=1, border=0)  # ln=1 moves to next line
-                pdf.set_font("Arial", "", 10)
-                pdf.set_text_color(0, 0, 0)
-                req_text = ", ".join(requirements)
-                pdf.set_x(20)
-                # Add right padding by reducing the width of the multi_cell so text doesn't touch the right edge
-                right_padding = 15  # in mm, adjust as needed
-                cell_width = pdf.w - 20 - right_padding
-                pdf.multi_cell(cell_width, 5, req_text, border=0)
-                current_y = pdf.get_y() + 2
-
-            if preferences:
-                pdf.set_y(current_y)
-                pdf.set_x(15)
-                pdf.set_font("Arial", "B", 10)
-                pdf.set_text_color(50, 50, 50)
-                pdf.cell(0, 5, "Preferences:", ln=1, border=0)  # ln=1 moves to next line
-                pdf.set_font("Arial", "", 10)
-                pdf.set_text_color(0, 0, 0)
-                pref_text = ", ".join(preferences.keys())  # Use keys() to get values in original order
-                pdf.set_x(20)
-                # Add right padding by reducing the width of the multi_cell so text doesn't touch the right edge
-                right_padding = 15  # in mm, adjust as needed
-                cell_width = pdf.w - 20 - right_padding
-                pdf.multi_cell(cell_width, 5, pref_text, border=0)
-                current_y = pdf.get_y() + 2
-
-        # Location Section
-        current_y += 5
-        current_y = add_compact_section(pdf, "Location", current_y)
-
-        # Get the city value directly from the City column - improved search
-        city_col = None
-        # First try exact match for "City"
-        if "City" in new_user.columns:
-            city_col = "City"
-        # Then try case-insensitive search with stripped spaces (but avoid preference fields)
-        elif any(col.strip().lower() == "city" and "preference" not in col.lower() for col in new_user.columns):
-            city_col = next(col for col in new_user.columns if col.strip().lower() == "city" and "preference" not in col.lower())
-        # Finally try partial match (but avoid preference fields)
-        elif any("city" in col.lower() and "preference" not in col.lower() and "metro" not in col.lower() for col in new_user.columns):
-            city_col = next(col for col in new_user.columns if "city" in col.lower() and "preference" not in col.lower() and "metro" not in col.lower())
-        
-        if city_col:
-            city_value = new_user[city_col].values[0] if pd.notna(new_user[city_col].values[0]) else ""
-            logger.info(f"DEBUG: Raw city value from column '{city_col}': '{city_value}'")
-            if pd.notna(city_value) and str(city_value).strip():
-                # Clean up the city value
-                city_value = str(city_value).strip()
-                logger.info(f"DEBUG: After strip city value: '{city_value}'")
-                # Remove any prefixes like "City:" or "Prefer"
-                city_value = re.sub(r'^(City:|Prefer)\s*', '', city_value, flags=re.IGNORECASE)
-                logger.info(f"DEBUG: After regex cleanup city value: '{city_value}'")
-                # Don't truncate city names - use the full cleaned value
-                if city_value:
-                    current_y = add_compact_field(pdf, "City", city_value, current_y)
-                    logger.info(f"DEBUG: Added city field to PDF: '{city_value}'")
-        else:
-            logger.warning(f"DEBUG: No city column found in data. Available columns: {list(new_user.columns)}")
-
-        # Handle other location fields
-        location_fields = [("State", "State"), ("Country", "Country")]
-        for display_name, field_name in location_fields:
-            matching_field = next(
-                (
-                    col
-                    for col in new_user.columns
-                    if field_name.lower() in col.lower()
-                ),
-                None,
-            )
-            if matching_field:
-                value = new_user[matching_field].values[0]
-                if pd.notna(value) and str(value).strip():
-                    value = str(value).strip()
-                    current_y = add_compact_field(
-                        pdf,
-                        display_name,
-                        value,
-                        current_y,
-                    )
-
-        # Contact Information (Email only)
-        current_y += 10
-        current_y = add_compact_section(pdf, "Contact Info", current_y)
-        pdf.set_y(current_y)
-        pdf.set_x(15)
-        pdf.set_font("Arial", "B", 10)
-        pdf.set_text_color(50, 50, 50)
-        pdf.cell(30, 4, "Email", border=0)
-        pdf.set_x(50)
-        pdf.set_font("Arial", "", 10)
-        pdf.set_text_color(0, 0, 0)
-        email_value = new_user[email_col].values[0]
-        pdf.cell(pdf.left_column_width - 50, 4, email_value, border=0)
+        draw_last_response_profile(pdf, new_user, email_col)
 
-        # Save the PDF
+        # Render the PDF once, in memory
         output_filename = "Last_Response_Profile.pdf"
-        pdf.output(output_filename)
-        logger.info(f"Created last response PDF: {output_filename}")
-        return output_filename
+        pdf_bytes = pdf.output(dest="S").encode("latin-1")
+        logger.info(f"Created last response PDF: {output_filename} ({len(pdf_bytes)} bytes)")
+        return RenderedPdf(output_filename, pdf_bytes, 1, pdf.image_bytes_deduplicated, pdf.compression_bytes_saved)
 
     except Exception as e:
         logger.error(f"Failed to create last response PDF: {e}")
@@ -968,27 +647,21 @@ def send_admin_last_response_and_matches(new_user, new_user_name, new_user_email
         msg.attach(MIMEText(body, "plain"))
 
         # Attach PDFs
-        for pdf_file in pdf_files:
-            if os.path.exists(pdf_file):
-                with open(pdf_file, "rb") as f:
-                    part = MIMEBase("application", "octet-stream")
-                    part.set_payload(f.read())
-                    encoders.encode_base64(part)
-                    part.add_header(
-                        "Content-Disposition",
-                        f'attachment; filename="{os.path.basename(pdf_file)}"',
-                    )
-                    msg.attach(part)
+        for pdf in pdf_files:
+            if pdf and pdf.data:
+                part = MIMEBase("application", "octet-stream")
+                part.set_payload(pdf.data)
+                encoders.encode_base64(part)
+                part.add_header(
+                    "Content-Disposition",
+                    f'attachment; filename="{pdf.filename}"',
+                )
+                msg.attach(part)
             else:
-                logger.warning(f"PDF file not found: {pdf_file}")
+                logger.warning(f"PDF has no content: {pdf}")
 
         # Send email
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(
-                os.getenv("SENDER_EMAIL"), os.getenv("SENDER_PASSWORD")
-            )
-            server.send_message(msg)
+        data_backend.send_email(msg, os.getenv("SENDER_EMAIL"), os.getenv("SENDER_PASSWORD"))
 
         logger.info(f"Successfully sent last response and matches to admin: {admin_email}")
         return True
@@ -997,136 +670,6 @@ def send_admin_last_response_and_matches(new_user, new_user_name, new_user_email
         logger.error(f"Error sending admin notification: {str(e)}", exc_info=True)
         return False
 
-def process_new_matrimonial_registration():
-    """Main function to process a new matrimonial registration"""
-    try:
-        # Step 1: Fetch data from Google Sheets
-        logger.info("Starting matrimonial matching process...")
-        df = fetch_data_from_google_sheets()
-
-        if df is None or df.empty:
-            logger.error("No data retrieved from Google Sheets")
-            return False
-
-        logger.info(f"Retrieved {len(df)} records from Google Sheets")
-        logger.info(f"Columns in dataset: {df.columns.tolist()}")
-
-        # Step 2: Process the data and find matches
-        logger.info("Processing matrimonial data...")
-        result = process_matrimonial_data(df)
-
-        if not result or len(result) < 6:
-            logger.error("Failed to process matrimonial data or insufficient results")
-            return False
-
-        (
-            new_user,
-            new_user_name,
-            new_user_email,
-            new_user_whatsapp,
-            new_user_birth_date,
-            new_user_location,
-            top_matches_df,
-            top_percentages,
-            top_matches_df
-        ) = result
-
-        logger.info(f"Found matches for user: {new_user_name} ({new_user_email})")
-        logger.info(f"Number of matches found: {len(top_matches_df)}")
-
-        if top_matches_df is None or len(top_matches_df) == 0:
-            logger.warning(f"No matches found for {new_user_name}")
-            return True
-
-        # Step 3: Log the match results
-        log_match_results(new_user_name, new_user_email, top_matches_df)
-
-        # Step 4: Find email column
-        possible_email_cols = [col for col in df.columns if "email" in col.lower()]
-        email_col = possible_email_cols[0] if possible_email_cols else "Email"
-        logger.info(f"Using email column: {email_col}")
-
-        # Step 5: Create last response PDF first
-        logger.info("Creating last response PDF...")
-        last_response_pdf = create_last_response_pdf(new_user, email_col)
-        if not last_response_pdf:
-            logger.error("Failed to create last response PDF")
-            return False
-        logger.info("Successfully created last response PDF")
-
-        # Step 6: Create individual PDFs for each match
-        logger.info("Creating individual PDF profiles...")
-        pdf_files = create_individual_match_pdfs(
-            top_matches_df, top_percentages, new_user_name, email_col
-        )
-
-        if not pdf_files:
-            logger.error("Failed to create any PDF files")
-            return False
-
-        # Add last response PDF to the list of files to send
-        pdf_files.append(last_response_pdf)
-        logger.info(f"Successfully created {len(pdf_files)} PDF files (including last response)")
-
-        # Step 7: Create personalized email message
-        logger.info("Creating email message...")
-        email_message = create_email_message(new_user_name, top_matches_df)
-        logger.info("Email message created successfully")
-
-        # Step 8: Send email with PDF attachments to user
-        logger.info(f"Sending email to {new_user_email}...")
-        email_sent = send_email_with_multiple_pdfs(
-            new_user_email, email_message, pdf_files, new_user_name, new_user_whatsapp, new_user_email, new_user_birth_date, new_user_location
-        )
-
-        if email_sent:
-            logger.info(
-                f"Successfully sent email with {len(pdf_files)} PDF attachments to {new_user_email}"
-            )
-
-            # Step 9: Send copy to admin
-            logger.info("Sending copy of user email to admin...")
-            admin_copy_sent = send_admin_copy_of_user_email(
-                new_user_name, new_user_email, email_message, pdf_files
-            )
-
-            if admin_copy_sent:
-                logger.info("Successfully sent admin copy of user email")
-            else:
-                logger.warning(
-                    "Failed to send admin copy, but user email was successful"
-                )
-
-            # Step 10: Send last response and matches to admin
-            if pdf_files:
-                admin_notification_sent = send_admin_last_response_and_matches(
-                    new_user,
-                    new_user_name,
-                    new_user_email,
-                    pdf_files
-                )
-                
-                if admin_notification_sent:
-                    logger.info("Successfully sent last response and matches to admin")
-                else:
-                    logger.warning("Failed to send last response and matches to admin")
-
-        else:
-            logger.error(f"Failed to send email to {new_user_email}")
-
-        # Step 11: Clean up temporary files
-        logger.info("Cleaning up temporary PDF files...")
-        cleanup_pdf_files(pdf_files)
-
-        return email_sent
-
-    except Exception as e:
-        logger.error(
-            f"Critical error in matrimonial processing: {str(e)}", exc_info=True
-        )
-        return False
-
-
 def extract_drive_id(link):
     if not link or not isinstance(link, str) or "drive.google.com" not in link:
         return None
@@ -1235,9 +778,65 @@ def download_drive_image(drive_link, save_filename="temp_image.jpg"):
         return None
 
 
+_photo_prefetch_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=PHOTO_PREFETCH_WORKERS, thread_name_prefix="photo-prefetch"
+)
+# Photos fetched ahead of the render running in this thread, by Drive file id
+_render_context = threading.local()
+
+
+def _fetch_photo_bytes(drive_link):
+    fd, path = tempfile.mkstemp(prefix="prefetch_", suffix="_photo.jpg")
+    os.close(fd)
+    try:
+        if download_drive_image(drive_link, save_filename=path):
+            with open(path, "rb") as f:
+                return f.read()
+        return None
+    finally:
+        os.remove(path)
+
+
+def prefetch_profile_photos(top_matches_df):
+    """
+    Start downloading the top matches' photos concurrently; returns
+    {drive_id: future of the image bytes (None if the download failed)}.
+    """
+    photo_col = resolve_schema(top_matches_df.columns).get("photo")
+    if not photo_col:
+        return {}
+    downloads = {}
+    for link in top_matches_df[photo_col].head(5):
+        file_id = extract_drive_id(link)
+        if file_id and file_id not in downloads:
+            downloads[file_id] = _photo_prefetch_pool.submit(_fetch_photo_bytes, link)
+    logger.info(f"Prefetching {len(downloads)} match photos")
+    return downloads
+
+
+def collect_prefetched_photos(downloads, timeout=PHOTO_PREFETCH_TIMEOUT):
+    """Wait for prefetched photos; returns {drive_id: image bytes} for those that arrived"""
+    deadline = time.monotonic() + timeout
+    photos = {}
+    for file_id, future in downloads.items():
+        try:
+            data = future.result(timeout=max(0, deadline - time.monotonic()))
+        except Exception as e:
+            logger.warning(f"Photo prefetch for {file_id} did not finish: {e or type(e).__name__}")
+            continue
+        if data:
+            photos[file_id] = data
+    return photos
+
+
 class EnhancedSinglePageMatchesPDF(FPDF):
+    # Border operators per page geometry; they use no resources, so every
+    # document in the process can reuse them
+    _border_ops = {}
+
     def __init__(self):
         super().__init__()
+        self.set_compression(PDF_COMPRESSION)
         self.set_auto_page_break(auto=False)  # Disable auto page break for single page
         self.left_column_width = 120  # Width for text content
         self.right_column_x = 140  # X position for photo
@@ -1254,6 +853,21 @@ class EnhancedSinglePageMatchesPDF(FPDF):
         self.light_blue = (173, 216, 235)  # Light blue
         self.cream_color = (255, 253, 240)  # Cream
 
+        # Page chrome, drawn once per document into a form XObject
+        self._chrome_ops = None
+        self._chrome_state = None
+        self._chrome_n = None
+
+        # (title, page) outline entries shown as bookmarks by PDF viewers
+        self._outlines = []
+        self._outlines_n = None
+
+        # Output size accounting, see image() and _putpages()
+        self._stream_bytes = 0
+        self.compression_bytes_saved = 0
+        self.image_bytes_deduplicated = 0
+        self._drawn_images = set()
+
     def add_corner_flourish(self, x, y, size, position):
         """Add decorative flourish elements at corners"""
         try:
@@ -1634,30 +1248,160 @@ class EnhancedSinglePageMatchesPDF(FPDF):
             dash_string = "[] 0 d"
         self._out(dash_string)
 
+    # Tracked FPDF state as drawing the chrome leaves it; the fill color is untouched
+    CHROME_STATE = (
+        "line_width", "draw_color", "text_color", "font_family", "font_style",
+        "underline", "font_size_pt", "font_size", "current_font", "x", "y",
+    )
+
+    def _capture(self, draw):
+        """Run draw() and return the operators it wrote, removing them from the page"""
+        mark = len(self.pages[self.page])
+        draw()
+        ops = self.pages[self.page][mark:]
+        self.pages[self.page] = self.pages[self.page][:mark]
+        return ops
+
+    def _draw_border(self):
+        key = (self.w, self.h, self.k)
+        cached = self._border_ops.get(key)
+        if cached is None:
+            ops = self._capture(self.add_decorative_border)
+            cached = self._border_ops[key] = (ops, self.draw_color, self.line_width)
+        ops, self.draw_color, self.line_width = cached
+        self.pages[self.page] += ops
+
+    def _capture_chrome(self):
+        fill_color = self.fill_color
+        # Start from a known state so the chrome doesn't depend on the page it is first drawn on
+        self.font_family = ""
+        self._chrome_ops = self._capture(self._draw_chrome_with_white_fill)
+        self._chrome_state = {name: getattr(self, name) for name in self.CHROME_STATE}
+        self.fill_color = fill_color
+
+    def _draw_chrome_with_white_fill(self):
+        # A fill differing from the title color makes cell() emit the text color itself
+        self.set_fill_color(255, 255, 255)
+        self.draw_page_chrome()
+
     def header(self):
+        if self._chrome_ops is None:
+            self._capture_chrome()
+
+        # Stamp the shared chrome, then re-emit the state drawing it would have left behind
+        self._out(f"q /{CHROME_XOBJECT} Do Q")
+        for name, value in self._chrome_state.items():
+            setattr(self, name, value)
+        self.color_flag = self.fill_color != self.text_color
+        self._out("%.2f w" % (self.line_width * self.k))
+        self._out(self.draw_color)
+        self._out(self.fill_color)
+        if self.font_family:
+            self._out("BT /F%d %.2f Tf ET" % (self.current_font["i"], self.font_size_pt))
+
+    def image(self, name, *args, **kwargs):
+        # FPDF itself reuses an image drawn again under the same file name (the
+        # logo); only photos keyed by content share an object they wouldn't have.
+        # PdfAsset.place registers the image before drawing it, so count draws.
+        if name in self._drawn_images and name.startswith("sha1:"):
+            info = self.images[name]
+            self.image_bytes_deduplicated += len(info["data"]) + len(info.get("smask", ""))
+        self._drawn_images.add(name)
+        return super().image(name, *args, **kwargs)
+
+    def _putstream(self, s):
+        self._stream_bytes += len(s)
+        super()._putstream(s)
+
+    def _putpages(self):
+        # Compared with the same streams uncompressed; FPDF compresses by
+        # default, so this is not a saving over earlier output
+        raw_bytes = sum(len(self.pages[n]) for n in range(1, self.page + 1))
+        written_before = self._stream_bytes
+        super()._putpages()
+        self.compression_bytes_saved += raw_bytes - (self._stream_bytes - written_before)
+
+    def _putimages(self):
+        super()._putimages()
+        if self._chrome_ops is None:
+            return
+        ops = self._chrome_ops.encode("latin-1")
+        stream_filter = ""
+        if self.compress:
+            raw_bytes = len(ops)
+            ops = zlib.compress(ops)
+            self.compression_bytes_saved += raw_bytes - len(ops)
+            stream_filter = "/Filter /FlateDecode "
+        self._newobj()
+        self._chrome_n = self.n
+        self._out(
+            "<</Type /XObject /Subtype /Form /BBox [0 0 %.2f %.2f] /Resources 2 0 R %s/Length %d>>"
+            % (self.w_pt, self.h_pt, stream_filter, len(ops))
+        )
+        self._putstream(ops)
+        self._out("endobj")
+
+    def _putxobjectdict(self):
+        super()._putxobjectdict()
+        if self._chrome_n is not None:
+            self._out(f"/{CHROME_XOBJECT} {self._chrome_n} 0 R")
+
+    def bookmark(self, title, page=None):
+        """Add a bookmark pointing at the top of `page` (default: the current page)"""
+        self._outlines.append((title, page or self.page))
+
+    def _putresources(self):
+        super()._putresources()
+        if not self._outlines:
+            return
+        # Flat outline: one item per bookmark, followed by the outline root
+        first = self.n + 1
+        root = first + len(self._outlines)
+        for i, (title, page) in enumerate(self._outlines):
+            self._newobj()
+            self._out("<</Title " + self._textstring(title))
+            self._out(f"/Parent {root} 0 R")
+            if i > 0:
+                self._out(f"/Prev {self.n - 1} 0 R")
+            if self.n + 1 < root:
+                self._out(f"/Next {self.n + 1} 0 R")
+            # Page objects are numbered 3, 5, 7, ... by FPDF
+            self._out("/Dest [%d 0 R /XYZ 0 %.2f null]>>" % (1 + 2 * page, self.h_pt))
+            self._out("endobj")
+        self._newobj()
+        self._outlines_n = self.n
+        self._out(f"<</Type /Outlines /First {first} 0 R /Last {root - 1} 0 R /Count {len(self._outlines)}>>")
+        self._out("endobj")
+
+    def _putcatalog(self):
+        super()._putcatalog()
+        if self._outlines_n is not None:
+            self._out(f"/Outlines {self._outlines_n} 0 R")
+            self._out("/PageMode /UseOutlines")
+
+    def draw_page_chrome(self):
+        """Static page decoration: border, logo and title"""
         # Add the enhanced decorative border
-        self.add_decorative_border()
+        self._draw_border()
 
         # Add Ganesh image at the top center
-        image_path = "logo.png"
         image_width_mm = 16.0  # Increased size for the logo in mm
         page_width = self.w  # Get page width
         image_x = (page_width - image_width_mm) / 2
         image_y = 15  # Position from the top
 
         try:
-            if os.path.exists(image_path):
+            logo = get_asset(STATIC_HEADER_IMAGE)
+            if logo:
                 # Calculate image height to position the title correctly
-                img = Image.open(image_path)
-                aspect_ratio = img.height / img.width
-                image_height_mm = image_width_mm * aspect_ratio
+                image_height_mm = logo.height_for(image_width_mm)
                 
-                self.image(image_path, x=image_x, y=image_y, w=image_width_mm, h=image_height_mm) # Explicitly set height as well
+                logo.place(self, x=image_x, y=image_y, w=image_width_mm, h=image_height_mm) # Explicitly set height as well
                 
                 # Adjust y position for the title based on image height + spacing
                 title_y = image_y + image_height_mm + 3 # Maintain padding after image
             else:
-                logger.warning(f"Ganesh image not found at {image_path}. Skipping image.")
+                logger.warning(f"Ganesh image not found at {STATIC_HEADER_IMAGE}. Skipping image.")
                 title_y = 20 # Fallback if image not found
         except Exception as e:
             logger.error(f"Error adding Ganesh image to PDF: {e}")
@@ -1694,19 +1438,11 @@ class EnhancedSinglePageMatchesPDF(FPDF):
 
 def add_enhanced_photo_to_pdf(pdf, user_row, email_col):
     """Add user photo to the right side of the PDF with enhanced styling"""
-    photo_col = [
-        col
-        for col in user_row.keys()
-        if "photo" in col.lower() and "upload" in col.lower()
-    ]
-    if not photo_col:
-        photo_col = [col for col in user_row.keys() if "photo" in col.lower()]
-    
+    photo_col = resolve_schema(user_row.keys()).get("photo")
     if not photo_col:
         logger.warning("No photo column found in form data")
         return False
     
-    photo_col = photo_col[0]
     photo_link = user_row.get(photo_col, "")
 
     if (
@@ -1719,75 +1455,84 @@ def add_enhanced_photo_to_pdf(pdf, user_row, email_col):
         )
         return False
     
-    # Create safe filename
+    # Download into a private temp file, so concurrent jobs rendering the
+    # same profile never share a path
     email = user_row.get(email_col, "unknown")
     safe_name = re.sub(r"[^\w\-_]", "_", email)
-    photo_path = f"temp_{safe_name}_photo.jpg"
-
-    # Try to download the image
-    img_path = download_drive_image(photo_link, save_filename=photo_path)
+    fd, photo_path = tempfile.mkstemp(prefix=f"temp_{safe_name}_", suffix="_photo.jpg")
+    os.close(fd)
+
+    # Use the prefetched photo if there is one, otherwise download it now
+    prefetched = getattr(_render_context, "photos", {}).get(extract_drive_id(photo_link))
+    if prefetched:
+        with open(photo_path, "wb") as f:
+            f.write(prefetched)
+        img_path = photo_path
+    else:
+        img_path = download_drive_image(photo_link, save_filename=photo_path)
 
     if not img_path or not os.path.exists(img_path):
         logger.warning(
             f"Failed to download image for {user_row.get('Full Name', 'Unknown user')}"
         )
+        os.remove(photo_path)
         return False
 
     # Add image to PDF with enhanced styling
     try:
-        with Image.open(img_path) as img:
-            # Get image dimensions for proper scaling
-            img_width, img_height = img.size
-            aspect_ratio = img_width / img_height
-            
-            # Enhanced photo dimensions (increased height)
-            max_photo_width = 70
-            max_photo_height = 100  # Increased height
-
-            if aspect_ratio > 1:  # Landscape orientation
-                photo_width = max_photo_width
-                photo_height = max_photo_width / aspect_ratio
-            else:  # Portrait orientation
-                photo_height = max_photo_height
-                photo_width = max_photo_height * aspect_ratio
-            
-            # Ensure minimum dimensions
-            if photo_width < 40:  # Increased minimum width
-                photo_width = 40
-                photo_height = 40 / aspect_ratio
-            if photo_height < 50:  # Increased minimum height
-                photo_height = 50
-                photo_width = 50 * aspect_ratio
-
-            # Position photo in top-right corner with proper margins
-            photo_x = pdf.w - photo_width - 15  # 15mm from right edge
-            photo_y = 57  # Increased vertical space from BIODATA text (was 55)
-
-            # Add decorative border around photo
-            border_margin = 2
-            pdf.set_draw_color(*pdf.primary_color)
-            pdf.set_line_width(1)
-            pdf.rect(
-                photo_x - border_margin,
-                photo_y - border_margin,
-                photo_width + 2 * border_margin,
-                photo_height + 2 * border_margin,
-            )
-            
-            # Add photo
-            pdf.image(
-                img_path,
-                x=photo_x,
-                y=photo_y,
-                w=photo_width,
-                h=photo_height,
-            )
-            logger.info("Enhanced photo added to PDF successfully")
-            return True
-            
-    except Exception as e:
-        logger.error(f"Error adding enhanced image to PDF: {e}")
-        return False
+        # Decoded once per distinct photo; repeats share one image object
+        photo = pdf_asset_registry.from_file(img_path)
+        # Get image dimensions for proper scaling
+        aspect_ratio = photo.width_px / photo.height_px
+        
+        # Enhanced photo dimensions (increased height)
+        max_photo_width = 70
+        max_photo_height = 100  # Increased height
+
+        if aspect_ratio > 1:  # Landscape orientation
+            photo_width = max_photo_width
+            photo_height = max_photo_width / aspect_ratio
+        else:  # Portrait orientation
+            photo_height = max_photo_height
+            photo_width = max_photo_height * aspect_ratio
+        
+        # Ensure minimum dimensions
+        if photo_width < 40:  # Increased minimum width
+            photo_width = 40
+            photo_height = 40 / aspect_ratio
+        if photo_height < 50:  # Increased minimum height
+            photo_height = 50
+            photo_width = 50 * aspect_ratio
+
+        # Position photo in top-right corner with proper margins
+        photo_x = pdf.w - photo_width - 15  # 15mm from right edge
+        photo_y = 57  # Increased vertical space from BIODATA text (was 55)
+
+        # Add decorative border around photo
+        border_margin = 2
+        pdf.set_draw_color(*pdf.primary_color)
+        pdf.set_line_width(1)
+        pdf.rect(
+            photo_x - border_margin,
+            photo_y - border_margin,
+            photo_width + 2 * border_margin,
+            photo_height + 2 * border_margin,
+        )
+        
+        # Add photo
+        photo.place(
+            pdf,
+            x=photo_x,
+            y=photo_y,
+            w=photo_width,
+            h=photo_height,
+        )
+        logger.info("Enhanced photo added to PDF successfully")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error adding enhanced image to PDF: {e}")
+        return False
     finally:
         # Clean up the temp file
         if os.path.exists(img_path):
@@ -1864,7 +1609,7 @@ def add_enhanced_field(pdf, label, value, y_pos, label_width=35):
 
 def add_family_information_enhanced(pdf, matched_user, current_y):
     """Add family information with enhanced styling"""
-    family_fields = [col for col in matched_user.keys() if "Family Information" in col]
+    family_fields = resolve_schema(matched_user.keys()).group("family")
 
     if not family_fields:
         return current_y
@@ -2025,23 +1770,7 @@ def add_compact_field(pdf, label, value, y_pos, label_width=50):  # Changed defa
         available_width = 190 - (15 + label_width + 5)
         
         # Split value into words and create wrapped lines
-        words = str(value).split()
-        current_line = []
-        current_width = 0
-        lines = []
-        
-        for word in words:
-            word_width = pdf.get_string_width(word + " ")
-            if current_width + word_width <= available_width:
-                current_line.append(word)
-                current_width += word_width
-            else:
-                lines.append(" ".join(current_line))
-                current_line = [word]
-                current_width = word_width
-        
-        if current_line:
-            lines.append(" ".join(current_line))
+        lines = wrap_words(pdf, str(value), available_width)
         
         # Draw each line with consistent spacing
         current_y = y_pos
@@ -2072,163 +1801,146 @@ def add_compact_field(pdf, label, value, y_pos, label_width=50):  # Changed defa
     return y_pos + 5  # Return new y position
 
 
-def add_corner_flourish(self, x, y, size, position):
-    """
-    Add decorative flourish elements at corners
-    """
-    try:
-        # Save current drawing state
-        self.set_draw_color(200, 180, 140)  # Gold color
-        self.set_line_width(0.5)
-
-        # Calculate flourish dimensions based on size
-        flourish_size = size * 0.3
-
-        # Draw different flourish patterns based on position
-        if position == "top-left":
-            # Draw curved flourish for top-left corner
-            self._draw_curved_flourish(x, y, flourish_size, "top-left")
-        elif position == "top-right":
-            # Draw curved flourish for top-right corner
-            self._draw_curved_flourish(x, y, flourish_size, "top-right")
-        elif position == "bottom-left":
-            # Draw curved flourish for bottom-left corner
-            self._draw_curved_flourish(x, y, flourish_size, "bottom-left")
-        elif position == "bottom-right":
-            # Draw curved flourish for bottom-right corner
-            self._draw_curved_flourish(x, y, flourish_size, "bottom-right")
-
-    except Exception as e:
-        # Log error but don't break PDF generation
-        print(f"Warning: Could not add corner flourish at {position}: {e}")
-
-
-def _draw_curved_flourish(self, x, y, size, position):
-    """
-    Helper method to draw curved flourish elements
-    """
-    try:
-        # Simple curved line implementation
-        offset = size * 0.2
-
-        if position == "top-left":
-            # Draw small decorative curves
-            self.line(x - offset, y, x + offset, y - offset)
-            self.line(x, y - offset, x + offset, y + offset)
-
-        elif position == "top-right":
-            self.line(x - offset, y - offset, x + offset, y)
-            self.line(x - offset, y + offset, x, y - offset)
-
-        elif position == "bottom-left":
-            self.line(x - offset, y, x + offset, y + offset)
-            self.line(x, y + offset, x + offset, y - offset)
-
-        elif position == "bottom-right":
-            self.line(x - offset, y + offset, x + offset, y)
-            self.line(x - offset, y - offset, x, y + offset)
+def _draw_fields_section(pdf, step, record, y):
+    for label, column, _ in step.rows:
+        y = add_compact_field(pdf, label, record[column], y)
+    return y
 
-        # Add small decorative dots
-        self.set_fill_color(200, 180, 140)
-        dot_size = 0.5
-        self.circle(x, y, dot_size, "F")
 
-    except Exception as e:
-        print(f"Warning: Could not draw curved flourish: {e}")
-
-
-# Alternative simpler implementation if the above is too complex:
-def add_corner_flourish_simple(self, x, y, size, position):
-    """
-    Simple corner flourish - just adds a small decorative element
-    """
-    try:
-        # Set decorative color
-        self.set_fill_color(200, 180, 140)  # Gold
-        self.set_draw_color(200, 180, 140)
-
-        # Draw a small decorative circle or rectangle
-        flourish_size = min(size * 0.1, 2)  # Limit size to prevent issues
-
-        # Simple circle flourish
-        self.circle(x, y, flourish_size, "F")
-
-    except Exception as e:
-        print(f"Warning: Could not add simple flourish: {e}")
-
-
-# Quick fix - if you want to temporarily disable flourishes:
-def add_corner_flourish_disabled(self, x, y, size, position):
-    """
-    Disabled flourish method - does nothing to prevent errors
-    """
-    pass  # Do nothing - this prevents the AttributeError
-
-
-# RECOMMENDED IMPLEMENTATION FOR YOUR CLASS:
-
-
-def add_corner_flourish(self, x, y, size, position):
-    """
-    Add decorative corner flourish elements
-    """
-    try:
-        # Save current state
-        current_draw_color = getattr(self, "_draw_color", (0, 0, 0))
-        current_line_width = getattr(self, "_line_width", 0.2)
-
-        # Set flourish styling
-        self.set_draw_color(180, 150, 100)  # Elegant bronze color
-        self.set_line_width(0.3)
-
-        # Calculate flourish dimensions
-        base_size = min(size * 0.25, 3)  # Reasonable size limit
+def _draw_family_section(pdf, step, record, y):
+    y += 3
+    count = 0
+    for label, column, _ in step.rows:
+        if count >= 20 or y > 245:
+            break
+        value = record[column]
+        if pd.notna(value) and str(value).strip().lower() not in ["", "no", "n/a"]:
+            pdf.set_y(y)
+            pdf.set_x(15)
+            pdf.set_font("Arial", "B", 10)
+            pdf.set_text_color(50, 50, 50)
+            pdf.cell(50, 4, f"{label}", border=0)
+            pdf.set_x(70)
+            pdf.set_font("Arial", "", 10)
+            pdf.set_text_color(0, 0, 0)
+            value_text = str(value)
+            if len(value_text) > 40:
+                value_text = value_text[:37] + "..."
+            pdf.cell(pdf.left_column_width - 70, 4, value_text, border=0)
+            y += 5
+            count += 1
+    return y
+
+
+def _draw_text_section(pdf, step, record, y):
+    y += 3
+    _, column, _ = step.rows[0]
+    value = record[column]
+    if pd.notna(value) and str(value).strip():
+        pdf.set_y(y)
+        pdf.set_x(15)
+        pdf.set_font("Arial", "", 10)
+        pdf.set_text_color(0)
+        text = str(value)
+        if len(text) > step.max_chars:
+            text = text[:step.max_chars - 3] + "..."
+        pdf.cell(pdf.left_column_width - 15, 4, text, border=0)
+    return y
 
-        # Position-specific flourish patterns
-        if position == "top-left":
-            self._draw_corner_pattern(x, y, base_size, -1, -1)
-        elif position == "top-right":
-            self._draw_corner_pattern(x, y, base_size, 1, -1)
-        elif position == "bottom-left":
-            self._draw_corner_pattern(x, y, base_size, -1, 1)
-        elif position == "bottom-right":
-            self._draw_corner_pattern(x, y, base_size, 1, 1)
 
-        # Restore previous state
-        if hasattr(self, "set_draw_color"):
-            self.set_draw_color(*current_draw_color)
-        if hasattr(self, "set_line_width"):
-            self.set_line_width(current_line_width)
+def _draw_summary_block(pdf, title, text, y):
+    pdf.set_y(y)
+    pdf.set_x(15)
+    pdf.set_font("Arial", "B", 10)
+    pdf.set_text_color(50, 50, 50)
+    pdf.cell(0, 5, title, ln=1, border=0)  # ln=1 moves to next line
+    pdf.set_font("Arial", "", 10)
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_x(20)
+    # Right padding so text doesn't touch the right edge
+    right_padding = 15
+    multi_cell(pdf, pdf.w - 20 - right_padding, 5, text, border=0)
+    return pdf.get_y() + 2
+
+
+def _draw_preferences_section(pdf, step, record, y):
+    y += 3
+    requirements = []
+    preferences = {}  # dict keeps the order of first occurrence
+    for label, column, _ in step.rows:
+        value = record[column]
+        if pd.notna(value) and str(value).strip().lower() not in ["", "no", "n/a", "no other preferences"]:
+            requirements.append(label)
+            preferences.setdefault(strip_prefer(str(value).strip()), None)
+
+    if requirements:
+        y = _draw_summary_block(pdf, "Requirement:", ", ".join(requirements), y)
+    if preferences:
+        y = _draw_summary_block(pdf, "Preferences:", ", ".join(preferences), y)
+    return y
+
+
+def _draw_location_section(pdf, step, record, y):
+    for label, column, transform in step.rows:
+        value = record[column]
+        if pd.notna(value) and str(value).strip():
+            value = str(value).strip()
+            if transform:
+                value = transform(value)
+            if value:
+                y = add_compact_field(pdf, label, value, y)
+    return y
+
+
+def _draw_contact_section(pdf, step, record, y):
+    for label, column, _ in step.rows:
+        pdf.set_y(y)
+        pdf.set_x(15)
+        pdf.set_font("Arial", "B", 10)
+        pdf.set_text_color(50, 50, 50)
+        pdf.cell(30, 4, label, border=0)
+        pdf.set_x(50)
+        pdf.set_font("Arial", "", 10)
+        pdf.set_text_color(0, 0, 0)
+        pdf.cell(pdf.left_column_width - 50, 4, record[column], border=0)
+    return y
 
-    except Exception as e:
-        # Fail gracefully - log but continue
-        import logging
 
-        logging.warning(f"Could not add corner flourish at {position}: {e}")
+SECTION_RENDERERS = {
+    "fields": _draw_fields_section,
+    "family": _draw_family_section,
+    "text": _draw_text_section,
+    "preferences": _draw_preferences_section,
+    "location": _draw_location_section,
+    "contact": _draw_contact_section,
+}
 
 
-def _draw_corner_pattern(self, x, y, size, x_dir, y_dir):
+def draw_profile(pdf, user, email_col):
     """
-    Draw a simple corner pattern
+    Add one profile's pages to `pdf` by running the layout's render plan for
+    the sheet header over the profile's values. `user` is a matched row
+    (Series) or the registrant's one-row DataFrame.
     """
-    try:
-        # Simple L-shaped flourish
-        line_length = size * 0.8
-
-        # Horizontal line
-        self.line(x, y, x + (line_length * x_dir), y)
+    row = user.iloc[0] if isinstance(user, pd.DataFrame) else user
+    plan = get_render_plan(row.index)
+    record = plan.record(row, email_col)
 
-        # Vertical line
-        self.line(x, y, x, y + (line_length * y_dir))
+    for top, photo, steps in plan.pages:
+        pdf.add_page()
+        current_y = top
+        if photo:
+            photo_added = add_enhanced_photo_to_pdf(pdf, user, email_col)
+            pdf.left_column_width = 110 if photo_added else 140
+        for step in steps:
+            current_y += step.gap
+            current_y = add_compact_section(pdf, step.title, current_y)
+            current_y = SECTION_RENDERERS[step.kind](pdf, step, record, current_y)
 
-        # Small decorative elements
-        dot_offset = size * 0.3
-        if hasattr(self, "circle"):
-            self.set_fill_color(180, 150, 100)
-            self.circle(x + (dot_offset * x_dir), y + (dot_offset * y_dir), 0.3, "F")
 
-    except Exception as e:
-        pass  # Fail silently for decorative elements
+def draw_match_profile(pdf, matched_user, email_col):
+    """Add one matched profile's page to `pdf`"""
+    draw_profile(pdf, matched_user, email_col)
 
 
 def create_single_page_match_pdf(
@@ -2241,284 +1953,14 @@ def create_single_page_match_pdf(
     """Create an enhanced single-page PDF with designer elements"""
     try:
         pdf = EnhancedSinglePageMatchesPDF()
-        pdf.add_page()
-
-        # Add vertical space after BIODATA
-        current_y = 50  # Start below enhanced header
-        current_y += 3  # Reduced extra vertical space after BIODATA from 8 to 3
-
-        # Add photo to the right side with enhanced styling
-        photo_added = add_enhanced_photo_to_pdf(pdf, matched_user, email_col)
-
-        if photo_added:
-            pdf.left_column_width = 110  # Adjust for larger photo
-        else:
-            pdf.left_column_width = 140
-
-        # First Page Sections
-        # Personal Details Section
-        current_y = add_compact_section(pdf, "Personal Details", current_y)
-
-        personal_fields = [
-            ("Name", "Full Name"),
-            ("Birth Date", "Birth Date"),
-            ("Birth Time", "Birth Time"),
-            ("Birth Place", "Birth Place"),
-            ("Height", "Height"),
-            ("Weight", "Weight"),
-            ("Religion", "Religion"),
-            ("Caste / Community", "Caste / Community / Tribe"),
-            ("Mother Tongue", "Mother Tongue"),
-            ("Nationality", "Nationality"),
-        ]
-
-        for display_name, field_name in personal_fields:
-            matching_field = next(
-                (
-                    col
-                    for col in matched_user.keys()
-                    if field_name.lower() in col.lower()
-                ),
-                None,
-            )
-            if matching_field:
-                current_y = add_compact_field(
-                    pdf,
-                    display_name,
-                    matched_user.get(matching_field, "N/A"),
-                    current_y,
-                )
-
-        # Professional Details Section
-        current_y += 5
-        current_y = add_compact_section(pdf, "Professional Details", current_y)
-
-        career_fields = [
-            ("Education", "Education"),
-            ("Qualification", "Qualification"),
-            ("Occupation", "Occupation"),
-        ]
-
-        for display_name, field_name in career_fields:
-            matching_field = next(
-                (
-                    col
-                    for col in matched_user.keys()
-                    if field_name.lower() in col.lower()
-                ),
-                None,
-            )
-            if matching_field:
-                current_y = add_compact_field(
-                    pdf,
-                    display_name,
-                    matched_user.get(matching_field, "N/A"),
-                    current_y,
-                )
-
-        # Family Information Section
-        family_fields = [
-            col for col in matched_user.keys() if "Family Information" in col
-        ]
-        if family_fields:
-            current_y += 5
-            current_y = add_compact_section(pdf, "Family Info", current_y)
-            current_y += 3
-
-            family_count = 0
-            for field in family_fields:
-                if family_count >= 20 or current_y > 245:
-                    break
-                value = matched_user.get(field, "")
-                if pd.notna(value) and str(value).strip().lower() not in [
-                    "",
-                    "no",
-                    "n/a",
-                ]:
-                    match = re.search(r"\[(.*?)\]", field)
-                    if match:
-                        label = match.group(1)[:35]
-                        pdf.set_y(current_y)
-                        pdf.set_x(15)
-                        pdf.set_font("Arial", "B", 10)
-                        pdf.set_text_color(50, 50, 50)
-                        pdf.cell(50, 4, f"{label}", border=0)
-                        pdf.set_x(70)
-                        pdf.set_font("Arial", "", 10)
-                        pdf.set_text_color(0, 0, 0)
-                        value_text = str(value)
-                        if len(value_text) > 40:
-                            value_text = value_text[:37] + "..."
-                        pdf.cell(pdf.left_column_width - 70, 4, value_text, border=0)
-                        current_y += 5
-                        family_count += 1
-
-        # Hobbies Section
-        hobbies_col = next(
-            (
-                col
-                for col in matched_user.keys()
-                if "favorite" in col.lower() or "hobby" in col.lower()
-            ),
-            None,
-        )
-
-        if hobbies_col:
-            current_y += 5
-            current_y = add_compact_section(pdf, "Hobbies & Interests", current_y)
-            current_y += 3
-
-            hobbies = matched_user.get(hobbies_col, "")
-            if pd.notna(hobbies) and str(hobbies).strip():
-                pdf.set_y(current_y)
-                pdf.set_x(15)
-                pdf.set_font("Arial", "", 10)
-                pdf.set_text_color(0)
-                hobbies_text = str(hobbies)
-                if len(hobbies_text) > 120:
-                    hobbies_text = hobbies_text[:117] + "..."
-                pdf.cell(pdf.left_column_width - 15, 4, hobbies_text, border=0)
-
-        # Second Page Sections
-        pdf.add_page()
-        current_y = 50
-        current_y += 8  # Add the same spacing as first page after BIODATA
-
-        # Requirements & Preferences Section
-        preference_fields = [col for col in matched_user.keys() if "Requirements & Preferences" in col]
-        if preference_fields:
-            current_y = add_compact_section(pdf, "Requirements & Preferences", current_y)
-            current_y += 3
-
-            # Prepare Requirement and Preferences lists
-            requirements = []
-            preferences = {}  # Changed to dict to maintain order
-            for field in preference_fields:
-                value = matched_user.get(field, "")
-                # Only include if value is not empty, not 'no', not 'n/a', not 'no other preferences'
-                if pd.notna(value) and str(value).strip().lower() not in ["", "no", "n/a", "no other preferences"]:
-                    match = re.search(r"\[(.*?)\]", field)
-                    if match:
-                        label = match.group(1)[:35]
-                        # Remove "Prefer" from the beginning of the label if it exists
-                        label = re.sub(r'^Prefer\s+', '', label, flags=re.IGNORECASE)
-                        requirements.append(label)
-                        # Clean up the preference value
-                        pref_value = str(value).strip()
-                        # Remove "Prefer" from the beginning of the value if it exists
-                        pref_value = re.sub(r'^Prefer\s+', '', pref_value, flags=re.IGNORECASE)
-                        # Only add if not already in preferences (maintains order of first occurrence)
-                        if pref_value not in preferences:
-                            preferences[pref_value] = None
-
-            # Display as two subfields
-            if requirements:
-                pdf.set_y(current_y)
-                pdf.set_x(15)
-                pdf.set_font("Arial", "B", 10)
-                pdf.set_text_color(50, 50, 50)
-                pdf.cell(0, 5, "Requirement:", ln=1, border=0)  # ln=1 moves to next line
-                pdf.set_font("Arial", "", 10)
-                pdf.set_text_color(0, 0, 0)
-                req_text = ", ".join(requirements)
-                pdf.set_x(20)
-                # Add right padding by reducing the width of the multi_cell so text doesn't touch the right edge
-                right_padding = 15  # in mm, adjust as needed
-                cell_width = pdf.w - 20 - right_padding
-                pdf.multi_cell(cell_width, 5, req_text, border=0)
-                current_y = pdf.get_y() + 2
-
-            if preferences:
-                pdf.set_y(current_y)
-                pdf.set_x(15)
-                pdf.set_font("Arial", "B", 10)
-                pdf.set_text_color(50, 50, 50)
-                pdf.cell(0, 5, "Preferences:", ln=1, border=0)  # ln=1 moves to next line
-                pdf.set_font("Arial", "", 10)
-                pdf.set_text_color(0, 0, 0)
-                pref_text = ", ".join(preferences.keys())  # Use keys() to get values in original order
-                pdf.set_x(20)
-                # Add right padding by reducing the width of the multi_cell so text doesn't touch the right edge
-                right_padding = 15  # in mm, adjust as needed
-                cell_width = pdf.w - 20 - right_padding
-                pdf.multi_cell(cell_width, 5, pref_text, border=0)
-                current_y = pdf.get_y() + 2
-
-        # Location Section
-        current_y += 5
-        current_y = add_compact_section(pdf, "Location", current_y)
-
-        # Get the city value directly from the City column - improved search
-        city_col = None
-        # First try exact match for "City"
-        if "City" in matched_user.keys():
-            city_col = "City"
-        # Then try case-insensitive search with stripped spaces (but avoid preference fields)
-        elif any(col.strip().lower() == "city" and "preference" not in col.lower() for col in matched_user.keys()):
-            city_col = next(col for col in matched_user.keys() if col.strip().lower() == "city" and "preference" not in col.lower())
-        # Finally try partial match (but avoid preference fields)
-        elif any("city" in col.lower() and "preference" not in col.lower() and "metro" not in col.lower() for col in matched_user.keys()):
-            city_col = next(col for col in matched_user.keys() if "city" in col.lower() and "preference" not in col.lower() and "metro" not in col.lower())
-        
-        if city_col:
-            city_value = matched_user.get(city_col, "")
-            logger.info(f"DEBUG: Raw city value from column '{city_col}': '{city_value}'")
-            if pd.notna(city_value) and str(city_value).strip():
-                # Clean up the city value
-                city_value = str(city_value).strip()
-                logger.info(f"DEBUG: After strip city value: '{city_value}'")
-                # Remove any prefixes like "City:" or "Prefer"
-                city_value = re.sub(r'^(City:|Prefer)\s*', '', city_value, flags=re.IGNORECASE)
-                logger.info(f"DEBUG: After regex cleanup city value: '{city_value}'")
-                # Don't truncate city names - use the full cleaned value
-                if city_value:
-                    current_y = add_compact_field(pdf, "City", city_value, current_y)
-                    logger.info(f"DEBUG: Added city field to PDF: '{city_value}'")
-        else:
-            logger.warning(f"DEBUG: No city column found in data. Available columns: {list(matched_user.keys())}")
-
-        # Handle other location fields
-        location_fields = [("State", "State"), ("Country", "Country")]
-        for display_name, field_name in location_fields:
-            matching_field = next(
-                (
-                    col
-                    for col in matched_user.keys()
-                    if field_name.lower() in col.lower()
-                ),
-                None,
-            )
-            if matching_field:
-                value = matched_user.get(matching_field, "N/A")
-                if pd.notna(value) and str(value).strip():
-                    value = str(value).strip()
-                    current_y = add_compact_field(
-                        pdf,
-                        display_name,
-                        value,
-                        current_y,
-                    )
-
-        # Contact Information (Email only)
-        current_y += 10
-        current_y = add_compact_section(pdf, "Contact Info", current_y)
-        pdf.set_y(current_y)
-        pdf.set_x(15)
-        pdf.set_font("Arial", "B", 10)
-        pdf.set_text_color(50, 50, 50)
-        pdf.cell(30, 4, "Email", border=0)
-        pdf.set_x(50)
-        pdf.set_font("Arial", "", 10)
-        pdf.set_text_color(0, 0, 0)
-        email_value = matched_user.get(email_col, "N/A")
-        pdf.cell(pdf.left_column_width - 50, 4, email_value, border=0)
+        draw_match_profile(pdf, matched_user, email_col)
 
         # Save the PDF
         matched_user_name = matched_user.get("Full Name", "Unknown").replace(" ", "_")
         output_filename = f"Profile_{profile_number}_{matched_user_name}_match.pdf"
-        pdf.output(output_filename)
-        logger.info(f"Single-page PDF created: {output_filename}")
-        return output_filename
+        pdf_bytes = pdf.output(dest="S").encode("latin-1")
+        logger.info(f"Single-page PDF created: {output_filename} ({len(pdf_bytes)} bytes)")
+        return RenderedPdf(output_filename, pdf_bytes, 1, pdf.image_bytes_deduplicated, pdf.compression_bytes_saved)
 
     except Exception as e:
         logger.error(f"Single-page PDF creation failed: {e}", exc_info=True)
@@ -2546,19 +1988,51 @@ def create_individual_match_pdfs(
         profile_number = i + 1
         match_percent = match_percentages[i]
 
-        pdf_filename = create_single_page_match_pdf(
+        pdf = create_single_page_match_pdf(
             user, match_percent, new_user_name, email_col, profile_number
         )
 
-        if pdf_filename:
-            pdf_files.append(pdf_filename)
-            logger.info(f"Created single-page PDF {profile_number}: {pdf_filename}")
+        if pdf:
+            pdf_files.append(pdf)
+            logger.info(f"Created single-page PDF {profile_number}: {pdf.filename}")
         else:
             logger.error(f"Failed to create PDF for profile {profile_number}")
 
     return pdf_files
 
 
+def create_combined_profiles_pdf(new_user, matched_users, match_percentages, email_col):
+    """Render the top matches and the registrant's own profile into one bookmarked PDF"""
+    try:
+        pdf = EnhancedSinglePageMatchesPDF()
+        for i, (idx, user) in enumerate(matched_users.iterrows()):
+            if i >= 5:  # Limit to 5 profiles
+                break
+            first_page = pdf.page + 1
+            draw_match_profile(pdf, user, email_col)
+            pdf.bookmark(f"Match {i + 1}: {user.get('Full Name', 'Unknown')} ({match_percentages[i]:.1f}%)", first_page)
+
+        first_page = pdf.page + 1
+        draw_last_response_profile(pdf, new_user, email_col)
+        pdf.bookmark(f"Your profile: {new_user['Full Name'].values[0]}", first_page)
+
+        pdf_bytes = pdf.output(dest="S").encode("latin-1")
+        logger.info(f"Combined PDF created: {pdf.page} pages ({len(pdf_bytes)} bytes)")
+        return RenderedPdf(COMBINED_PDF_FILENAME, pdf_bytes, len(pdf._outlines),
+                           pdf.image_bytes_deduplicated, pdf.compression_bytes_saved)
+
+    except Exception as e:
+        logger.error(f"Combined PDF creation failed: {e}", exc_info=True)
+        return None
+
+
+def attachment_filename(pdf, position):
+    """Name a PDF is attached under; profiles are numbered in the order they were rendered"""
+    if pdf.filename == COMBINED_PDF_FILENAME:
+        return pdf.filename
+    return f"Profile_{position}_Match.pdf"
+
+
 # Function to send email with multiple PDF attachments
 def send_email_with_multiple_pdfs(to_email, message, pdf_files, user_name=None, whatsapp_number=None, email_address=None, birth_date=None, location=None):
     sender_email = os.getenv("SENDER_EMAIL")
@@ -2574,13 +2048,8 @@ def send_email_with_multiple_pdfs(to_email, message, pdf_files, user_name=None,
         logger.error(f"Invalid email address: {to_email}")
         return False
 
-    # Check if PDF files exist
-    valid_pdf_files = []
-    for pdf_path in pdf_files:
-        if os.path.exists(pdf_path):
-            valid_pdf_files.append(pdf_path)
-        else:
-            logger.warning(f"PDF file not found: {pdf_path}")
+    # Skip PDFs that failed to render
+    valid_pdf_files = [pdf for pdf in pdf_files if pdf and pdf.data]
 
     if not valid_pdf_files:
         logger.error("No valid PDF files found to attach")
@@ -2593,37 +2062,48 @@ def send_email_with_multiple_pdfs(to_email, message, pdf_files, user_name=None,
     msg.set_content(message)
 
     # Attach all PDF files
-    for i, pdf_path in enumerate(valid_pdf_files, 1):
+    for i, pdf in enumerate(valid_pdf_files, 1):
         try:
-            with open(pdf_path, "rb") as f:
-                file_data = f.read()
-                filename = f"Profile_{i}_Match.pdf"
-                msg.add_attachment(
-                    file_data,
-                    maintype="application",
-                    subtype="pdf",
-                    filename=filename,
-                )
-            logger.info(f"Attached PDF: {pdf_path} as {filename}")
+            filename = attachment_filename(pdf, i)
+            msg.add_attachment(
+                pdf.data,
+                maintype="application",
+                subtype="pdf",
+                filename=filename,
+            )
+            logger.info(f"Attached PDF: {pdf.filename} as {filename}")
         except Exception as e:
-            logger.error(f"Failed to attach PDF {pdf_path}: {e}")
+            logger.error(f"Failed to attach PDF {pdf.filename}: {e}")
             continue
 
     # Find the last response PDF to upload to Drive
     last_response_pdf = None
     top_match_pdfs = []
+    combined_pdf = None
     
-    for pdf_path in valid_pdf_files:
-        if "Last_Response_Profile.pdf" in pdf_path:
-            last_response_pdf = pdf_path
-        elif "Profile_" in pdf_path and "_match.pdf" in pdf_path:
-            top_match_pdfs.append(pdf_path)
+    for pdf in valid_pdf_files:
+        if pdf.filename == COMBINED_PDF_FILENAME:
+            combined_pdf = pdf
+        elif "Last_Response_Profile.pdf" in pdf.filename:
+            last_response_pdf = pdf
+        elif "Profile_" in pdf.filename and "_match.pdf" in pdf.filename:
+            top_match_pdfs.append(pdf)
     
     # Sort top match PDFs by their number (Profile_1, Profile_2, etc.)
-    top_match_pdfs.sort(key=lambda x: int(x.split('Profile_')[1].split('_')[0]) if 'Profile_' in x else 999)
+    top_match_pdfs.sort(key=lambda x: int(x.filename.split('Profile_')[1].split('_')[0]) if 'Profile_' in x.filename else 999)
     
     # Upload last response PDF to Drive and get URL
     pdf_url = None
+    top_match_urls = []
+    if combined_pdf and user_name:
+        # One upload; every profile column of the target sheet links to it
+        pdf_url = upload_pdf_to_drive_and_get_url(combined_pdf, user_name, f"{user_name}_{COMBINED_PDF_FILENAME}")
+        if pdf_url:
+            logger.info(f"Successfully uploaded combined PDF to Drive: {pdf_url}")
+            top_match_urls = [pdf_url] * (combined_pdf.profiles - 1)
+        else:
+            logger.warning("Failed to upload combined PDF to Drive")
+
     if last_response_pdf and user_name:
         pdf_url = upload_pdf_to_drive_and_get_url(last_response_pdf, user_name)
         if pdf_url:
@@ -2632,7 +2112,6 @@ def send_email_with_multiple_pdfs(to_email, message, pdf_files, user_name=None,
             logger.warning("Failed to upload last response PDF to Drive")
 
     # Upload top 5 match PDFs to Drive and get URLs
-    top_match_urls = []
     if top_match_pdfs and user_name:
         top_match_urls = upload_multiple_pdfs_to_drive_and_get_urls(top_match_pdfs, user_name)
         if top_match_urls:
@@ -2648,33 +2127,19 @@ def send_email_with_multiple_pdfs(to_email, message, pdf_files, user_name=None,
         logger.warning("No compatibility text found in email message")
 
     try:
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            logger.info(f"Email with {len(valid_pdf_files)} PDFs sent to {to_email}")
-            
-            # Write name, WhatsApp number, email, birth date, location, PDF URL, top match URLs, and email text to target sheet if user_name is provided
-            if user_name:
-                write_name_to_target_sheet(user_name, whatsapp_number, email_address, birth_date, location, pdf_url, top_match_urls, email_text)
-            
-            return True
+        data_backend.send_email(msg, sender_email, sender_password)
+        logger.info(f"Email with {len(valid_pdf_files)} PDFs sent to {to_email}")
+        
+        # Write name, WhatsApp number, email, birth date, location, PDF URL, top match URLs, and email text to target sheet if user_name is provided
+        if user_name:
+            write_name_to_target_sheet(user_name, whatsapp_number, email_address, birth_date, location, pdf_url, top_match_urls, email_text)
+        
+        return True
     except Exception as e:
         logger.error(f"Failed to send email: {e}")
         return False
 
 
-def cleanup_pdf_files(pdf_files):
-    """Clean up temporary PDF files after sending email"""
-    for pdf_file in pdf_files:
-        try:
-            if os.path.exists(pdf_file):
-                os.remove(pdf_file)
-                logger.info(f"Cleaned up PDF file: {pdf_file}")
-        except Exception as e:
-            logger.error(f"Failed to remove PDF file {pdf_file}: {e}")
-
-
 def send_admin_notification(
     user, matches_sent=True, match_lines="No matches", pdf_count=0, pdf_files=None
 ):
@@ -2710,13 +2175,8 @@ def send_admin_notification(
         if possible_gender_keys:
             gender_value = user.get(possible_gender_keys[0], "N/A")
 
-    # Check if PDF files exist
-    valid_pdf_files = []
-    for pdf_path in pdf_files:
-        if os.path.exists(pdf_path):
-            valid_pdf_files.append(pdf_path)
-        else:
-            logger.warning(f"PDF file not found: {pdf_path}")
+    # Skip PDFs that failed to render
+    valid_pdf_files = [pdf for pdf in pdf_files if pdf and pdf.data]
 
     if not valid_pdf_files:
         logger.error("No valid PDF files found to attach")
@@ -2749,29 +2209,24 @@ Original email content sent to user is attached below along with match PDFs.
     msg.set_content(body)
 
     # Attach all PDF files
-    for i, pdf_path in enumerate(valid_pdf_files, 1):
+    for i, pdf in enumerate(valid_pdf_files, 1):
         try:
-            with open(pdf_path, "rb") as f:
-                file_data = f.read()
-                filename = f"Profile_{i}_Match.pdf"
-                msg.add_attachment(
-                    file_data,
-                    maintype="application",
-                    subtype="pdf",
-                    filename=filename,
-                )
-            logger.info(f"Attached PDF: {pdf_path} as {filename}")
+            filename = attachment_filename(pdf, i)
+            msg.add_attachment(
+                pdf.data,
+                maintype="application",
+                subtype="pdf",
+                filename=filename,
+            )
+            logger.info(f"Attached PDF: {pdf.filename} as {filename}")
         except Exception as e:
-            logger.error(f"Failed to attach PDF {pdf_path}: {e}")
+            logger.error(f"Failed to attach PDF {pdf.filename}: {e}")
             continue
 
     try:
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            logger.info(f"Admin notified at {admin_email}")
-            return True
+        data_backend.send_email(msg, sender_email, sender_password)
+        logger.info(f"Admin notified at {admin_email}")
+        return True
     except Exception as e:
         logger.error(f"Failed to send admin notification: {e}")
         return False
@@ -2792,13 +2247,8 @@ def send_admin_copy_of_user_email(user_name, user_email, email_message, pdf_file
     if pdf_files is None:
         pdf_files = []
 
-    # Check if PDF files exist
-    valid_pdf_files = []
-    for pdf_path in pdf_files:
-        if os.path.exists(pdf_path):
-            valid_pdf_files.append(pdf_path)
-        else:
-            logger.warning(f"PDF file not found: {pdf_path}")
+    # Skip PDFs that failed to render
+    valid_pdf_files = [pdf for pdf in pdf_files if pdf and pdf.data]
 
     # Create admin email with same content as user email
     subject = f"[ADMIN COPY] Matrimonial Matches for {user_name}"
@@ -2826,29 +2276,24 @@ END OF ORIGINAL EMAIL CONTENT
     msg.set_content(admin_body)
 
     # Attach all PDF files (same as sent to user)
-    for i, pdf_path in enumerate(valid_pdf_files, 1):
+    for i, pdf in enumerate(valid_pdf_files, 1):
         try:
-            with open(pdf_path, "rb") as f:
-                file_data = f.read()
-                filename = f"Profile_{i}_Match.pdf"
-                msg.add_attachment(
-                    file_data,
-                    maintype="application",
-                    subtype="pdf",
-                    filename=filename,
-                )
-            logger.info(f"Attached PDF to admin email: {pdf_path} as {filename}")
+            filename = attachment_filename(pdf, i)
+            msg.add_attachment(
+                pdf.data,
+                maintype="application",
+                subtype="pdf",
+                filename=filename,
+            )
+            logger.info(f"Attached PDF to admin email: {pdf.filename} as {filename}")
         except Exception as e:
-            logger.error(f"Failed to attach PDF to admin email {pdf_path}: {e}")
+            logger.error(f"Failed to attach PDF to admin email {pdf.filename}: {e}")
             continue
 
     try:
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            logger.info(f"Admin copy sent to {admin_email} for user {user_name}")
-            return True
+        data_backend.send_email(msg, sender_email, sender_password)
+        logger.info(f"Admin copy sent to {admin_email} for user {user_name}")
+        return True
     except Exception as e:
         logger.error(f"Failed to send admin copy: {e}")
         return False
@@ -2862,39 +2307,23 @@ def create_email_message(new_user_name, top_matches):
     message += "Welcome to Sapta.ai Based on your Sapta.ai Digital Persona here are your top 5 matches with compatability and scores\n\n"
     
     if isinstance(top_matches, pd.DataFrame):
-        for i, (_, row) in enumerate(top_matches.iterrows(), 1):
-            match_name = row.get('Full Name', 'Unknown')
-            # Get category scores from columns
-            ppf_score = row.get('PPF %', 0)
-            fav_likes_score = row.get('FavLikes %', 0)
-            others_score = row.get('Others %', 0)
-            
-            # Calculate total compatibility as average of three categories
-            total_score = (ppf_score + fav_likes_score + others_score) / 3
-            
-            message += f"{i}. {match_name} - {total_score:.1f}% overall compatibility\n"
-            message += f"  Breakdown:\n"
-            message += f"    - Personal, Professional & Family: {ppf_score:.1f}%\n"
-            message += f"    - Favorites, Likes & Hobbies: {fav_likes_score:.1f}%\n"
-            message += f"    - Other Requirement and Preferences: {others_score:.1f}%\n\n"
+        matches = [(row, row.get('Match Details')) for _, row in top_matches.iterrows()]
     else:
-        for i, match_data in enumerate(top_matches, 1):
-            match = match_data[0] if isinstance(match_data, tuple) else match_data
-            details = match_data[1] if isinstance(match_data, tuple) else {}
-            match_name = match.get('Full Name', 'Unknown')
-            category_scores = details.get('category_scores', {})
-            ppf_score = category_scores.get('personal_professional_family', {}).get('score', 0)
-            fav_likes_score = category_scores.get('favorites_likes_hobbies', {}).get('score', 0)
-            others_score = category_scores.get('others', {}).get('score', 0)
-            
-            # Calculate total compatibility as average of three categories
-            total_score = (ppf_score + fav_likes_score + others_score) / 3
-            
-            message += f"{i}. {match_name} - {total_score:.1f}% overall compatibility\n"
-            message += f"  Breakdown:\n"
-            message += f"    - Personal, Professional & Family: {ppf_score:.1f}%\n"
-            message += f"    - Favorites, Likes & Hobbies: {fav_likes_score:.1f}%\n"
-            message += f"    - Other Requirement and Preferences: {others_score:.1f}%\n\n"
+        matches = [match_data if isinstance(match_data, tuple) else (match_data, {}) for match_data in top_matches]
+
+    for i, (match, details) in enumerate(matches, 1):
+        match_name = match.get('Full Name', 'Unknown')
+        # Categories as scored by the plan in force, labelled by explain_match
+        category_scores = list((details or {}).get('category_scores', {}).values())
+        
+        # Calculate total compatibility as average of the categories
+        total_score = sum(c.get('score', 0) for c in category_scores) / len(category_scores) if category_scores else 0.0
+        
+        message += f"{i}. {match_name} - {total_score:.1f}% overall compatibility\n"
+        message += f"  Breakdown:\n"
+        for category in category_scores:
+            message += f"    - {category.get('label', 'Category')}: {category.get('score', 0):.1f}%\n"
+        message += "\n"
     
     message += "Best regards,\nYour Matrimonial Matching Team"
     return message
@@ -2927,27 +2356,164 @@ def handle_errors_gracefully(func):
     return wrapper
 
 
+def render_match_pdfs(new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode=None, photos=None):
+    """
+    Create the user's last response PDF and the match PDFs; returns RenderedPdf list or None.
+    pdf_mode "combined" renders them all into one PDF (default: PDF_OUTPUT_MODE).
+    photos are prefetched images by Drive file id (see prefetch_profile_photos).
+    """
+    _render_context.photos = photos or {}
+    try:
+        return _render_match_pdfs(new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode)
+    finally:
+        _render_context.photos = {}
+
+
+def _render_match_pdfs(new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode):
+    if (pdf_mode or PDF_OUTPUT_MODE) == "combined":
+        logger.info("Creating combined profiles PDF...")
+        combined_pdf = create_combined_profiles_pdf(new_user, top_matches_df, top_percentages, email_col)
+        if combined_pdf:
+            log_pdf_sizes([combined_pdf])
+            return [combined_pdf]
+        logger.warning("Falling back to one PDF per profile")
+
+    # Step 5: Create last response PDF first
+    logger.info("Creating last response PDF...")
+    last_response_pdf = create_last_response_pdf(new_user, email_col)
+    if not last_response_pdf:
+        logger.error("Failed to create last response PDF")
+        return None
+    logger.info("Successfully created last response PDF")
+
+    # Step 6: Create individual PDFs for each match
+    logger.info("Creating individual PDF profiles...")
+    pdf_files = create_individual_match_pdfs(
+        top_matches_df, top_percentages, new_user_name, email_col
+    )
+
+    if not pdf_files:
+        logger.error("Failed to create any PDF files")
+        return None
+
+    # Add last response PDF to the list of files to send
+    pdf_files.append(last_response_pdf)
+    logger.info(f"Successfully created {len(pdf_files)} PDF files (including last response)")
+    log_pdf_sizes(pdf_files)
+    return pdf_files
+
+
+def log_pdf_sizes(pdf_files):
+    """Log the payload each registration mails and uploads, and what shared photos and compression account for"""
+    total = sum(len(pdf.data) for pdf in pdf_files)
+    deduplicated = sum(pdf.image_bytes_deduplicated for pdf in pdf_files)
+    compressed = sum(pdf.compression_bytes_saved for pdf in pdf_files)
+    logger.info(f"PDF payload: {total} bytes in {len(pdf_files)} file(s); "
+                f"{deduplicated} bytes saved by shared photos; "
+                f"compression makes it {compressed} bytes smaller than uncompressed (FPDF's default)")
+
+
+def render_match_pdfs_in_pool(new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode=None,
+                              photos=None):
+    """
+    render_match_pdfs in a warm render worker, or inline if the pool is
+    disabled, still starting or fails
+    """
+    try:
+        pool = get_render_pool(wait=False)
+        if pool is not None:
+            pdf_files = pool.render(new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode, photos)
+            if pdf_files:
+                return pdf_files
+            logger.warning("Render pool returned no PDFs; rendering inline")
+    except Exception as e:
+        logger.error(f"Render pool unavailable, rendering inline: {e}")
+    return render_match_pdfs(new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode, photos)
+
+
+def deliver_match_pdfs(new_user, new_user_name, new_user_email, new_user_whatsapp,
+                       new_user_birth_date, new_user_location, top_matches_df, pdf_files):
+    """Email the matches to the user and admin; returns True if the user email went out"""
+    # Step 7: Create personalized email message
+    logger.info("Creating email message...")
+    email_message = create_email_message(new_user_name, top_matches_df)
+    logger.info("Email message created successfully")
+
+    # Step 8: Send email with PDF attachments to user
+    logger.info(f"Sending email to {new_user_email}...")
+    email_sent = send_email_with_multiple_pdfs(
+        new_user_email, email_message, pdf_files, new_user_name, new_user_whatsapp, new_user_email, new_user_birth_date, new_user_location
+    )
+
+    if email_sent:
+        logger.info(
+            f"Successfully sent email with {len(pdf_files)} PDF attachments to {new_user_email}"
+        )
+
+        # Step 9: Send copy to admin
+        logger.info("Sending copy of user email to admin...")
+        admin_copy_sent = send_admin_copy_of_user_email(
+            new_user_name, new_user_email, email_message, pdf_files
+        )
+
+        if admin_copy_sent:
+            logger.info("Successfully sent admin copy of user email")
+        else:
+            logger.warning(
+                "Failed to send admin copy, but user email was successful"
+            )
+
+        # Step 10: Send last response and matches to admin
+        if pdf_files:
+            admin_notification_sent = send_admin_last_response_and_matches(
+                new_user,
+                new_user_name,
+                new_user_email,
+                pdf_files
+            )
+            
+            if admin_notification_sent:
+                logger.info("Successfully sent last response and matches to admin")
+            else:
+                logger.warning("Failed to send last response and matches to admin")
+
+    else:
+        logger.error(f"Failed to send email to {new_user_email}")
+
+    return email_sent
+
+
 @handle_errors_gracefully
-def process_new_matrimonial_registration():
+def process_new_matrimonial_registration(response_id=None, submission_count=None, pdf_mode=None,
+                                         email=None, submitted_at=None):
     """
     Main function to process a new matrimonial registration
     This function orchestrates the entire matching and notification process
+    
+    response_id with the respondent's email and submission time, or
+    submission_count, identify the submission being processed (see
+    fetch_data_for_submission) so the cached snapshot is refreshed only when
+    it doesn't contain it yet. pdf_mode overrides PDF_OUTPUT_MODE for this
+    registration.
     """
     try:
-        # Step 1: Fetch data from Google Sheets
+        # Step 1: Fetch data from Google Sheets, making sure the new submission is included
         logger.info("Starting matrimonial matching process...")
-        df = fetch_data_from_google_sheets()
+        submission = fetch_data_for_submission(response_id, submission_count, email, submitted_at)
 
-        if df is None or df.empty:
-            logger.error("No data retrieved from Google Sheets")
+        if submission is None:
+            # Never fall back to the newest cached row: it belongs to someone else
+            logger.error("Submission not available in Google Sheets; skipping without sending email")
             return False
+        snapshot, position = submission
 
-        logger.info(f"Retrieved {len(df)} records from Google Sheets")
-        logger.info(f"Columns in dataset: {df.columns.tolist()}")
+        logger.info(f"Retrieved {len(snapshot)} records from Google Sheets (snapshot v{snapshot.version})")
+        logger.info(f"Columns in dataset: {snapshot.columns.tolist()}")
 
-        # Step 2: Process the data and find matches
+        # Step 2: Process the data and find matches; match photos download from here on
         logger.info("Processing matrimonial data...")
-        result = process_matrimonial_data(df)
+        photo_downloads = {}
+        result = process_matrimonial_data(snapshot, target_position=position, photo_downloads=photo_downloads)
 
         if not result or len(result) < 6:
             logger.error("Failed to process matrimonial data or insufficient results")
@@ -2976,84 +2542,24 @@ def process_new_matrimonial_registration():
         log_match_results(new_user_name, new_user_email, top_matches_df)
 
         # Step 4: Find email column
-        possible_email_cols = [col for col in df.columns if "email" in col.lower()]
+        possible_email_cols = [col for col in snapshot.columns if "email" in col.lower()]
         email_col = possible_email_cols[0] if possible_email_cols else "Email"
         logger.info(f"Using email column: {email_col}")
 
-        # Step 5: Create last response PDF first
-        logger.info("Creating last response PDF...")
-        last_response_pdf = create_last_response_pdf(new_user, email_col)
-        if not last_response_pdf:
-            logger.error("Failed to create last response PDF")
-            return False
-        logger.info("Successfully created last response PDF")
-
-        # Step 6: Create individual PDFs for each match
-        logger.info("Creating individual PDF profiles...")
-        pdf_files = create_individual_match_pdfs(
-            top_matches_df, top_percentages, new_user_name, email_col
+        # Steps 5-6: Create the last response PDF and one PDF per match
+        photos = collect_prefetched_photos(photo_downloads)
+        pdf_files = render_match_pdfs_in_pool(
+            new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode, photos
         )
-
         if not pdf_files:
-            logger.error("Failed to create any PDF files")
             return False
 
-        # Add last response PDF to the list of files to send
-        pdf_files.append(last_response_pdf)
-        logger.info(f"Successfully created {len(pdf_files)} PDF files (including last response)")
-
-        # Step 7: Create personalized email message
-        logger.info("Creating email message...")
-        email_message = create_email_message(new_user_name, top_matches_df)
-        logger.info("Email message created successfully")
-
-        # Step 8: Send email with PDF attachments to user
-        logger.info(f"Sending email to {new_user_email}...")
-        email_sent = send_email_with_multiple_pdfs(
-            new_user_email, email_message, pdf_files, new_user_name, new_user_whatsapp, new_user_email, new_user_birth_date, new_user_location
+        # Steps 7-11: Email the user and admin, record the send, clean up
+        return deliver_match_pdfs(
+            new_user, new_user_name, new_user_email, new_user_whatsapp,
+            new_user_birth_date, new_user_location, top_matches_df, pdf_files
         )
 
-        if email_sent:
-            logger.info(
-                f"Successfully sent email with {len(pdf_files)} PDF attachments to {new_user_email}"
-            )
-
-            # Step 9: Send copy to admin
-            logger.info("Sending copy of user email to admin...")
-            admin_copy_sent = send_admin_copy_of_user_email(
-                new_user_name, new_user_email, email_message, pdf_files
-            )
-
-            if admin_copy_sent:
-                logger.info("Successfully sent admin copy of user email")
-            else:
-                logger.warning(
-                    "Failed to send admin copy, but user email was successful"
-                )
-
-            # Step 10: Send last response and matches to admin
-            if pdf_files:
-                admin_notification_sent = send_admin_last_response_and_matches(
-                    new_user,
-                    new_user_name,
-                    new_user_email,
-                    pdf_files
-                )
-                
-                if admin_notification_sent:
-                    logger.info("Successfully sent last response and matches to admin")
-                else:
-                    logger.warning("Failed to send last response and matches to admin")
-
-        else:
-            logger.error(f"Failed to send email to {new_user_email}")
-
-        # Step 11: Clean up temporary files
-        logger.info("Cleaning up temporary PDF files...")
-        cleanup_pdf_files(pdf_files)
-
-        return email_sent
-
     except Exception as e:
         logger.error(
             f"Critical error in matrimonial processing: {str(e)}", exc_info=True
@@ -3061,7 +2567,7 @@ def process_new_matrimonial_registration():
         return False
 
 
-def process_specific_user_by_email(user_email):
+def process_specific_user_by_email(user_email, pdf_mode=None):
     """
     Process matching for a specific user by their email address
     Useful for re-processing or testing specific cases
@@ -3069,12 +2575,13 @@ def process_specific_user_by_email(user_email):
     try:
         logger.info(f"Processing specific user: {user_email}")
 
-        # Fetch data from Google Sheets
-        df = fetch_data_from_google_sheets()
+        # Fetch data from Google Sheets; an existing user is already in any recent snapshot
+        snapshot = fetch_snapshot(allow_stale=True)
 
-        if df is None or df.empty:
+        if snapshot is None or snapshot.frame.empty:
             logger.error("No data retrieved from Google Sheets")
             return False
+        df = snapshot.frame
 
         # Find email column
         possible_email_cols = [col for col in df.columns if "email" in col.lower()]
@@ -3084,19 +2591,15 @@ def process_specific_user_by_email(user_email):
 
         email_col = possible_email_cols[0]
 
-        # Filter for specific user
-        user_mask = df[email_col].str.strip().str.lower() == user_email.strip().lower()
-        if not user_mask.any():
+        # Look the user up in the snapshot's email index
+        user_position = snapshot.find_by_email(user_email)
+        if user_position is None:
             logger.error(f"User with email {user_email} not found in the data")
             return False
 
-        # Move the specific user to the end (simulate new registration)
-        user_row = df[user_mask].copy()
-        other_rows = df[~user_mask].copy()
-        df_reordered = pd.concat([other_rows, user_row], ignore_index=True)
-
-        # Process the reordered data
-        result = process_matrimonial_data(df_reordered)
+        # Match the user as if they had just registered, against everyone else
+        photo_downloads = {}
+        result = process_matrimonial_data(snapshot, target_position=user_position, photo_downloads=photo_downloads)
 
         if not result or len(result) < 6:
             logger.error("Failed to process matrimonial data")
@@ -3121,100 +2624,35 @@ def process_specific_user_by_email(user_email):
         # Continue with PDF creation and email sending
         log_match_results(new_user_name, new_user_email, top_matches_df)
 
-        # Create PDFs and send emails
-        pdf_files = create_individual_match_pdfs(
-            top_matches_df, top_percentages, new_user_name, email_col
+        # Create PDFs and send emails the same way as for a new registration
+        photos = collect_prefetched_photos(photo_downloads)
+        pdf_files = render_match_pdfs_in_pool(
+            new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode, photos
         )
-
         if not pdf_files:
-            logger.error("Failed to create any PDF files")
             return False
 
-        # Create and send email
-        email_message = create_email_message(new_user_name, top_matches_df)
-        email_sent = send_email_with_multiple_pdfs(
-            new_user_email, email_message, pdf_files, new_user_name, new_user_whatsapp, new_user_email, new_user_birth_date, new_user_location, new_user
+        return deliver_match_pdfs(
+            new_user, new_user_name, new_user_email, new_user_whatsapp,
+            new_user_birth_date, new_user_location, top_matches_df, pdf_files
         )
 
-        if email_sent:
-            # Send admin copy
-            admin_copy_sent = send_admin_copy_of_user_email(
-                new_user_name, new_user_email, email_message, pdf_files
-            )
-
-            # Send last response and matches to admin
-            admin_notification_sent = send_admin_last_response_and_matches(
-                new_user,
-                new_user_name,
-                new_user_email,
-                pdf_files
-            )
-
-            # Clean up
-            cleanup_pdf_files(pdf_files)
-            return email_sent
-
     except Exception as e:
         logger.error(f"Error processing specific user: {str(e)}", exc_info=True)
         return False
 
-def upload_pdf_to_drive_and_get_url(pdf_filename, user_name):
-    """Upload PDF to Google Drive and return a shareable URL"""
+def upload_pdf_to_drive_and_get_url(pdf, user_name, upload_name=None):
+    """Upload a RenderedPdf to Google Drive and return a shareable URL"""
     try:
-        if not os.path.exists(pdf_filename):
-            logger.error(f"PDF file not found: {pdf_filename}")
+        if not pdf or not pdf.data:
+            logger.error(f"PDF has no content: {pdf}")
             return None
             
-        logger.info(f"Uploading PDF '{pdf_filename}' to Google Drive for user '{user_name}'")
-        
-        # Check if service account file exists
-        if not os.path.exists(DRIVE_SERVICE_ACCOUNT_FILE):
-            logger.error(f"Drive service account file not found: {DRIVE_SERVICE_ACCOUNT_FILE}")
-            return None
-        
-        # Create credentials for Google Drive
-        credentials = service_account.Credentials.from_service_account_file(
-            DRIVE_SERVICE_ACCOUNT_FILE, scopes=DRIVE_SCOPES
-        )
-        
-        # Build Drive service
-        drive_service = build("drive", "v3", credentials=credentials)
-        
-        # Create file metadata
-        file_metadata = {
-            'name': f"{user_name}_Last_Response_Profile.pdf",
-            'parents': []  # Will upload to root folder
-        }
-        
-        # Upload the file using MediaIoBaseUpload
-        with open(pdf_filename, 'rb') as file:
-            file_content = file.read()
-            media = MediaIoBaseUpload(
-                io.BytesIO(file_content),
-                mimetype='application/pdf',
-                resumable=True
-            )
-            
-            media = drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id'
-            ).execute()
-        
-        file_id = media.get('id')
-        logger.info(f"PDF uploaded to Drive with ID: {file_id}")
-        
-        # Make the file publicly accessible (anyone with the link can view)
-        drive_service.permissions().create(
-            fileId=file_id,
-            body={'type': 'anyone', 'role': 'reader'},
-            fields='id'
-        ).execute()
-        
-        # Get the shareable URL
-        shareable_url = f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
+        logger.info(f"Uploading PDF '{pdf.filename}' to {data_backend.name} storage for user '{user_name}'")
         
-        logger.info(f"Created shareable URL for PDF: {shareable_url}")
+        shareable_url = data_backend.upload_file(upload_name or f"{user_name}_Last_Response_Profile.pdf", pdf.data)
+        if shareable_url:
+            logger.info(f"Created shareable URL for PDF: {shareable_url}")
         return shareable_url
         
     except Exception as e:
@@ -3228,69 +2666,22 @@ def upload_multiple_pdfs_to_drive_and_get_urls(pdf_files, user_name):
             logger.warning("No PDF files provided for upload")
             return []
             
-        logger.info(f"Uploading {len(pdf_files)} PDFs to Google Drive for user '{user_name}'")
-        
-        # Check if service account file exists
-        if not os.path.exists(DRIVE_SERVICE_ACCOUNT_FILE):
-            logger.error(f"Drive service account file not found: {DRIVE_SERVICE_ACCOUNT_FILE}")
-            return []
-        
-        # Create credentials for Google Drive
-        credentials = service_account.Credentials.from_service_account_file(
-            DRIVE_SERVICE_ACCOUNT_FILE, scopes=DRIVE_SCOPES
-        )
-        
-        # Build Drive service
-        drive_service = build("drive", "v3", credentials=credentials)
-        
-        urls = []
+        logger.info(f"Uploading {len(pdf_files)} PDFs to {data_backend.name} storage for user '{user_name}'")
+        
+        # Empty PDFs keep their slot so URLs stay aligned with match numbers
+        uploads = []
+        positions = []
+        urls = [""] * len(pdf_files)
+        for i, pdf in enumerate(pdf_files, 1):
+            if not pdf or not pdf.data:
+                logger.warning(f"PDF has no content: {pdf}")
+                continue
+            uploads.append((f"{user_name}_Match_{i}.pdf", pdf.data, 'application/pdf'))
+            positions.append(i - 1)
         
-        for i, pdf_filename in enumerate(pdf_files, 1):
-            try:
-                if not os.path.exists(pdf_filename):
-                    logger.warning(f"PDF file not found: {pdf_filename}")
-                    urls.append("")
-                    continue
-                
-                # Create file metadata
-                file_metadata = {
-                    'name': f"{user_name}_Match_{i}.pdf",
-                    'parents': []  # Will upload to root folder
-                }
-                
-                # Upload the file using MediaIoBaseUpload
-                with open(pdf_filename, 'rb') as file:
-                    file_content = file.read()
-                    media = MediaIoBaseUpload(
-                        io.BytesIO(file_content),
-                        mimetype='application/pdf',
-                        resumable=True
-                    )
-                    
-                    media = drive_service.files().create(
-                        body=file_metadata,
-                        media_body=media,
-                        fields='id'
-                    ).execute()
-                
-                file_id = media.get('id')
-                logger.info(f"PDF {i} uploaded to Drive with ID: {file_id}")
-                
-                # Make the file publicly accessible (anyone with the link can view)
-                drive_service.permissions().create(
-                    fileId=file_id,
-                    body={'type': 'anyone', 'role': 'reader'},
-                    fields='id'
-                ).execute()
-                
-                # Get the shareable URL
-                shareable_url = f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
-                urls.append(shareable_url)
-                logger.info(f"Created shareable URL for PDF {i}: {shareable_url}")
-                
-            except Exception as e:
-                logger.error(f"Error uploading PDF {i} ({pdf_filename}) to Drive: {str(e)}")
-                urls.append("")
+        if uploads:
+            for position, url in zip(positions, data_backend.upload_files(uploads)):
+                urls[position] = url
         
         logger.info(f"Successfully uploaded {len([url for url in urls if url])} out of {len(pdf_files)} PDFs to Drive")
         return urls
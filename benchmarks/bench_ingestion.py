@@ -0,0 +1,121 @@
+"""
+Compare the two ways of ingesting the form responses sheet.
+
+values  the Sheets values().get JSON payload, decoded and turned into a DataFrame
+csv     the Drive CSV export, parsed by pandas' C parser (and pyarrow if installed)
+
+By default the payloads are synthesized offline so the parse cost can be
+measured without credentials. --live times the real endpoints instead.
+
+Usage:
+    python benchmarks/bench_ingestion.py --rows 1000 5000 20000
+    python benchmarks/bench_ingestion.py --live
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLUMNS = 60
+CHOICES = ["Yes", "No", "Prefer yes", "Not important", "", "Graduate", "Post Graduate", "Engineer",
+           "Doctor", "Business", "Gujarati", "Hindu", "Ahmedabad", "Mumbai", "Pune", "5-10 Lakhs"]
+
+
+def synthesize_values(rows, seed=1):
+    """A values().get style list of rows: header first, all strings, ragged tails"""
+    rnd = random.Random(seed)
+    header = ["Timestamp", "Email Address", "Full Name"] + [f"Question {i}" for i in range(COLUMNS - 3)]
+    values = [header]
+    for i in range(rows):
+        row = [f"1/{i % 28 + 1}/2025 10:{i % 60:02d}:00", f"user{i}@example.com", f"Person {i}"]
+        row += [rnd.choice(CHOICES) for _ in range(COLUMNS - 3)]
+        # The API drops trailing empty cells
+        while row and row[-1] == "":
+            row.pop()
+        values.append(row)
+    return values
+
+
+def to_csv_bytes(values):
+    width = len(values[0])
+    frame = pd.DataFrame([(row + [""] * width)[:width] for row in values[1:]], columns=values[0])
+    return frame.to_csv(index=False).encode("utf-8")
+
+
+def parse_values(payload):
+    values = json.loads(payload)["values"]
+    return pd.DataFrame(values[1:], columns=values[0])
+
+
+def parse_csv(payload, engine):
+    return pd.read_csv(io.BytesIO(payload), dtype=str, keep_default_na=False, engine=engine)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def csv_engines():
+    engines = ["c"]
+    try:
+        import pyarrow  # noqa: F401
+        engines.append("pyarrow")
+    except ImportError:
+        pass
+    return engines
+
+
+def bench_offline(row_counts, repeat):
+    print(f"{'rows':>8} {'payload':>10} {'method':>12} {'seconds':>9} {'speedup':>8}")
+    for rows in row_counts:
+        values = synthesize_values(rows)
+        json_payload = json.dumps({"range": "'Form Responses 1'!A1:BH", "majorDimension": "ROWS", "values": values}).encode("utf-8")
+        csv_payload = to_csv_bytes(values)
+
+        baseline = timed(lambda: parse_values(json_payload), repeat)
+        print(f"{rows:>8} {len(json_payload) // 1024:>8}KB {'values':>12} {baseline:>9.4f} {1.0:>7.1f}x")
+        for engine in csv_engines():
+            seconds = timed(lambda: parse_csv(csv_payload, engine), repeat)
+            print(f"{rows:>8} {len(csv_payload) // 1024:>8}KB {'csv-' + engine:>12} {seconds:>9.4f} {baseline / seconds:>7.1f}x")
+
+
+def bench_live(repeat):
+    import app
+
+    backend = app.create_data_backend("sheets")
+    for mode in ("values", "csv"):
+        backend.ingestion_mode = mode
+        frame = backend.read_responses_frame()
+        seconds = timed(backend.read_responses_frame, repeat)
+        print(f"{mode:>8}: {len(frame)} rows x {len(frame.columns)} columns in {seconds:.3f}s (median of {repeat})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="*", default=[1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="time the real Sheets and Drive endpoints")
+    args = parser.parse_args(argv)
+
+    if args.live:
+        bench_live(args.repeat)
+    else:
+        bench_offline(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
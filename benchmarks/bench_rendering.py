@@ -0,0 +1,277 @@
+"""
+Micro-benchmarks for the PDF rendering path.
+
+Synthetic profiles are rendered in five scenarios:
+
+plain       one match profile with short answers and no photo
+photo       the same profile with a photo (a local JPEG stands in for Drive)
+long        long caste, hobbies and preference answers that wrap
+registrant  the registrant's own two-page profile (create_last_response_pdf)
+combined    five matches and the registrant in one bookmarked document
+
+Each stage reports the median seconds of --repeat runs, the tracemalloc peak
+and net allocations of one more run, and the output bytes. Runs are measured
+after a warm-up render, so they show the steady state of a worker that has
+already loaded the logo and compiled the layout.
+
+--save-baseline stores the results in benchmarks/baselines/rendering.json;
+--check compares a run with it and exits 1 on a regression, so it can gate a
+deploy. Timings depend on the machine: save the baseline on the machine (or CI
+runner) that runs --check.
+
+Usage:
+    python benchmarks/bench_rendering.py
+    python benchmarks/bench_rendering.py --check
+    python benchmarks/bench_rendering.py --save-baseline
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baselines", "rendering.json")
+EMAIL_COL = "Email Address"
+# Slowdowns under this many seconds are scheduler noise at these sizes
+TIME_NOISE_FLOOR = 0.0005
+
+FAMILY = ["Father", "Mother", "Brother", "Sister", "Family type"]
+PREFERENCES = ["Own house", "Financially independent", "Higher studies", "Qualified professional",
+               "Small family", "Joint family", "Hobbies match", "Likes", "Dislikes", "Metro city"]
+LONG_CASTE = "Brahmin community of the north Gujarat region " * 3
+LONG_HOBBIES = "Reading historical fiction, classical music, trekking in the Himalayas, cooking " * 3
+LONG_PREFERENCE = "Someone who enjoys travelling, reading, music and spending time with family " * 2
+
+
+def columns():
+    cols = ["Timestamp", EMAIL_COL, "Full Name", "Gender", "Birth Date", "Birth Time", "Birth Place",
+            "Height", "Weight", "Religion", "Caste / Community / Tribe", "Mother Tongue", "Nationality",
+            "Education", "Qualification", "Occupation", "Annual Income"]
+    cols += [f"Family Information [{field}]" for field in FAMILY]
+    cols += ["Favorite hobbies"]
+    cols += [f"Requirements & Preferences [{field}]" for field in PREFERENCES]
+    cols += ["City", "State", "Country", "WhatsApp Number", "Upload your photo"]
+    return cols
+
+
+def synthesize_profiles(count=6, long_fields=False, photo=False):
+    """A frame of `count` complete profiles"""
+    rows = []
+    for i in range(count):
+        row = ["1/5/2025 10:00:00", f"user{i}@example.com", f"Person {i}", "Female" if i % 2 else "Male",
+               "12/04/1994", "10:30 AM", "Ahmedabad", "5'6\"", "60", "Hindu",
+               LONG_CASTE if long_fields else "Patel", "Gujarati", "Indian", "Post Graduate", "B.E.",
+               "Engineer", "10-20 Lakhs"]
+        row += ["Retired", "Homemaker", "Engineer", "Doctor", "Joint"]
+        row += [LONG_HOBBIES if long_fields else "Reading, music"]
+        row += [LONG_PREFERENCE if long_fields else "Prefer yes" for _ in PREFERENCES]
+        row += ["Ahmedabad", "Gujarat", "India", "9876543210",
+                f"https://drive.google.com/open?id=photo{i}" if photo else ""]
+        rows.append(row)
+    return pd.DataFrame(rows, columns=columns())
+
+
+def use_local_photo(app, directory):
+    """Serve every photo link from one synthetic JPEG instead of Google Drive"""
+    from PIL import Image
+
+    source = os.path.join(directory, "photo.jpg")
+    Image.new("RGB", (600, 800), (150, 110, 90)).save(source, quality=85)
+
+    def download(link, save_filename=None):
+        shutil.copyfile(source, save_filename)
+        return save_filename
+
+    app.download_drive_image = download
+
+
+def measure(run, setup=None, repeat=25):
+    """Median seconds, tracemalloc peak/net KB and the last result of run(setup())"""
+    run(setup() if setup else None)  # warm-up
+
+    samples = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        result = run(state)
+        samples.append(time.perf_counter() - started)
+
+    state = setup() if setup else None
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    run(state)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": round(statistics.median(samples), 5),
+        "peak_kb": round((peak - before) / 1024, 1),
+        "net_kb": round((after - before) / 1024, 1),
+    }, result
+
+
+def profile_stages(app, user, draw, create, repeat):
+    """draw / output / total stages for one profile renderer"""
+    def drawn():
+        pdf = app.EnhancedSinglePageMatchesPDF()
+        draw(pdf, user, EMAIL_COL)
+        return pdf
+
+    stages = {}
+    stages["draw"], _ = measure(lambda _: drawn(), repeat=repeat)
+    stages["output"], data = measure(lambda pdf: pdf.output(dest="S"), setup=drawn, repeat=repeat)
+    stages["output"]["bytes"] = len(data)
+    stages["total"], rendered = measure(lambda _: create(), repeat=repeat)
+    stages["total"]["bytes"] = len(rendered.data)
+    return stages
+
+
+def run_benchmarks(app, repeat):
+    plain = synthesize_profiles()
+    long = synthesize_profiles(long_fields=True)
+    with_photo = synthesize_profiles(photo=True)
+    results = {}
+
+    results["plain"] = profile_stages(
+        app, plain.iloc[1], app.draw_match_profile,
+        lambda: app.create_single_page_match_pdf(plain.iloc[1], 80.0, "Person 0", EMAIL_COL, 1), repeat)
+
+    results["long"] = profile_stages(
+        app, long.iloc[1], app.draw_match_profile,
+        lambda: app.create_single_page_match_pdf(long.iloc[1], 80.0, "Person 0", EMAIL_COL, 1), repeat)
+
+    def blank_page():
+        pdf = app.EnhancedSinglePageMatchesPDF()
+        pdf.add_page()
+        return pdf
+
+    results["photo"] = profile_stages(
+        app, with_photo.iloc[1], app.draw_match_profile,
+        lambda: app.create_single_page_match_pdf(with_photo.iloc[1], 80.0, "Person 0", EMAIL_COL, 1), repeat)
+    results["photo"]["add_photo"], _ = measure(
+        lambda pdf: app.add_enhanced_photo_to_pdf(pdf, with_photo.iloc[1], EMAIL_COL), setup=blank_page, repeat=repeat)
+
+    registrant = plain.iloc[[0]]
+    results["registrant"] = profile_stages(
+        app, registrant, app.draw_last_response_profile,
+        lambda: app.create_last_response_pdf(registrant, EMAIL_COL), repeat)
+
+    matches = with_photo.iloc[1:6]
+    results["combined"] = {}
+    results["combined"]["total"], rendered = measure(
+        lambda _: app.create_combined_profiles_pdf(with_photo.iloc[[0]], matches, [90.0, 85.0, 80.0, 75.0, 70.0], EMAIL_COL),
+        repeat=repeat)
+    results["combined"]["total"]["bytes"] = len(rendered.data)
+    return results
+
+
+def print_results(results, baseline=None):
+    print(f"{'scenario':<11} {'stage':<10} {'seconds':>9} {'peak KB':>9} {'net KB':>8} {'bytes':>8}  vs baseline")
+    for scenario, stages in results.items():
+        for stage, metrics in stages.items():
+            line = (f"{scenario:<11} {stage:<10} {metrics['seconds']:>9.5f} {metrics['peak_kb']:>9.1f} "
+                    f"{metrics['net_kb']:>8.1f} {metrics.get('bytes', ''):>8}")
+            base = (baseline or {}).get(scenario, {}).get(stage)
+            if base:
+                line += f"  time {metrics['seconds'] / base['seconds']:.2f}x, peak {metrics['peak_kb'] - base['peak_kb']:+.1f} KB"
+            print(line)
+
+
+def regressions(results, baseline, time_tolerance, memory_tolerance, bytes_tolerance):
+    """Human-readable list of metrics that grew past their tolerance"""
+    found = []
+    limits = (("seconds", time_tolerance), ("peak_kb", memory_tolerance), ("bytes", bytes_tolerance))
+    for scenario, stages in baseline.items():
+        for stage, base in stages.items():
+            current = results.get(scenario, {}).get(stage)
+            if current is None:
+                found.append(f"{scenario}/{stage}: missing from this run")
+                continue
+            for metric, tolerance in limits:
+                slack = TIME_NOISE_FLOOR if metric == "seconds" else 0
+                if metric in base and current.get(metric, 0) > base[metric] * (1 + tolerance) + slack:
+                    found.append(f"{scenario}/{stage}: {metric} {current[metric]} > {base[metric]} (+{tolerance:.0%} allowed)")
+    return found
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results):
+    import fpdf
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "python": platform.python_version(),
+        "fpdf": getattr(fpdf, "__version__", "unknown"),
+        "machine": platform.machine(),
+        "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=25)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a metric regressed past its tolerance")
+    parser.add_argument("--time-tolerance", type=float, default=0.5, help="allowed slowdown (0.5 = 50%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="allowed tracemalloc peak growth")
+    parser.add_argument("--bytes-tolerance", type=float, default=0.05, help="allowed output size growth")
+    args = parser.parse_args(argv)
+
+    # The app resolves the logo relative to the working directory and needs no
+    # credentials with the local backend
+    os.chdir(ROOT)
+    os.environ.setdefault("DATA_BACKEND", "local")
+    import app
+
+    logging.getLogger().setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as directory:
+        use_local_photo(app, directory)
+        results = run_benchmarks(app, args.repeat)
+
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline and baseline["results"])
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Saved baseline to {args.baseline}")
+    if args.check:
+        if baseline is None:
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            return 1
+        found = regressions(results, baseline["results"], args.time_tolerance,
+                            args.memory_tolerance, args.bytes_tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
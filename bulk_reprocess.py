@@ -0,0 +1,365 @@
+"""
+Re-send matches to many existing users at once.
+
+Targets are scored one at a time in the calling thread, each with its own
+process_matrimonial_data call, but all against one snapshot, so the index
+lookups, gender masks and field-score cache are shared. Each user's match
+photos download while the next user is scored, PDFs are rendered in a
+bounded pool of warm render workers and emails are delivered by a bounded
+thread pool. Progress is checkpointed to a JSON file after every
+user, so an interrupted job rerun with the same job id skips users already
+done.
+
+Usage:
+    python bulk_reprocess.py --emails a@example.com b@example.com
+    python bulk_reprocess.py --emails-file users.txt --job-id resend-june
+    python bulk_reprocess.py --since 2025-01-01 --until 2025-01-31
+"""
+
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import app
+from derived_columns import submitted_at
+from render_pool import RenderPool
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.getenv("BULK_CHECKPOINT_DIR", "bulk_jobs")
+RENDER_WORKERS = int(os.getenv("BULK_RENDER_WORKERS", "2"))
+DELIVER_WORKERS = int(os.getenv("BULK_DELIVER_WORKERS", "4"))
+# Scored users allowed to wait for rendering/delivery; bounds memory
+MAX_IN_FLIGHT_PER_WORKER = 2
+
+# Final per-user statuses; users in DONE_STATUSES are skipped on resume
+DONE_STATUSES = ("sent", "no_matches")
+
+
+def normalize_emails(emails):
+    """A list of emails from a list or a single email string; raises ValueError otherwise"""
+    if emails is None:
+        return None
+    if isinstance(emails, str):
+        emails = [emails]
+    if not isinstance(emails, (list, tuple)) or not all(isinstance(email, str) for email in emails):
+        raise ValueError("emails must be an email address or a list of them")
+    return list(emails)
+
+
+def select_emails(snapshot, emails=None, since=None, until=None):
+    """
+    Target emails, in order, from an explicit list or a submission date range.
+    `until` is inclusive; a bare date covers that whole day. Raises ValueError
+    without either, rather than selecting everyone.
+    """
+    if emails is not None:
+        seen = {}
+        for email in emails:
+            email = email.strip()
+            if email:
+                seen.setdefault(email.lower(), email)
+        return list(seen.values())
+
+    if not (since or until):
+        raise ValueError("Give emails or a since/until range to select users")
+
+    submitted = snapshot.derived("submitted_at", submitted_at)
+    in_range = ~np.isnat(submitted)
+    if since:
+        in_range &= submitted >= pd.Timestamp(since).to_datetime64()
+    if until:
+        end = pd.Timestamp(until)
+        if end == end.normalize() and len(str(until)) <= 10:
+            in_range &= submitted < (end + pd.Timedelta(days=1)).to_datetime64()
+        else:
+            in_range &= submitted <= end.to_datetime64()
+
+    email_col = next((col for col in snapshot.columns if "email" in col.lower()), None)
+    if email_col is None:
+        return []
+    return select_emails(snapshot, snapshot.frame.loc[in_range, email_col].astype(str).tolist())
+
+
+class BulkReprocessJob:
+    """
+    One bulk reprocessing run; safe to call progress() from other threads.
+    A new job needs emails or a since/until range; a job_id alone only
+    resumes that job's checkpoint. Raises ValueError otherwise.
+    """
+
+    def __init__(self, emails=None, since=None, until=None, job_id=None,
+                 render_workers=RENDER_WORKERS, deliver_workers=DELIVER_WORKERS,
+                 checkpoint_dir=CHECKPOINT_DIR, pdf_mode=None):
+        self.job_id = job_id or time.strftime("bulk-%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.emails = normalize_emails(emails) or None
+        self.since = since
+        self.until = until
+        self.render_workers = max(1, render_workers)
+        self.deliver_workers = max(1, deliver_workers)
+        self.pdf_mode = pdf_mode
+        self.checkpoint_path = os.path.join(checkpoint_dir, f"{self.job_id}.json")
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self.state = "pending"
+        self.targets = []
+        self.results = {}
+        self.skipped = 0
+        self.scored = 0
+        self.rendered = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        if not (self.emails or since or until) and not os.path.exists(self.checkpoint_path):
+            raise ValueError(f"No checkpoint for job {self.job_id}; give emails or a since/until range")
+
+    # Checkpointing
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save_checkpoint(self):
+        with self._lock:
+            data = {
+                "job_id": self.job_id,
+                "targets": self.targets,
+                "results": self.results,
+                "since": self.since,
+                "until": self.until,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+        with self._checkpoint_lock:
+            os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+            tmp_path = f"{self.checkpoint_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.checkpoint_path)
+
+    def _record(self, email, status, error=None):
+        with self._lock:
+            self.results[email] = {"status": status, "error": error, "at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        self._save_checkpoint()
+        if error:
+            logger.error(f"[{self.job_id}] {email}: {status} ({error})")
+        else:
+            logger.info(f"[{self.job_id}] {email}: {status}")
+
+    # Progress
+
+    def progress(self):
+        with self._lock:
+            statuses = [result["status"] for result in self.results.values()]
+            done = sum(status in DONE_STATUSES for status in statuses)
+            failed = len(statuses) - done
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at if self.started_at else 0.0
+            processed_now = done + failed - self.skipped
+            per_minute = processed_now / elapsed * 60 if elapsed > 0 else None
+            remaining = len(self.targets) - done - failed
+            return {
+                "job_id": self.job_id,
+                "state": self.state,
+                "total": len(self.targets),
+                "skipped_from_checkpoint": self.skipped,
+                "scored": self.scored,
+                "rendered": self.rendered,
+                "sent": statuses.count("sent"),
+                "no_matches": statuses.count("no_matches"),
+                "failed": failed,
+                "remaining": remaining,
+                "elapsed_seconds": round(elapsed, 1),
+                "users_per_minute": round(per_minute, 2) if per_minute else None,
+                "eta_seconds": round(remaining / per_minute * 60) if per_minute else None,
+                "failures": {email: result["error"] for email, result in self.results.items()
+                             if result["status"] not in DONE_STATUSES},
+                "checkpoint": self.checkpoint_path,
+                "error": self.error,
+            }
+
+    # Running
+
+    def run(self):
+        """Process every pending target; returns the final progress report"""
+        self.started_at = time.monotonic()
+        self.state = "running"
+        try:
+            self._run()
+            self.state = "finished"
+        except Exception as e:
+            logger.error(f"[{self.job_id}] Bulk reprocess failed: {e}", exc_info=True)
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self.finished_at = time.monotonic()
+        report = self.progress()
+        logger.info(f"[{self.job_id}] Bulk reprocess {self.state}: {report['sent']} sent, "
+                    f"{report['no_matches']} without matches, {report['failed']} failed")
+        return report
+
+    def _run(self):
+        snapshot = app.fetch_snapshot()
+        if snapshot is None or snapshot.frame.empty:
+            raise RuntimeError("No data retrieved from the data source")
+
+        checkpoint = self._load_checkpoint()
+        if checkpoint:
+            # Resume: keep the original target list so a date range can't shift under us
+            self.targets = checkpoint["targets"]
+            self.results = {email: result for email, result in checkpoint["results"].items()
+                            if result["status"] in DONE_STATUSES}
+            self.skipped = len(self.results)
+            logger.info(f"[{self.job_id}] Resuming: {self.skipped} of {len(self.targets)} users already done")
+        else:
+            self.targets = select_emails(snapshot, self.emails, self.since, self.until)
+        self._save_checkpoint()
+
+        pending = [email for email in self.targets if email not in self.results]
+        logger.info(f"[{self.job_id}] {len(pending)} users to process against snapshot v{snapshot.version}")
+        if not pending:
+            return
+
+        email_col = next((col for col in snapshot.columns if "email" in col.lower()), "Email")
+        in_flight = threading.BoundedSemaphore(self.render_workers * MAX_IN_FLIGHT_PER_WORKER)
+        deliveries = []
+
+        # The render pool is shut down first and waits for its recycled
+        # workers too, so every render callback has queued its delivery
+        # before the delivery pool stops accepting work
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.deliver_workers, thread_name_prefix="bulk-deliver"
+        ) as deliver_pool, RenderPool(workers=self.render_workers, health_interval=0) as render_pool:
+            def render(email, result, photo_downloads):
+                photos = app.collect_prefetched_photos(photo_downloads)
+                in_flight.acquire()
+                future = render_pool.submit(result[0], result[1], result[6], result[7], email_col, self.pdf_mode, photos)
+                future.add_done_callback(
+                    lambda f: self._queue_delivery(deliver_pool, deliveries, email, result, f, in_flight)
+                )
+
+            # Each user's photos download while the next user is scored
+            scored = None
+            for email in pending:
+                photo_downloads = {}
+                result = self._score(snapshot, email, photo_downloads)
+                if scored:
+                    render(*scored)
+                scored = (email, result, photo_downloads) if result is not None else None
+            if scored:
+                render(*scored)
+
+        for delivery in deliveries:
+            delivery.result()
+
+    def _score(self, snapshot, email, photo_downloads=None):
+        """Match one user against the snapshot; returns the match result or None when finished"""
+        try:
+            position = snapshot.find_by_email(email)
+            if position is None:
+                self._record(email, "not_found", "Email not found in the data")
+                return None
+            result = app.process_matrimonial_data(snapshot, target_position=position, photo_downloads=photo_downloads)
+            with self._lock:
+                self.scored += 1
+            if not result or result[6] is None or len(result[6]) == 0:
+                self._record(email, "no_matches")
+                return None
+            return result
+        except Exception as e:
+            self._record(email, "score_failed", str(e))
+            return None
+
+    def _queue_delivery(self, deliver_pool, deliveries, email, result, render_future, in_flight):
+        # Runs as a render future's done callback
+        try:
+            deliveries.append(deliver_pool.submit(self._deliver, email, result, render_future, in_flight))
+        except RuntimeError as e:
+            # The delivery pool has already shut down
+            self._record(email, "send_failed", f"Delivery could not be queued: {e}")
+            in_flight.release()
+
+    def _deliver(self, email, result, render_future, in_flight):
+        try:
+            try:
+                pdf_files = render_future.result()
+            except Exception as e:
+                self._record(email, "render_failed", str(e))
+                return
+            if not pdf_files:
+                self._record(email, "render_failed", "No PDF files were created")
+                return
+            with self._lock:
+                self.rendered += 1
+
+            new_user, name, user_email, whatsapp, birth_date, location, top_matches_df = result[:7]
+            try:
+                sent = app.deliver_match_pdfs(new_user, name, user_email, whatsapp, birth_date, location, top_matches_df, pdf_files)
+            except Exception as e:
+                self._record(email, "send_failed", str(e))
+                return
+            self._record(email, "sent" if sent else "send_failed", None if sent else "Email delivery failed")
+        finally:
+            in_flight.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-send matches to existing users")
+    parser.add_argument("--emails", nargs="*", help="Emails of users to reprocess")
+    parser.add_argument("--emails-file", help="File with one email per line")
+    parser.add_argument("--since", help="Reprocess users who submitted on or after this date")
+    parser.add_argument("--until", help="Reprocess users who submitted on or before this date")
+    parser.add_argument("--job-id", help="Job id; reuse one to resume an interrupted job")
+    parser.add_argument("--render-workers", type=int, default=RENDER_WORKERS)
+    parser.add_argument("--deliver-workers", type=int, default=DELIVER_WORKERS)
+    parser.add_argument("--pdf-mode", choices=["separate", "combined"],
+                        help="one PDF per profile or a single combined PDF (default: PDF_OUTPUT_MODE)")
+    args = parser.parse_args(argv)
+
+    emails = list(args.emails or [])
+    if args.emails_file:
+        with open(args.emails_file) as f:
+            emails += [line.strip() for line in f if line.strip()]
+    if not emails and not (args.since or args.until) and not args.job_id:
+        parser.error("give --emails/--emails-file, a --since/--until range, or a --job-id to resume")
+
+    try:
+        job = BulkReprocessJob(
+            emails=emails or None,
+            since=args.since,
+            until=args.until,
+            job_id=args.job_id,
+            render_workers=args.render_workers,
+            deliver_workers=args.deliver_workers,
+            pdf_mode=args.pdf_mode,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    reporter_done = threading.Event()
+
+    def report_progress():
+        while not reporter_done.wait(10):
+            progress = job.progress()
+            logger.info(f"[{job.job_id}] {progress['sent'] + progress['no_matches'] + progress['failed']}/{progress['total']} done, "
+                        f"{progress['failed']} failed, {progress['users_per_minute']} users/min, ETA {progress['eta_seconds']}s")
+
+    threading.Thread(target=report_progress, daemon=True).start()
+    report = job.run()
+    reporter_done.set()
+    print(json.dumps(report, indent=2))
+    return 0 if report["state"] == "finished" and not report["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+"""
+Data sources and sinks used by the matching pipeline.
+
+SheetsBackend talks to Google Sheets, Drive and Gmail SMTP exactly as the
+pipeline always has. LocalBackend reads form responses from a CSV, Parquet or
+SQLite file and writes target-sheet rows, "Drive" uploads and outgoing emails
+to a local directory, so the whole pipeline can run offline for benchmarks and
+load tests.
+
+Both backends return sheet values the way the Sheets API does: a list of rows,
+each a list of strings, with the header as the first row of a full read.
+"""
+
+import csv
+import io
+import logging
+import os
+import smtplib
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+from google_api_gateway import gateway, project_for
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+logger = logging.getLogger(__name__)
+
+RESPONSES_TABLE = "form_responses"
+CSV_EXPORT_SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
+TARGET_HEADER = ["Sr No", "Name", "WhatsApp Number", "Email", "Birth Date", "Location", "PDF URL",
+                 "Top1 URL", "Top2 URL", "Top3 URL", "Top4 URL", "Top5 URL", "Email Text"]
+
+
+def read_csv_frame(source):
+    """Parse CSV into an all-string frame with the fastest available parser"""
+    return pd.read_csv(source, dtype=str, keep_default_na=False, engine=CSV_ENGINE)
+
+
+class DataBackend:
+    """Interface shared by the Sheets and local backends"""
+
+    name = "base"
+
+    def read_responses(self):
+        """All form responses including the header row, or [] if there are none"""
+        raise NotImplementedError
+
+    def read_responses_from(self, first_row):
+        """Form responses starting at 1-based sheet row `first_row` (row 1 is the header)"""
+        raise NotImplementedError
+
+    def read_responses_frame(self):
+        """All form responses as a DataFrame, or None if there is no header"""
+        values = self.read_responses()
+        if not values:
+            return None
+        return pd.DataFrame(values[1:], columns=values[0])
+
+    def count_responses(self):
+        """Number of form submissions, excluding the header row"""
+        raise NotImplementedError
+
+    def read_target_rows(self):
+        """All rows of the target sheet including its header row"""
+        raise NotImplementedError
+
+    def append_target_row(self, row):
+        """Append one row to the target sheet"""
+        raise NotImplementedError
+
+    def upload_files(self, files):
+        """
+        Upload (name, content bytes, mimetype) tuples and return one shareable
+        URL per file, "" for files that failed to upload.
+        """
+        raise NotImplementedError
+
+    def upload_file(self, name, content, mimetype="application/pdf"):
+        urls = self.upload_files([(name, content, mimetype)])
+        return urls[0] if urls and urls[0] else None
+
+    def send_email(self, msg, sender_email, sender_password):
+        """Deliver an email.message message; raises on failure"""
+        raise NotImplementedError
+
+
+class SheetsBackend(DataBackend):
+    """
+    Google Sheets for responses and results, Google Drive for uploads. Every
+    request goes through the shared rate-limited, retrying API gateway.
+
+    With ingestion_mode="csv" full reads download the response sheet through
+    the Drive CSV export and parse it with pandas' C or pyarrow parser instead
+    of decoding the values().get JSON. The export covers the first sheet of the
+    spreadsheet, which must be the form responses sheet.
+    """
+
+    name = "sheets"
+
+    def __init__(self, service_account_file, scopes, spreadsheet_id, sheet_name, last_column, range_name,
+                 target_service_account_file, target_scopes, target_spreadsheet_id, target_range_name,
+                 drive_service_account_file, drive_scopes, ingestion_mode="values"):
+        self.service_account_file = service_account_file
+        self.scopes = scopes
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.last_column = last_column
+        self.range_name = range_name
+        self.target_service_account_file = target_service_account_file
+        self.target_scopes = target_scopes
+        self.target_spreadsheet_id = target_spreadsheet_id
+        self.target_range_name = target_range_name
+        self.drive_service_account_file = drive_service_account_file
+        self.drive_scopes = drive_scopes
+        self.ingestion_mode = ingestion_mode
+
+    @staticmethod
+    def _service(api, version, account_file, scopes):
+        # Imported lazily so the local backend works without the Google client libraries
+        from googleapiclient.discovery import build
+        from google.oauth2 import service_account
+
+        if not os.path.exists(account_file):
+            raise FileNotFoundError(f"Service account file not found: {account_file}")
+        credentials = service_account.Credentials.from_service_account_file(account_file, scopes=scopes)
+        return build(api, version, credentials=credentials)
+
+    def _get_values(self, spreadsheet_id, range_name, account_file, scopes):
+        sheet = self._service("sheets", "v4", account_file, scopes).spreadsheets()
+        result = gateway.execute(
+            sheet.values().get(spreadsheetId=spreadsheet_id, range=range_name),
+            "sheets.values.get", "sheets_read", project_for(account_file),
+        )
+        return result.get("values", [])
+
+    def read_responses(self):
+        logger.info(f"Fetching data from spreadsheet ID: {self.spreadsheet_id}")
+        return self._get_values(self.spreadsheet_id, self.range_name, self.service_account_file, self.scopes)
+
+    def read_responses_from(self, first_row):
+        delta_range = f"{self.sheet_name}!A{first_row}:{self.last_column}"
+        return self._get_values(self.spreadsheet_id, delta_range, self.service_account_file, self.scopes)
+
+    def read_responses_frame(self):
+        if self.ingestion_mode != "csv":
+            return super().read_responses_frame()
+        logger.info(f"Exporting spreadsheet {self.spreadsheet_id} as CSV")
+        drive_service = self._service("drive", "v3", self.service_account_file, CSV_EXPORT_SCOPES)
+        content = gateway.execute(
+            drive_service.files().export_media(fileId=self.spreadsheet_id, mimeType="text/csv"),
+            "drive.files.export", "drive", project_for(self.service_account_file),
+        )
+        if not content:
+            return None
+        return read_csv_frame(io.BytesIO(content))
+
+    def count_responses(self):
+        values = self._get_values(self.spreadsheet_id, f"{self.sheet_name}!A:A", self.service_account_file, self.scopes)
+        return max(0, len(values) - 1) if values else 0
+
+    def read_target_rows(self):
+        return self._get_values(self.target_spreadsheet_id, self.target_range_name,
+                                self.target_service_account_file, self.target_scopes)
+
+    def append_target_row(self, row):
+        sheet = self._service("sheets", "v4", self.target_service_account_file, self.target_scopes).spreadsheets()
+        request = sheet.values().append(
+            spreadsheetId=self.target_spreadsheet_id,
+            range=self.target_range_name,
+            valueInputOption="RAW",
+            insertDataOption="INSERT_ROWS",
+            body={"values": [row]},
+        )
+        gateway.execute(request, "sheets.values.append", "sheets_write", project_for(self.target_service_account_file))
+
+    def upload_files(self, files):
+        from googleapiclient.http import MediaIoBaseUpload
+
+        drive_service = self._service("drive", "v3", self.drive_service_account_file, self.drive_scopes)
+        project = project_for(self.drive_service_account_file)
+        urls = []
+        for name, content, mimetype in files:
+            try:
+                media = MediaIoBaseUpload(io.BytesIO(content), mimetype=mimetype, resumable=True)
+                request = drive_service.files().create(
+                    body={"name": name, "parents": []},  # Uploads to the root folder
+                    media_body=media,
+                    fields="id",
+                )
+                created = gateway.execute(request, "drive.files.create", "drive", project)
+                file_id = created.get("id")
+                logger.info(f"Uploaded '{name}' to Drive with ID: {file_id}")
+
+                # Make the file publicly accessible (anyone with the link can view)
+                request = drive_service.permissions().create(
+                    fileId=file_id,
+                    body={"type": "anyone", "role": "reader"},
+                    fields="id",
+                )
+                gateway.execute(request, "drive.permissions.create", "drive", project)
+                urls.append(f"https://drive.google.com/file/d/{file_id}/view?usp=sharing")
+            except Exception as e:
+                logger.error(f"Error uploading '{name}' to Drive: {e}")
+                urls.append("")
+        return urls
+
+    def send_email(self, msg, sender_email, sender_password):
+        with smtplib.SMTP("smtp.gmail.com", 587) as server:
+            server.starttls()
+            server.login(sender_email, sender_password)
+            server.send_message(msg)
+
+
+class LocalBackend(DataBackend):
+    """
+    Files under `data_dir`:
+
+    responses.parquet / responses.sqlite / responses.csv
+                     form responses (first one found; override with responses_file),
+                     SQLite reads the form_responses table
+    target.csv       rows appended by append_target_row (header written on creation)
+    drive/           uploaded files, returned as file:// URLs
+    outbox/          sent emails as .eml files
+    """
+
+    name = "local"
+
+    def __init__(self, data_dir, responses_file=None):
+        self.data_dir = Path(data_dir)
+        self.responses_file = Path(responses_file) if responses_file else self._find_responses_file()
+        self.target_file = self.data_dir / "target.csv"
+        self.upload_dir = self.data_dir / "drive"
+        self.outbox_dir = self.data_dir / "outbox"
+        self._lock = threading.Lock()
+
+    def _find_responses_file(self):
+        for name in ("responses.parquet", "responses.sqlite", "responses.csv"):
+            path = self.data_dir / name
+            if path.exists():
+                return path
+        return self.data_dir / "responses.csv"
+
+    def _load_responses(self):
+        path = self.responses_file
+        if not path.exists():
+            logger.error(f"Local responses file not found: {path}")
+            return None
+        if path.suffix == ".parquet":
+            df = pd.read_parquet(path)
+        elif path.suffix in (".sqlite", ".db"):
+            with sqlite3.connect(path) as conn:
+                df = pd.read_sql(f"SELECT * FROM {RESPONSES_TABLE}", conn)
+        else:
+            df = read_csv_frame(path)
+        # Sheets hands back strings only
+        df = df.fillna("").astype(str)
+        return df
+
+    def read_responses(self):
+        df = self._load_responses()
+        if df is None:
+            return []
+        return [list(df.columns)] + df.values.tolist()
+
+    def read_responses_frame(self):
+        return self._load_responses()
+
+    def read_responses_from(self, first_row):
+        values = self.read_responses()
+        return values[first_row - 1:]
+
+    def count_responses(self):
+        df = self._load_responses()
+        return 0 if df is None else len(df)
+
+    def read_target_rows(self):
+        if not self.target_file.exists():
+            return []
+        with open(self.target_file, newline="", encoding="utf-8") as f:
+            return list(csv.reader(f))
+
+    def append_target_row(self, row):
+        with self._lock:
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            is_new = not self.target_file.exists()
+            with open(self.target_file, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if is_new:
+                    writer.writerow(TARGET_HEADER)
+                writer.writerow(row)
+
+    def upload_files(self, files):
+        urls = []
+        for name, content, mimetype in files:
+            try:
+                self.upload_dir.mkdir(parents=True, exist_ok=True)
+                # Prefix with a random id like Drive does, so repeated names never collide
+                path = self.upload_dir / f"{uuid.uuid4().hex[:12]}_{name}"
+                path.write_bytes(content)
+                urls.append(path.resolve().as_uri())
+            except Exception as e:
+                logger.error(f"Error saving '{name}' to {self.upload_dir}: {e}")
+                urls.append("")
+        return urls
+
+    def send_email(self, msg, sender_email, sender_password):
+        self.outbox_dir.mkdir(parents=True, exist_ok=True)
+        path = self.outbox_dir / f"{uuid.uuid4().hex}.eml"
+        path.write_bytes(msg.as_bytes())
+        logger.info(f"Saved email to {msg.get('To')} as {path}")
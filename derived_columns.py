@@ -0,0 +1,150 @@
+"""
+Typed columns derived from free-text profile answers.
+
+Age in years (from Birth Date), height in cm and the submission time (from
+the form's Timestamp) are parsed with vectorized pandas string operations.
+Each is computed once per ProfileSnapshot through snapshot.derived(), so the
+scoring plan's age/height gap filters and submission lookups compare arrays
+instead of re-parsing cells per row:
+
+    heights = snapshot.derived("height_cm", height_cm)
+
+Unparsable or missing answers are NaN (NaT for times).
+"""
+
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Candidate formats for the Birth Date answer, most common first
+BIRTH_DATE_FORMATS = ["%d/%m/%Y", "%m/%d/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%m/%d/%y"]
+# Formats Google Sheets writes the form's Timestamp in, by spreadsheet locale
+TIMESTAMP_FORMATS = ["%m/%d/%Y %H:%M:%S", "%d/%m/%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%d.%m.%Y %H:%M:%S"]
+DATE_FORMAT_SAMPLE_SIZE = 200
+DAYS_PER_YEAR = 365.2425
+CM_PER_FOOT = 30.48
+CM_PER_INCH = 2.54
+# Bare numbers below this are feet[.inches] ("5.6" is 5 ft 6 in), not cm
+MAX_FEET = 9
+
+# Detected Birth Date format per column; re-detected if it stops fitting
+_date_format_cache = {}
+_date_format_lock = threading.Lock()
+
+
+def _find_column(columns, *keywords, exclude=()):
+    for col in columns:
+        lowered = str(col).lower()
+        if all(k in lowered for k in keywords) and not any(x in lowered for x in exclude):
+            return col
+    return None
+
+
+def _text(df, col):
+    # astype(object) first: fillna("") would fail on a categorical without "" as a category
+    return df[col].astype(object).fillna("").astype(str).str.strip()
+
+
+def detect_date_format(values, cache_key=None, formats=BIRTH_DATE_FORMATS):
+    """Pick the strptime format that parses most of a sample of date answers"""
+    sample = values[values != ""].head(DATE_FORMAT_SAMPLE_SIZE)
+    if sample.empty:
+        return None
+
+    cached = _date_format_cache.get(cache_key) if cache_key is not None else None
+    if cached:
+        parsed = pd.to_datetime(sample, format=cached, errors="coerce")
+        if parsed.notna().mean() >= 0.5:
+            return cached
+
+    best_format, best_rate = None, 0.0
+    for fmt in formats:
+        rate = pd.to_datetime(sample, format=fmt, errors="coerce").notna().mean()
+        if rate > best_rate:
+            best_format, best_rate = fmt, rate
+    if best_format and cache_key is not None:
+        with _date_format_lock:
+            _date_format_cache[cache_key] = best_format
+        if cached and cached != best_format:
+            logger.warning(f"Birth date format for {cache_key} changed from {cached} to {best_format}")
+    return best_format
+
+
+def parse_age_years(values, date_format, today=None):
+    """Age in fractional years for every birth date answer (NaN if unparsable)"""
+    if date_format is None:
+        return np.full(len(values), np.nan)
+    births = pd.to_datetime(values, format=date_format, errors="coerce")
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    days = (today - births).dt.days.to_numpy(dtype=np.float64, na_value=np.nan)
+    return days / DAYS_PER_YEAR
+
+
+def parse_height_cm(values):
+    """Height in cm from answers like 5'6", 5 ft 6 in, 5.6 (5 ft 6 in), 165 or 165 cm"""
+    lowered = values.str.lower().str.strip()
+    feet_inches = lowered.str.extract(r"^(\d+)\s*(?:'|ft|feet)\s*(\d+(?:\.\d+)?)?")
+    feet = pd.to_numeric(feet_inches[0], errors="coerce")
+    inches = pd.to_numeric(feet_inches[1], errors="coerce").fillna(0.0)
+    imperial = feet * CM_PER_FOOT + inches * CM_PER_INCH
+
+    # A bare "5.6" or "5.10" means feet.inches; the digits after the point are inches
+    dotted = lowered.str.extract(r"^(\d)(?:\.(\d{1,2}))?$")
+    dotted_feet = pd.to_numeric(dotted[0], errors="coerce")
+    dotted_feet = dotted_feet.where(dotted_feet <= MAX_FEET)
+    dotted_inches = pd.to_numeric(dotted[1], errors="coerce").fillna(0.0)
+    dotted_inches = dotted_inches.where(dotted_inches < 12)
+    imperial = imperial.fillna(dotted_feet * CM_PER_FOOT + dotted_inches * CM_PER_INCH)
+
+    metric = pd.to_numeric(lowered.str.extract(r"^(\d+(?:\.\d+)?)\s*(?:cm)?$")[0], errors="coerce")
+    metric = metric.where(metric > MAX_FEET)
+    return imperial.fillna(metric).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _missing(df):
+    return np.full(len(df), np.nan)
+
+
+def age_years(df):
+    """Age in years of every profile, from its Birth Date answer"""
+    col = _find_column(df.columns, "birth", "date")
+    if col is None:
+        return _missing(df)
+    values = _text(df, col)
+    return parse_age_years(values, detect_date_format(values, col))
+
+
+def submitted_at(df):
+    """
+    Submission time of every response, from the Timestamp column, in the
+    spreadsheet's time zone (NaT if unparsable)
+    """
+    col = _find_column(df.columns, "timestamp")
+    if col is None:
+        return np.full(len(df), np.datetime64("NaT"), dtype="datetime64[ns]")
+    values = _text(df, col)
+    date_format = detect_date_format(values, col, TIMESTAMP_FORMATS)
+    if date_format is None:
+        return np.full(len(df), np.datetime64("NaT"), dtype="datetime64[ns]")
+    return pd.to_datetime(values, format=date_format, errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+
+def height_cm(df):
+    col = _find_column(df.columns, "height", exclude=("preference",))
+    return parse_height_cm(_text(df, col)) if col is not None else _missing(df)
+
+
+def gap_mask(values, position, max_gap):
+    """
+    Rows whose value is within max_gap of the row at `position`. Rows without
+    a value pass, and everything passes if that row has none.
+    """
+    target = values[position]
+    if max_gap is None or np.isnan(target):
+        return np.ones(len(values), dtype=bool)
+    return np.isnan(values) | (np.abs(values - target) <= max_gap)
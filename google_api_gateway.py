@@ -0,0 +1,190 @@
+"""
+Single gateway for Google API requests.
+
+Every googleapiclient request goes through GoogleApiGateway.execute, which
+  - waits on a token bucket per (Cloud project, quota group) so bursts of
+    registrations queue up instead of tripping Sheets/Drive quotas,
+  - retries 429, 5xx, rate-limit 403s and connection errors with exponential
+    backoff and full jitter,
+  - records per-endpoint call, retry, error and latency counters.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Requests per second and burst size per project. Sheets allows 60 read and
+# 60 write requests per minute per user; Drive is far more generous.
+QUOTAS = {
+    "sheets_read": (1.0, 10),
+    "sheets_write": (1.0, 5),
+    "drive": (10.0, 20),
+}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded")
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_CAP = 32.0  # seconds
+
+
+class TokenBucket:
+    """Blocking token bucket; callers that find it empty wait their turn"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until it is available; returns the seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token even if it isn't there yet, so waiters are served in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.queued_seconds = 0.0
+        self.last_error = None
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_seconds": round(self.total_seconds / self.calls, 3) if self.calls else None,
+            "max_seconds": round(self.max_seconds, 3),
+            "queued_seconds": round(self.queued_seconds, 3),
+            "last_error": self.last_error,
+        }
+
+
+def _error_status(error):
+    return getattr(getattr(error, "resp", None), "status", None)
+
+
+def is_retryable(error):
+    """True for quota, server and connection errors worth retrying"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    status = _error_status(error)
+    if status is None:
+        return False
+    status = int(status)
+    if status in RETRYABLE_STATUSES:
+        return True
+    if status != 403:
+        return False
+    content = getattr(error, "content", b"") or b""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", "replace")
+    return any(reason in content for reason in RATE_LIMIT_REASONS)
+
+
+def project_for(service_account_file):
+    """Cloud project of a service account file; quotas are enforced per project"""
+    try:
+        with open(service_account_file) as f:
+            return json.load(f).get("project_id") or service_account_file
+    except Exception:
+        return service_account_file
+
+
+class GoogleApiGateway:
+    def __init__(self, quotas=None, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_cap=BACKOFF_CAP):
+        self.quotas = dict(QUOTAS if quotas is None else quotas)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, project, group):
+        key = (project, group)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, capacity = self.quotas[group]
+                bucket = self._buckets[key] = TokenBucket(rate, capacity)
+            return bucket
+
+    def _endpoint(self, endpoint):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = _EndpointStats()
+            return stats
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def execute(self, request, endpoint, group, project="default"):
+        """
+        Execute a googleapiclient request under the rate limit, retrying
+        transient failures. Raises the last error once retries run out.
+        """
+        bucket = self._bucket(project, group)
+        stats = self._endpoint(endpoint)
+        attempt = 0
+        while True:
+            queued = bucket.acquire()
+            started = time.monotonic()
+            try:
+                result = request.execute()
+                error = None
+            except Exception as e:
+                result, error = None, e
+            elapsed = time.monotonic() - started
+
+            with self._lock:
+                stats.calls += 1
+                stats.total_seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+                stats.queued_seconds += queued
+                if error is not None:
+                    stats.errors += 1
+                    stats.last_error = f"{type(error).__name__}: {_error_status(error) or error}"
+
+            if error is None:
+                return result
+            if attempt >= self.max_retries or not is_retryable(error):
+                raise error
+
+            delay = self.backoff_delay(attempt)
+            attempt += 1
+            with self._lock:
+                stats.retries += 1
+            logger.warning(f"{endpoint} failed ({_error_status(error) or error}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self._stats.items())}
+
+
+# Shared by every thread in the process
+gateway = GoogleApiGateway()
+
+
+def google_api_stats():
+    return gateway.stats()
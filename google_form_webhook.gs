@@ -30,6 +30,9 @@ function onFormSubmit(e) {
       formTitle: formTitle,
       responseId: responseId,
       createTime: timestamp.toISOString(),
+      // The server finds this response's sheet row by email and the Timestamp the sheet shows
+      respondentEmail: formResponse.getRespondentEmail(),
+      sheetTimestamp: Utilities.formatDate(timestamp, sheetTimeZone(form), "yyyy-MM-dd'T'HH:mm:ss"),
       submissionData: {
         timestamp: timestamp.toISOString(),
         responseId: responseId
@@ -63,6 +66,18 @@ function onFormSubmit(e) {
   }
 }
 
+/**
+ * Time zone of the form's response spreadsheet, in which its Timestamp column is written
+ */
+function sheetTimeZone(form) {
+  try {
+    return SpreadsheetApp.openById(form.getDestinationId()).getSpreadsheetTimeZone();
+  } catch (error) {
+    console.error('Error reading the response sheet time zone:', error);
+    return Session.getScriptTimeZone();
+  }
+}
+
 /**
  * Send webhook notification to the server
  */
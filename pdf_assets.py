@@ -0,0 +1,146 @@
+"""
+Static artwork shared by every generated PDF.
+
+FPDF reads and decodes an image file the first time each document uses it,
+so the 93 KB logo used to be parsed once per PDF (and PIL-opened once per
+page to get its aspect ratio). Assets here are decoded once per process; each
+document gets a shallow copy of the decoded image info, which FPDF then
+treats as an image it has already parsed. Downloaded photos go through the
+same path, keyed by a hash of their content.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from fpdf import FPDF
+
+logger = logging.getLogger(__name__)
+
+# Static art preloaded at process start
+STATIC_ASSETS = ("logo.png",)
+# Decoded photos kept by content hash, shared by the documents of a job
+IMAGE_CACHE_SIZE = int(os.getenv("PDF_IMAGE_CACHE_SIZE", "64"))
+
+
+class PdfAsset:
+    """A decoded image ready to be placed in any FPDF document"""
+
+    def __init__(self, name, path, info, pdf_version):
+        self.name = name
+        # Key of the image in a document's image table
+        self.path = path
+        self.info = info
+        # Images with an alpha channel need PDF 1.4 soft masks
+        self.pdf_version = pdf_version
+        self.width_px = info["w"]
+        self.height_px = info["h"]
+
+    @property
+    def aspect_ratio(self):
+        return self.height_px / self.width_px
+
+    def height_for(self, width):
+        """Height that keeps the aspect ratio at the given width"""
+        return width * self.aspect_ratio
+
+    def place(self, pdf, x=None, y=None, w=0, h=0):
+        """Draw the asset on the current page of `pdf` without re-reading the file"""
+        if self.path not in pdf.images:
+            # FPDF deletes the image data from its info once the document is
+            # written, so each document gets its own copy of the dict
+            info = dict(self.info)
+            info["i"] = len(pdf.images) + 1
+            pdf.images[self.path] = info
+            if pdf.pdf_version < self.pdf_version:
+                pdf.pdf_version = self.pdf_version
+        pdf.image(self.path, x=x, y=y, w=w, h=h)
+
+
+def _parse_image(path):
+    """FPDF's image info for a file, and the PDF version the image requires"""
+    parser = FPDF()
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jpg", ".jpeg"):
+        info = parser._parsejpg(path)
+    elif ext == ".png":
+        info = parser._parsepng(path)
+    else:
+        info = parser._parsegif(path)
+    return info, parser.pdf_version
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class AssetRegistry:
+    def __init__(self, image_cache_size=IMAGE_CACHE_SIZE):
+        self._assets = {}
+        self._lock = threading.Lock()
+        self._images = OrderedDict()
+        self._image_cache_size = image_cache_size
+
+    def load(self, name, path=None):
+        """Decode an image file and register it under `name`; returns the asset or None"""
+        path = os.path.abspath(path or name)
+        try:
+            asset = PdfAsset(name, path, *_parse_image(path))
+        except FileNotFoundError:
+            logger.warning(f"PDF asset {name} not found at {path}")
+            return None
+        except Exception as e:
+            logger.error(f"Could not load PDF asset {name} from {path}: {e}")
+            return None
+        with self._lock:
+            self._assets[name] = asset
+        logger.info(f"Loaded PDF asset {name} ({asset.width_px}x{asset.height_px}px)")
+        return asset
+
+    def get(self, name):
+        """The registered asset, loading it on first use if it wasn't preloaded"""
+        asset = self._assets.get(name)
+        if asset is None and name not in self._assets:
+            asset = self.load(name)
+            if asset is None:
+                # Remember the miss so a missing file isn't looked up for every page
+                with self._lock:
+                    self._assets.setdefault(name, None)
+        return asset
+
+    def preload(self, names=STATIC_ASSETS):
+        for name in names:
+            if name not in self._assets:
+                self.get(name)
+
+    def from_file(self, path):
+        """
+        Asset for an image file, keyed by its content: identical files (the
+        same photo downloaded for several documents or twice into one) are
+        decoded once and share one image object within a document. Raises if
+        the file can't be read or decoded.
+        """
+        digest = file_digest(path)
+        with self._lock:
+            asset = self._images.get(digest)
+            if asset is not None:
+                self._images.move_to_end(digest)
+                return asset
+        info, pdf_version = _parse_image(path)
+        asset = PdfAsset(os.path.basename(path), f"sha1:{digest}", info, pdf_version)
+        with self._lock:
+            self._images[digest] = asset
+            while len(self._images) > self._image_cache_size:
+                self._images.popitem(last=False)
+        return asset
+
+
+# Shared by every PDF rendered in the process
+registry = AssetRegistry()
+
+
+def get_asset(name):
+    return registry.get(name)
@@ -0,0 +1,183 @@
+"""
+Declarative layout of a profile PDF.
+
+PROFILE_LAYOUT lists the pages of a profile, each page its sections, and each
+section the form fields it shows. compile_layout() resolves the layout against
+a sheet header once (cached per header) into a RenderPlan whose steps hold the
+physical column names and the labels already parsed out of the family and
+preference question headers. Rendering a profile is then running the plan's
+steps over one compact record, without scanning any columns.
+"""
+
+import logging
+import re
+import threading
+
+from schema_registry import resolve_schema
+
+logger = logging.getLogger(__name__)
+
+# Section kinds:
+#   fields       label/value rows; each field is (label, text the column name contains)
+#   family       label/value rows for every "[label]" column of a column group
+#   text         one line from a logical column, truncated to max_chars
+#   preferences  "Requirement:" and "Preferences:" summaries of a column group
+#   location     city, state and country rows
+#   contact      the email row
+PROFILE_LAYOUT = [
+    {
+        "top": 53,
+        "photo": True,
+        "sections": [
+            {
+                "kind": "fields",
+                "title": "Personal Details",
+                "fields": [
+                    ("Name", "Full Name"),
+                    ("Birth Date", "Birth Date"),
+                    ("Birth Time", "Birth Time"),
+                    ("Birth Place", "Birth Place"),
+                    ("Height", "Height"),
+                    ("Weight", "Weight"),
+                    ("Religion", "Religion"),
+                    ("Caste / Community", "Caste / Community / Tribe"),
+                    ("Mother Tongue", "Mother Tongue"),
+                    ("Nationality", "Nationality"),
+                ],
+            },
+            {
+                "kind": "fields",
+                "title": "Professional Details",
+                "gap": 5,
+                "fields": [
+                    ("Education", "Education"),
+                    ("Qualification", "Qualification"),
+                    ("Occupation", "Occupation"),
+                ],
+            },
+            {"kind": "family", "title": "Family Info", "gap": 5, "group": "family"},
+            {"kind": "text", "title": "Hobbies & Interests", "gap": 5, "column": "hobbies", "max_chars": 120},
+        ],
+    },
+    {
+        "top": 58,
+        "photo": False,
+        "sections": [
+            {"kind": "preferences", "title": "Requirements & Preferences", "group": "preferences"},
+            {"kind": "location", "title": "Location", "gap": 5},
+            {"kind": "contact", "title": "Contact Info", "gap": 10},
+        ],
+    },
+]
+
+LABEL_MAX_CHARS = 35
+# Record key of the contact email; the email column is chosen by the caller
+CONTACT_EMAIL = ("contact", "email")
+
+
+def bracket_label(column):
+    """The "[...]" part of a grid question header, or None"""
+    match = re.search(r"\[(.*?)\]", column)
+    return match.group(1)[:LABEL_MAX_CHARS] if match else None
+
+
+def strip_prefer(text):
+    return re.sub(r"^Prefer\s+", "", text, flags=re.IGNORECASE)
+
+
+def strip_city_prefix(text):
+    return re.sub(r"^(City:|Prefer)\s*", "", text, flags=re.IGNORECASE)
+
+
+class LayoutStep:
+    """
+    One section of a compiled layout. `rows` are (label, column, transform)
+    tuples; transform (or None) cleans the stripped value before it is drawn.
+    """
+
+    def __init__(self, kind, title, gap=0, rows=(), max_chars=None):
+        self.kind = kind
+        self.title = title
+        self.gap = gap
+        self.rows = list(rows)
+        self.max_chars = max_chars
+
+
+class RenderPlan:
+    """A layout resolved against one sheet header"""
+
+    def __init__(self, pages):
+        # [(top, photo, [LayoutStep, ...]), ...]
+        self.pages = pages
+        self.columns = list(dict.fromkeys(
+            column for _, _, steps in pages for step in steps for _, column, _ in step.rows
+            if column != CONTACT_EMAIL
+        ))
+
+    def record(self, row, email_col=None):
+        """The values of one profile the plan reads, keyed by column"""
+        values = {column: row[column] for column in self.columns}
+        values[CONTACT_EMAIL] = row[email_col] if email_col in row.index else "N/A"
+        return values
+
+
+def _compile_section(section, schema):
+    kind = section["kind"]
+    rows = []
+    if kind == "fields":
+        for label, needle in section["fields"]:
+            column = schema.containing(needle)
+            if column:
+                rows.append((label, column, None))
+    elif kind in ("family", "preferences"):
+        columns = schema.group(section["group"])
+        if not columns:
+            return None
+        for column in columns:
+            label = bracket_label(column)
+            if label:
+                rows.append((strip_prefer(label) if kind == "preferences" else label, column, None))
+    elif kind == "text":
+        column = schema.get(section["column"])
+        if not column:
+            return None
+        rows.append((None, column, None))
+    elif kind == "location":
+        city = schema.get("city")
+        if city:
+            rows.append(("City", city, strip_city_prefix))
+        else:
+            logger.warning(f"No city column found in data. Available columns: {list(schema.columns)}")
+        for label in ("State", "Country"):
+            column = schema.containing(label)
+            if column:
+                rows.append((label, column, None))
+    elif kind == "contact":
+        rows.append(("Email", CONTACT_EMAIL, None))
+    else:
+        raise ValueError(f"Unknown profile section kind: {kind}")
+    return LayoutStep(kind, section["title"], section.get("gap", 0), rows, section.get("max_chars"))
+
+
+def compile_layout(columns, layout=PROFILE_LAYOUT):
+    schema = resolve_schema(columns)
+    pages = []
+    for page in layout:
+        steps = [_compile_section(section, schema) for section in page["sections"]]
+        pages.append((page["top"], page["photo"], [step for step in steps if step is not None]))
+    return RenderPlan(pages)
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def get_render_plan(columns):
+    """Render plan for a header, compiled once per distinct header"""
+    key = tuple(columns)
+    plan = _plans.get(key)
+    if plan is None:
+        plan = compile_layout(key)
+        with _plans_lock:
+            _plans.setdefault(key, plan)
+    return plan
@@ -0,0 +1,211 @@
+"""
+Immutable, pre-cleaned snapshots of the form responses sheet.
+
+Column names and cell values are stripped once when a snapshot is built, so
+jobs never clean or mutate the shared frame. Columns derived from the snapshot
+(lower-cased gender, normalized emails, ...) are computed once, memoized on
+the snapshot and kept out of the frame itself. Jobs must treat `frame` as
+read-only; with pandas copy-on-write, subsets they take stay cheap views.
+
+The frame is also compacted: columns that neither matching nor rendering look
+at are dropped, low-cardinality form choices become categoricals and, when
+pyarrow is installed, free-text columns become Arrow strings.
+
+Each snapshot also carries hash indexes from normalized email and WhatsApp
+number to row position, built on first use and extended incrementally when
+rows are appended.
+"""
+
+import re
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = "string[pyarrow]"
+except ImportError:
+    TEXT_DTYPE = None
+
+# Copy-on-write is always on from pandas 3.0; opt in on 2.x where it exists
+if int(pd.__version__.split(".")[0]) < 3:
+    try:
+        pd.set_option("mode.copy_on_write", True)
+    except Exception:
+        pass
+
+# A column stays in the profile table if its name contains one of these (the
+# renderers, the target-sheet writer and bulk reprocessing find columns by
+# substring) or a field of the scoring plan
+PROFILE_COLUMN_KEYWORDS = (
+    "timestamp", "full name", "email", "gender", "whatsapp", "photo",
+    "birth date", "birth time", "birth place", "height", "weight", "income",
+    "religion", "caste / community / tribe", "mother tongue", "nationality",
+    "education", "qualification", "occupation",
+    "family information", "favorite", "hobby", "requirements & preferences",
+    "city", "state", "country",
+)
+# Columns with at most this share of distinct values are stored as categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def clean_sheet_frame(df):
+    """Return a copy of a raw sheet frame with stripped column names and values"""
+    cleaned = df.copy()
+    cleaned.columns = cleaned.columns.str.strip()
+    return cleaned.apply(lambda x: x.map(lambda v: str(v).strip()) if x.dtype == "object" else x)
+
+
+def profile_columns(columns, fields=()):
+    """Columns of the sheet used by matching (`fields`) or rendering, in sheet order"""
+    needles = list(PROFILE_COLUMN_KEYWORDS) + [field.lower() for field in fields]
+    return [col for col in columns if any(needle in col.lower() for needle in needles)]
+
+
+def compact_profile_frame(df, fields=()):
+    """Drop unused columns and pick a compact dtype for each remaining one"""
+    compact = {}
+    for col in profile_columns(df.columns, fields):
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        if len(values) and values.nunique(dropna=False) <= CATEGORY_MAX_UNIQUE_RATIO * len(values):
+            values = values.astype("category")
+        elif TEXT_DTYPE:
+            values = values.astype(TEXT_DTYPE)
+        compact[col] = values
+    return pd.DataFrame(compact, index=df.index)
+
+
+def normalize_email(email):
+    return str(email).strip().lower()
+
+
+def normalize_phone(number):
+    """Digits only, so "+91 98765-43210" and "919876543210" match"""
+    return re.sub(r"\D", "", str(number))
+
+
+# Lookup indexes kept with each snapshot: name -> (column chooser, key normalizer)
+INDEXES = {
+    "email": (lambda col: "email" in col, normalize_email),
+    "whatsapp": (lambda col: "whatsapp" in col and "number" in col, normalize_phone),
+}
+
+
+def _index_rows(frame, name, start=0, index=None):
+    """Map normalized keys of rows from `start` on to their position (later rows win)"""
+    index = {} if index is None else index
+    chooses, normalize = INDEXES[name]
+    col = next((col for col in frame.columns if chooses(col.lower())), None)
+    if col is None:
+        return index
+    for position, value in enumerate(frame[col].iloc[start:].tolist(), start):
+        key = normalize(value)
+        if key:
+            index[key] = position
+    return index
+
+
+def memory_per_1k(df):
+    """Deep memory footprint of a frame per 1,000 rows, in bytes"""
+    if not len(df):
+        return 0
+    return int(df.memory_usage(deep=True).sum() * 1000 / len(df))
+
+
+class ProfileSnapshot:
+    """A cleaned, compacted sheet frame shared read-only between concurrent jobs"""
+
+    def __init__(self, frame, version=0, cleaned=False, fields=None):
+        """
+        frame    raw sheet frame, or an already-cleaned one with cleaned=True
+        fields   scoring plan fields; when given the frame is compacted to the
+                 profile columns, otherwise it is kept as is
+        """
+        if not cleaned:
+            frame = clean_sheet_frame(frame)
+        self.source_columns = list(frame.columns)
+        self.fields = list(fields) if fields is not None else None
+        self.raw_bytes_per_1k = None
+        if fields is not None:
+            self.raw_bytes_per_1k = memory_per_1k(frame)
+            frame = compact_profile_frame(frame, fields)
+        self.frame = frame
+        self.version = version
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def columns(self):
+        return self.frame.columns
+
+    def derived(self, name, compute):
+        """Memoize a column derived from this snapshot without adding it to the frame"""
+        values = self._derived.get(name)
+        if values is None:
+            with self._derived_lock:
+                values = self._derived.get(name)
+                if values is None:
+                    values = compute(self.frame)
+                    self._derived[name] = values
+        return values
+
+    def _index(self, name):
+        index = self._indexes.get(name)
+        if index is None:
+            with self._derived_lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = self._indexes[name] = _index_rows(self.frame, name)
+        return index
+
+    def find_by_email(self, email):
+        """Row position of the latest response with this email, or None"""
+        return self._index("email").get(normalize_email(email))
+
+    def find_by_whatsapp(self, number):
+        """Row position of the latest response with this WhatsApp number, or None"""
+        key = normalize_phone(number)
+        return self._index("whatsapp").get(key) if key else None
+
+    def _extend_indexes(self, snapshot, start):
+        # Carry built indexes over to an appended snapshot, indexing only the new rows
+        for name, index in list(self._indexes.items()):
+            snapshot._indexes[name] = _index_rows(snapshot.frame, name, start, dict(index))
+        return snapshot
+
+    def covers_fields(self, fields):
+        """False if a field found in the sheet header was dropped from this snapshot"""
+        if self.fields is None:
+            return True
+        return set(profile_columns(self.source_columns, fields)) <= set(self.frame.columns)
+
+    def append_rows(self, new_rows):
+        """Return a new snapshot with raw rows appended; this snapshot is untouched"""
+        new_rows = clean_sheet_frame(new_rows)
+        new_rows.columns = self.source_columns
+        if self.fields is None:
+            frame = pd.concat([self.frame, new_rows], ignore_index=True)
+            return self._extend_indexes(ProfileSnapshot(frame, self.version + 1, cleaned=True), len(self.frame))
+
+        # Recompact over all rows, since the new rows can change column cardinality
+        frame = pd.concat([self.frame.astype(object), new_rows[self.frame.columns]], ignore_index=True)
+        snapshot = ProfileSnapshot(frame, self.version + 1, cleaned=True, fields=self.fields)
+        snapshot.source_columns = self.source_columns
+        snapshot.raw_bytes_per_1k = self.raw_bytes_per_1k
+        return self._extend_indexes(snapshot, len(self.frame))
+
+    def memory_report(self):
+        return {
+            "rows": len(self.frame),
+            "columns": len(self.frame.columns),
+            "dropped_columns": len(self.source_columns) - len(self.frame.columns),
+            "categorical_columns": sum(isinstance(dtype, pd.CategoricalDtype) for dtype in self.frame.dtypes),
+            "bytes_per_1k_profiles": memory_per_1k(self.frame),
+            "raw_bytes_per_1k_profiles": self.raw_bytes_per_1k,
+        }
@@ -0,0 +1,306 @@
+"""
+Long-lived worker processes that render profile PDFs.
+
+Each worker imports the app (pandas, FPDF, PIL), decodes the logo and draws
+one throwaway page at start, so the border operators, page chrome and font
+metrics are warm before the first real job arrives. Jobs are queued through a
+ProcessPoolExecutor and return RenderedPdf objects holding the PDF bytes.
+A job carries only the rows it draws (the registrant and the top matches);
+workers never load the sheet, so adding workers adds no profile table copies.
+After RENDER_POOL_MAX_JOBS jobs per worker the pool swaps in a fresh set of
+workers (warming while the old ones finish their jobs), which bounds memory
+growth from caches and fragmentation. A monitor thread pings the
+workers every RENDER_POOL_HEALTH_INTERVAL seconds and rebuilds the pool if a
+worker died or stopped answering.
+
+get_render_pool(wait=False) starts the shared pool in the background, so
+callers render inline while it warms up, and for RENDER_POOL_RETRY_SECONDS
+after a failed start instead of retrying it on every request.
+"""
+
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+RENDER_POOL_WORKERS = int(os.getenv("RENDER_POOL_WORKERS", "2"))
+RENDER_POOL_MAX_JOBS = int(os.getenv("RENDER_POOL_MAX_JOBS", "50"))
+RENDER_POOL_HEALTH_INTERVAL = float(os.getenv("RENDER_POOL_HEALTH_INTERVAL", "60"))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", "120"))
+# After a failed start, render inline this long before trying to start the pool again
+RENDER_POOL_RETRY_SECONDS = float(os.getenv("RENDER_POOL_RETRY_SECONDS", "300"))
+HEALTH_TIMEOUT = 10
+# Spawned workers import pandas and scikit-learn before answering their first ping
+STARTUP_TIMEOUT = 120
+
+# Per worker process
+_worker = {"started_at": None, "jobs": 0}
+
+
+def _init_worker():
+    """Import and warm everything a render needs, once per worker process"""
+    started = time.monotonic()
+    import app
+    from PIL import Image  # noqa: F401
+
+    # The first page of a document captures the border and chrome; doing it
+    # here also loads the fonts' width tables and the logo
+    pdf = app.EnhancedSinglePageMatchesPDF()
+    pdf.add_page()
+    for style in ("", "B", "I"):
+        pdf.set_font("Arial", style, 10)
+    pdf.output(dest="S")
+
+    _worker["started_at"] = time.time()
+    logger.info(f"Render worker {os.getpid()} ready in {time.monotonic() - started:.2f}s")
+
+
+def _render_job(new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode, photos=None):
+    import app
+
+    _worker["jobs"] += 1
+    return app.render_match_pdfs(new_user, new_user_name, top_matches_df, top_percentages, email_col, pdf_mode, photos)
+
+
+def _ping():
+    return {"pid": os.getpid(), "jobs": _worker["jobs"], "started_at": _worker["started_at"]}
+
+
+class RenderPool:
+    """A pool of warm render workers; safe to use from any thread"""
+
+    def __init__(self, workers=RENDER_POOL_WORKERS, max_jobs_per_worker=RENDER_POOL_MAX_JOBS,
+                 health_interval=RENDER_POOL_HEALTH_INTERVAL):
+        self.workers = max(1, workers)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._executor = None
+        self._retired = []  # Recycled or broken executors still finishing their jobs
+        self._stopped = threading.Event()
+        self._monitor = None
+        self.submitted = 0
+        self.failed = 0
+        self.restarts = 0
+        self.recycles = 0
+        self._generation_jobs = 0
+        self.last_health = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def _new_executor(self):
+        # Spawned workers start clean, without the threads and locks of the
+        # web server. Recycling is done by replacing the whole executor:
+        # max_tasks_per_child can deadlock the executor on Python 3.11.
+        self._generation_jobs = 0
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def _warm(self, executor):
+        # Worker processes are spawned on demand; one ping each starts them all
+        for _ in range(self.workers):
+            executor.submit(_ping)
+
+    def start(self):
+        """Start the workers and wait until they are warm"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+        self.check_health(timeout=STARTUP_TIMEOUT)
+        if self.health_interval and self._monitor is None:
+            self._monitor = threading.Thread(target=self._monitor_loop, name="render-pool-health", daemon=True)
+            self._monitor.start()
+        return self
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                return  # Another thread already replaced it
+            self._executor = self._new_executor()
+            self._retired.append(broken)
+            self.restarts += 1
+        logger.warning(f"Render pool restarted ({self.restarts} restarts so far)")
+        self._warm(self._executor)
+        self._retire_in_background(broken, cancel_futures=True)
+
+    def _retire(self, executor, cancel_futures):
+        executor.shutdown(wait=True, cancel_futures=cancel_futures)
+        with self._lock:
+            if executor in self._retired:
+                self._retired.remove(executor)
+
+    def _retire_in_background(self, executor, cancel_futures=False):
+        # shutdown() waits for executors still listed in _retired
+        threading.Thread(target=self._retire, args=(executor, cancel_futures),
+                         name="render-pool-retire", daemon=True).start()
+
+    def _submit(self, fn, *args):
+        retired = None
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            elif self.max_jobs_per_worker and self._generation_jobs >= self.workers * self.max_jobs_per_worker:
+                retired, self._executor = self._executor, self._new_executor()
+                self._retired.append(retired)
+                self.recycles += 1
+            self._generation_jobs += 1
+            executor = self._executor
+        if retired is not None:
+            logger.info(f"Recycling render workers after {self.workers * self.max_jobs_per_worker} jobs")
+            self._warm(executor)
+            # Jobs already queued on the old workers still finish
+            self._retire_in_background(retired)
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._restart(executor)
+            return self._submit(fn, *args)
+
+    def submit(self, *args):
+        """Queue a render (render_match_pdfs arguments); returns a future of the PDF list"""
+        with self._lock:
+            self.submitted += 1
+        return self._submit(_render_job, *args)[1]
+
+    def render(self, *args, timeout=RENDER_TIMEOUT):
+        """Render in a worker and wait for it; returns the PDF list, or None on failure"""
+        with self._lock:
+            self.submitted += 1
+        executor, future = self._submit(_render_job, *args)
+        try:
+            return future.result(timeout=timeout)
+        except BrokenProcessPool as e:
+            logger.error(f"Render worker died: {e}")
+            self._restart(executor)
+        except Exception as e:
+            logger.error(f"Render job failed: {e}")
+        with self._lock:
+            self.failed += 1
+        return None
+
+    def check_health(self, timeout=HEALTH_TIMEOUT):
+        """Ping the workers; rebuilds the pool if they don't all answer in time"""
+        if self._executor is None:
+            return None
+        started = time.monotonic()
+        executor = self._executor
+        try:
+            pings = [executor.submit(_ping) for _ in range(self.workers)]
+            answers = [ping.result(timeout=timeout) for ping in pings]
+            healthy = True
+            error = None
+        except Exception as e:
+            answers = []
+            healthy = False
+            error = str(e) or type(e).__name__
+
+        self.last_health = {
+            "healthy": healthy,
+            "checked_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seconds": round(time.monotonic() - started, 3),
+            "workers": {answer["pid"]: answer["jobs"] for answer in answers},
+            "error": error,
+        }
+        if not healthy:
+            logger.error(f"Render pool health check failed: {error}")
+            self._restart(executor)
+        return healthy
+
+    def _monitor_loop(self):
+        while not self._stopped.wait(self.health_interval):
+            self.check_health()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_jobs_per_worker": self.max_jobs_per_worker,
+            "submitted": self.submitted,
+            "failed": self.failed,
+            "restarts": self.restarts,
+            "recycles": self.recycles,
+            "health": self.last_health,
+        }
+
+    def shutdown(self, wait=True):
+        """Stop the workers; with wait, also waits for recycled workers' jobs and their callbacks"""
+        self._stopped.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+            retired, self._retired = self._retired, []
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        for old in retired:
+            old.shutdown(wait=wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_starter = None
+_pool_failed_at = None
+
+
+def _start_pool():
+    global _pool, _pool_failed_at
+    pool = RenderPool()
+    try:
+        pool.start()
+        if not pool.last_health["healthy"]:
+            raise RuntimeError(pool.last_health["error"])
+    except Exception as e:
+        logger.error(f"Render pool failed to start, rendering inline for the next "
+                     f"{RENDER_POOL_RETRY_SECONDS:.0f}s: {e}")
+        pool.shutdown(wait=False)
+        _pool_failed_at = time.monotonic()
+        return
+    _pool = pool
+
+
+def get_render_pool(wait=True):
+    """
+    The process-wide render pool, started on first use. None if
+    RENDER_POOL_WORKERS is 0 or the pool failed to start less than
+    RENDER_POOL_RETRY_SECONDS ago; with wait=False, also None while it starts.
+    """
+    global _pool_starter, _pool_failed_at
+    if RENDER_POOL_WORKERS <= 0:
+        return None
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+        if _pool_failed_at is not None and time.monotonic() - _pool_failed_at < RENDER_POOL_RETRY_SECONDS:
+            return None
+        if _pool_starter is None or not _pool_starter.is_alive():
+            _pool_failed_at = None
+            _pool_starter = threading.Thread(target=_start_pool, name="render-pool-start", daemon=True)
+            _pool_starter.start()
+        starter = _pool_starter
+    if wait:
+        starter.join()
+    return _pool
+
+
+def render_pool_stats():
+    if _pool is not None:
+        return _pool.stats()
+    if RENDER_POOL_WORKERS <= 0:
+        state = "disabled"
+    elif _pool_failed_at is not None:
+        state = "failed"
+    else:
+        state = "starting" if _pool_starter is not None else "not started"
+    return {"workers": 0, "state": state}
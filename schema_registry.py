@@ -0,0 +1,216 @@
+"""
+Resolve logical form fields to the sheet's physical column names once per header.
+
+Columns are found by fuzzy substring rules ("city" but not "preference" or
+"metro", ...). Instead of re-running those rules in every hot function, the
+header row is fingerprinted and the resolved logical -> physical map is cached
+per fingerprint. The first time a fingerprint is seen it is compared with the
+last known header (persisted across restarts); if the form was edited, added,
+removed or re-resolved columns are logged as an alert and passed to any
+registered listeners.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_STATE_FILE = os.getenv("SCHEMA_STATE_FILE", "schema_registry.json")
+MAX_HISTORY = 20
+
+
+def _exact(name):
+    return lambda col, low: low.strip() == name
+
+
+def _contains(*needles, exclude=()):
+    return lambda col, low: all(n in low for n in needles) and not any(x in low for x in exclude)
+
+
+# Logical field -> rules tried in order; the first rule matching any column wins
+LOGICAL_COLUMNS = {
+    "timestamp": [_contains("timestamp")],
+    "email": [_contains("email")],
+    "full_name": [_exact("full name")],
+    "gender": [_exact("gender")],
+    "whatsapp": [_contains("whatsapp", "number")],
+    "birth_date": [_contains("birth", "date")],
+    "city": [_exact("city"), _contains("city", exclude=("preference", "metro"))],
+    "state": [_contains("state")],
+    "country": [_contains("country")],
+    "photo": [_contains("photo", "upload"), _contains("photo")],
+    "hobbies": [lambda col, low: "favorite" in low or "hobby" in low],
+}
+# Logical groups -> every column whose name contains the marker
+COLUMN_GROUPS = {
+    "family": "family information",
+    "preferences": "requirements & preferences",
+}
+
+
+def header_fingerprint(columns):
+    return hashlib.sha1("\x1f".join(str(col) for col in columns).encode("utf-8")).hexdigest()[:16]
+
+
+class SheetSchema:
+    """Resolved columns for one header; lookups after the first are dict hits"""
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.fingerprint = header_fingerprint(self.columns)
+        lowered = [(col, str(col).lower()) for col in self.columns]
+        self.mapping = {}
+        for logical, rules in LOGICAL_COLUMNS.items():
+            self.mapping[logical] = next(
+                (col for rule in rules for col, low in lowered if rule(col, low)), None
+            )
+        self.groups = {
+            group: [col for col, low in lowered if marker in low]
+            for group, marker in COLUMN_GROUPS.items()
+        }
+        self._lowered = lowered
+        self._containing = {}
+
+    def get(self, logical):
+        """Physical column for a logical field, or None if the sheet lacks it"""
+        return self.mapping.get(logical)
+
+    def group(self, name):
+        return self.groups.get(name, [])
+
+    def containing(self, needle):
+        """First column whose name contains `needle` (case-insensitive), memoized"""
+        try:
+            return self._containing[needle]
+        except KeyError:
+            low_needle = needle.lower()
+            col = next((col for col, low in self._lowered if low_needle in low), None)
+            self._containing[needle] = col
+            return col
+
+
+class SchemaRegistry:
+    def __init__(self, state_file=SCHEMA_STATE_FILE):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._schemas = {}
+        self._listeners = []
+        self._state = None
+        self.changes = 0
+
+    def add_listener(self, listener):
+        """Call listener(old_schema_info, new_schema, diff) whenever the header changes"""
+        self._listeners.append(listener)
+
+    def resolve(self, columns):
+        """Schema for a header, compiled once per distinct header"""
+        key = tuple(columns)
+        schema = self._schemas.get(key)
+        if schema is None:
+            schema = SheetSchema(key)
+            with self._lock:
+                self._schemas.setdefault(key, schema)
+        return schema
+
+    def observe(self, columns):
+        """Resolve the header of a freshly loaded sheet and alert if it drifted"""
+        schema = self.resolve(columns)
+        with self._lock:
+            state = self._load_state()
+            current = state.get("current")
+            if current and current["fingerprint"] == schema.fingerprint:
+                return schema
+            diff = self._diff(current, schema) if current else None
+            entry = {
+                "fingerprint": schema.fingerprint,
+                "columns": list(schema.columns),
+                "mapping": schema.mapping,
+                "seen_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            if current:
+                state["history"] = (state.get("history", []) + [current])[-MAX_HISTORY:]
+            state["current"] = entry
+            self._save_state(state)
+
+        if diff is None:
+            logger.info(f"Registered sheet schema {schema.fingerprint} ({len(schema.columns)} columns)")
+            return schema
+
+        self.changes += 1
+        logger.error(
+            f"ALERT: sheet header changed {current['fingerprint']} -> {schema.fingerprint}: "
+            f"added {diff['added']}, removed {diff['removed']}, re-resolved {diff['remapped']}"
+        )
+        for logical in diff["unresolved"]:
+            logger.error(f"ALERT: form field '{logical}' no longer matches any sheet column")
+        for listener in self._listeners:
+            try:
+                listener(current, schema, diff)
+            except Exception as e:
+                logger.error(f"Schema change listener failed: {e}")
+        return schema
+
+    @staticmethod
+    def _diff(previous, schema):
+        old_columns = previous["columns"]
+        old_mapping = previous.get("mapping", {})
+        return {
+            "added": [col for col in schema.columns if col not in old_columns],
+            "removed": [col for col in old_columns if col not in schema.columns],
+            "remapped": {
+                logical: [old_mapping.get(logical), col]
+                for logical, col in schema.mapping.items()
+                if old_mapping.get(logical) != col
+            },
+            "unresolved": [
+                logical for logical, col in schema.mapping.items()
+                if col is None and old_mapping.get(logical) is not None
+            ],
+        }
+
+    def _load_state(self):
+        if self._state is None:
+            try:
+                with open(self.state_file) as f:
+                    self._state = json.load(f)
+            except FileNotFoundError:
+                self._state = {}
+            except Exception as e:
+                logger.error(f"Could not read schema state {self.state_file}: {e}")
+                self._state = {}
+        return self._state
+
+    def _save_state(self, state):
+        try:
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.error(f"Could not save schema state {self.state_file}: {e}")
+
+    def stats(self):
+        with self._lock:
+            current = (self._state or {}).get("current")
+            return {
+                "fingerprint": current["fingerprint"] if current else None,
+                "compiled_headers": len(self._schemas),
+                "changes_detected": self.changes,
+                "unresolved_fields": [k for k, v in current["mapping"].items() if v is None] if current else [],
+            }
+
+
+# Shared by every thread in the process
+registry = SchemaRegistry()
+
+
+def resolve_schema(columns):
+    return registry.resolve(columns)
+
+
+def schema_stats():
+    return registry.stats()
@@ -0,0 +1,427 @@
+"""
+Compatibility scoring between a new registrant and the candidate pool.
+
+The scoring rules (category fields, field and category weights, floors) live in
+a versioned scoring-plan file. The plan is compiled once into a vectorized
+evaluator and recompiled automatically when the file changes on disk.
+
+Scoring is split in two passes:
+1. score_candidates() computes only the final percentage for every candidate,
+   scoring each distinct answer once and broadcasting with NumPy. Field
+   scores are memoized per pair of interned, normalized values.
+2. explain_match() builds the detailed category breakdown on demand, which the
+   pipeline only calls for the top-k profiles that are actually sent out.
+"""
+
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SCORING_PLAN_FILE = os.getenv(
+    "SCORING_PLAN_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_plan.json"),
+)
+PLAN_RELOAD_CHECK_SECONDS = 2  # How often to stat the plan file for changes
+
+DEFAULT_TOP_K = 5
+
+
+def normalize_value(value):
+    """Normalize string values for better comparison"""
+    if pd.isna(value) or value is None:
+        return ""
+    value = str(value).strip().lower()
+    # Handle common variations
+    value = value.replace("yes", "true").replace("no", "false")
+    value = value.replace("n/a", "").replace("none", "")
+    return value
+
+
+def score_normalized_values(user_val, match_val):
+    """Score a single field from two already-normalized values"""
+    if not user_val or not match_val:
+        return 0.0
+
+    # Exact match
+    if user_val == match_val:
+        return 1.0
+
+    # Partial match for hobbies and likes
+    if any(field in user_val for field in ['hobbies', 'likes']):
+        user_items = set(item.strip() for item in user_val.split(','))
+        match_items = set(item.strip() for item in match_val.split(','))
+        common_items = user_items.intersection(match_items)
+        if common_items:
+            return min(1.0, len(common_items) / max(len(user_items), len(match_items)))
+
+    # Handle boolean values with partial credit
+    if user_val in ['true', 'false'] and match_val in ['true', 'false']:
+        return 1.0 if user_val == match_val else 0.0
+
+    # Text similarity for other fields
+    if user_val and match_val:
+        # Calculate similarity based on common words
+        user_words = set(user_val.split())
+        match_words = set(match_val.split())
+        common_words = user_words.intersection(match_words)
+        if common_words:
+            return min(1.0, len(common_words) / max(len(user_words), len(match_words)))
+
+    return 0.0
+
+
+def calculate_field_score(user_val, match_val):
+    """Calculate score for a single field with enhanced matching logic"""
+    return score_normalized_values(normalize_value(user_val), normalize_value(match_val))
+
+
+class FieldScoreCache:
+    """
+    Interns raw answers to normalized-value IDs and memoizes field scores per
+    (user_value_id, match_value_id) pair.
+
+    IDs are never reused: once max_values distinct normalized values have been
+    seen, new values are scored directly instead of being interned. The pair
+    table is cleared when it reaches max_pairs. Field scoring does not depend
+    on the scoring plan, so the cache survives plan reloads.
+    """
+
+    def __init__(self, max_values=50000, max_pairs=500000):
+        self.max_values = max_values
+        self.max_pairs = max_pairs
+        self.normalized = []  # value ID -> normalized string
+        self._normalized_ids = {}
+        self._raw_ids = {}
+        self._scores = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.overflows = 0
+
+    def intern(self, value):
+        """Return the normalized-value ID of a raw cell, or None once the table is full"""
+        if isinstance(value, str):
+            value_id = self._raw_ids.get(value)
+            if value_id is not None:
+                return value_id
+
+        normalized = normalize_value(value)
+        value_id = self._normalized_ids.get(normalized)
+        if value_id is None:
+            with self._lock:
+                value_id = self._normalized_ids.get(normalized)
+                if value_id is None:
+                    if len(self.normalized) >= self.max_values:
+                        self.overflows += 1
+                        return None
+                    value_id = len(self.normalized)
+                    self.normalized.append(normalized)
+                    self._normalized_ids[normalized] = value_id
+
+        # Only strings are remembered by raw value; NaN/None never compare equal
+        if isinstance(value, str) and len(self._raw_ids) < self.max_values * 4:
+            self._raw_ids[value] = value_id
+        return value_id
+
+    def pair_score(self, user_id, match_id):
+        key = (user_id, match_id)
+        score = self._scores.get(key)
+        if score is not None:
+            self.hits += 1
+            return score
+        self.misses += 1
+        score = score_normalized_values(self.normalized[user_id], self.normalized[match_id])
+        if len(self._scores) >= self.max_pairs:
+            self._scores.clear()
+            self.evictions += 1
+        self._scores[key] = score
+        return score
+
+    def field_score(self, user_val, match_val):
+        """Memoized equivalent of calculate_field_score"""
+        user_id = self.intern(user_val)
+        match_id = self.intern(match_val)
+        if user_id is None or match_id is None:
+            return calculate_field_score(user_val, match_val)
+        return self.pair_score(user_id, match_id)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "interned_values": len(self.normalized),
+            "raw_values": len(self._raw_ids),
+            "memoized_pairs": len(self._scores),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "overflows": self.overflows,
+        }
+
+
+_field_score_cache = FieldScoreCache()
+
+
+def get_field_score_cache():
+    return _field_score_cache
+
+
+def field_score_cache_stats():
+    """Hit/miss and size counters for the shared field-score memo"""
+    return _field_score_cache.stats()
+
+
+class CompiledCategory:
+    def __init__(self, key, label, weight, fields, field_weights, default_field_weight, column=None):
+        self.key = key
+        self.label = label
+        # Column of the top-matches frame holding this category's score
+        self.column = column or f"{label} %"
+        self.weight = weight
+        self.fields = list(fields)
+        # Weights pair positionally with the answered fields, as they always have
+        self.positional_weights = [field_weights.get(field, default_field_weight) for field in self.fields]
+        self.total_weight = sum(self.positional_weights)
+
+
+class CompiledScoringPlan:
+    """A scoring plan with weights precomputed and column lookups cached"""
+
+    def __init__(self, plan):
+        self.version = str(plan["version"])
+        self.field_floor = plan["field_floor"]
+        self.category_floor = plan["category_floor"]
+        self.category_cap = plan["category_cap"]
+        self.total_floor = plan["total_floor"]
+        field_weights = plan.get("field_weights", {})
+        default_field_weight = plan.get("default_field_weight", 1.0)
+        self.categories = [
+            CompiledCategory(
+                category["key"],
+                category.get("label", category["key"]),
+                category["weight"],
+                category["fields"],
+                field_weights,
+                default_field_weight,
+                category.get("column"),
+            )
+            for category in plan["categories"]
+        ]
+        self.fields = [field for category in self.categories for field in category.fields]
+        # Candidate filters on derived numeric columns; None turns a filter off
+        filters = plan.get("filters", {})
+        self.max_age_gap_years = filters.get("max_age_gap_years")
+        self.max_height_gap_cm = filters.get("max_height_gap_cm")
+        self._column_cache = {}
+        self._column_cache_lock = threading.Lock()
+
+    def resolve_columns(self, columns):
+        """Map every plan field to the first sheet column containing it (cached per header)"""
+        key = tuple(columns)
+        resolved = self._column_cache.get(key)
+        if resolved is None:
+            resolved = {}
+            lowered = [(col, col.lower()) for col in key]
+            for category in self.categories:
+                for field in category.fields:
+                    needle = field.lower()
+                    resolved[field] = next((col for col, low in lowered if needle in low), None)
+            with self._column_cache_lock:
+                self._column_cache[key] = resolved
+        return resolved
+
+    def answered_fields(self, category, new_user, candidate_columns):
+        """Return (candidate column, user value) for each field the user answered"""
+        user_columns = self.resolve_columns(new_user.columns)
+        match_columns = self.resolve_columns(candidate_columns)
+        answered = []
+        for field in category.fields:
+            user_col = user_columns[field]
+            match_col = match_columns[field]
+            if user_col and match_col:
+                user_val = new_user[user_col].values[0]
+                # Only count if user has specified a preference
+                if user_val and normalize_value(user_val) not in ['', 'false']:
+                    answered.append((match_col, user_val))
+        return answered
+
+    def category_percentage(self, category, field_scores):
+        """Turn the scores of the answered fields into a floored, capped percentage"""
+        if not field_scores:
+            return float(self.category_floor)  # Minimum score for any category
+        weighted_sum = sum(
+            max(self.field_floor, score) * weight
+            for score, weight in zip(field_scores, category.positional_weights)
+        )
+        percentage = (weighted_sum / category.total_weight * 100) if category.total_weight > 0 else 0
+        return min(self.category_cap, max(self.category_floor, percentage))
+
+    def weighted_total(self, category_scores):
+        weighted_total = 0.0
+        for category, score in zip(self.categories, category_scores):
+            weighted_total += score * category.weight
+        return max(self.total_floor, weighted_total)
+
+
+def load_scoring_plan(path=SCORING_PLAN_FILE):
+    """Read and validate a scoring-plan file"""
+    with open(path) as f:
+        plan = json.load(f)
+    for key in ("version", "field_floor", "category_floor", "category_cap", "total_floor", "categories"):
+        if key not in plan:
+            raise ValueError(f"Scoring plan {path} is missing '{key}'")
+    for category in plan["categories"]:
+        if not category.get("key") or not isinstance(category.get("fields"), list):
+            raise ValueError(f"Scoring plan {path} has an invalid category: {category}")
+    # Match details and the top-matches columns are keyed by category
+    keys = [category["key"] for category in plan["categories"]]
+    if len(set(keys)) != len(keys):
+        raise ValueError(f"Scoring plan {path} has duplicate category keys: {keys}")
+    return plan
+
+
+def compile_scoring_plan(plan):
+    return CompiledScoringPlan(plan)
+
+
+_compiled_plan = None
+_plan_mtime = None
+_plan_checked_at = 0.0
+_plan_lock = threading.Lock()
+
+
+def get_scoring_plan(path=SCORING_PLAN_FILE):
+    """Return the compiled plan, recompiling it if the file changed on disk"""
+    global _compiled_plan, _plan_mtime, _plan_checked_at
+
+    now = time.monotonic()
+    if _compiled_plan is not None and now - _plan_checked_at < PLAN_RELOAD_CHECK_SECONDS:
+        return _compiled_plan
+
+    with _plan_lock:
+        _plan_checked_at = now
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            if _compiled_plan is None:
+                raise
+            logger.error(f"Cannot stat scoring plan {path}, keeping version {_compiled_plan.version}: {e}")
+            return _compiled_plan
+
+        if _compiled_plan is None or mtime != _plan_mtime:
+            try:
+                compiled = compile_scoring_plan(load_scoring_plan(path))
+            except Exception as e:
+                if _compiled_plan is None:
+                    raise
+                logger.error(f"Invalid scoring plan {path}, keeping version {_compiled_plan.version}: {e}")
+                _plan_mtime = mtime
+                return _compiled_plan
+            if _compiled_plan is not None:
+                logger.info(f"Reloaded scoring plan: version {_compiled_plan.version} -> {compiled.version}")
+            _compiled_plan = compiled
+            _plan_mtime = mtime
+        return _compiled_plan
+
+
+def _score_column(user_val, values, cache, rows=None):
+    """Score one candidate column (only `rows` of it, if given), looking up each distinct answer only once"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Already dictionary-encoded by the profile table; no hashing needed
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        if rows is not None:
+            codes = codes[rows]
+    else:
+        array = values.to_numpy()
+        codes, uniques = pd.factorize(array if rows is None else array[rows], sort=False)
+    # The extra trailing 0.0 is picked up by code -1 (missing cells)
+    unique_scores = np.fromiter(
+        (cache.field_score(user_val, u) for u in uniques),
+        dtype=np.float64,
+        count=len(uniques),
+    )
+    return np.append(unique_scores, 0.0)[codes]
+
+
+def score_candidates(new_user, candidates, plan=None, rows=None):
+    """
+    Totals-only pass: return the final match percentage for every candidate
+    as a float array, in the row order of `candidates`. With `rows` (row
+    positions), only those rows are scored, in that order, without slicing
+    the frame.
+    """
+    plan = plan or get_scoring_plan()
+    cache = get_field_score_cache()
+    n = len(candidates) if rows is None else len(rows)
+    weighted_total = np.zeros(n, dtype=np.float64)
+
+    for category in plan.categories:
+        answered = plan.answered_fields(category, new_user, candidates.columns)
+        if not answered:
+            category_scores = np.full(n, float(plan.category_floor))
+        else:
+            weighted_sum = np.zeros(n, dtype=np.float64)
+            for (match_col, user_val), weight in zip(answered, category.positional_weights):
+                field_scores = _score_column(user_val, candidates[match_col], cache, rows)
+                weighted_sum += np.maximum(plan.field_floor, field_scores) * weight
+            if category.total_weight > 0:
+                percentage = weighted_sum / category.total_weight * 100
+            else:
+                percentage = np.zeros(n, dtype=np.float64)
+            category_scores = np.minimum(plan.category_cap, np.maximum(plan.category_floor, percentage))
+        weighted_total += category_scores * category.weight
+
+    return np.maximum(plan.total_floor, weighted_total)
+
+
+def select_top_k(scores, k=DEFAULT_TOP_K):
+    """Positions of the k best scores, highest first; ties keep pool order"""
+    return heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+
+
+def explain_match(new_user, potential_match, plan=None):
+    """
+    Detailed breakdown for one candidate across the plan's categories, stamped
+    with the plan version so cached results can be invalidated precisely.
+    """
+    plan = plan or get_scoring_plan()
+    cache = get_field_score_cache()
+    category_scores = {}
+    scores = []
+    for category in plan.categories:
+        answered = plan.answered_fields(category, new_user, potential_match.index)
+        field_scores = [cache.field_score(user_val, potential_match[match_col]) for match_col, user_val in answered]
+        score = plan.category_percentage(category, field_scores)
+        scores.append(score)
+        category_scores[category.key] = {
+            'label': category.label,
+            'score': score,
+            'weight': category.weight,
+            'fields': category.fields
+        }
+
+    final_score = plan.weighted_total(scores)
+
+    # Add detailed breakdown for debugging and transparency
+    return {
+        'matches': [],
+        'total_score': final_score,
+        'total_weight': 1.0,
+        'final_percentage': final_score,
+        'category_scores': category_scores,
+        'plan_version': plan.version
+    }
+
+
+def process_category_matches(new_user, potential_match, category_info=None):
+    """Original single-candidate API; returns the same dict as explain_match"""
+    return explain_match(new_user, potential_match)
@@ -0,0 +1,140 @@
+"""
+Thread-safe cache for the latest Google Sheets snapshot.
+
+With ttl=None the snapshot never expires on its own; callers refresh it
+explicitly when they know the sheet has changed (e.g. a new form submission).
+
+Concurrent callers that find the cache empty or expired wait on a single
+in-flight fetch instead of each downloading the sheet (single-flight). Callers
+that can tolerate slightly old data may ask for stale-while-revalidate: they
+get the previous snapshot immediately while one background refresh runs.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-progress load that any number of callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SnapshotCache:
+    def __init__(self, loader, ttl, name="snapshot"):
+        self._loader = loader
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = None
+        self._flight = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_refresh_seconds = None
+        self.total_refresh_seconds = 0.0
+
+    def _is_fresh(self):
+        if self._value is None or self._loaded_at is None:
+            return False
+        return self.ttl is None or time.monotonic() - self._loaded_at < self.ttl
+
+    def get(self, force_refresh=False, allow_stale=False, loader=None):
+        """
+        Return the cached snapshot, loading it if needed.
+
+        force_refresh  always wait for a new load (joining one already in flight)
+        allow_stale    return an expired snapshot at once and refresh in background
+        loader         load function to use instead of the default, e.g. a delta
+                       refresh; ignored when joining a load already in flight
+        """
+        with self._lock:
+            if not force_refresh and self._is_fresh():
+                self.hits += 1
+                logger.info(f"Using cached {self.name} data")
+                return self._value
+
+            if not force_refresh and allow_stale and self._value is not None:
+                self.stale_hits += 1
+                if self._flight is None:
+                    self._flight = _Flight()
+                    threading.Thread(target=self._load, args=(self._flight, loader), daemon=True).start()
+                logger.info(f"Serving stale {self.name} data while refreshing in background")
+                return self._value
+
+            self.misses += 1
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._load(flight, loader)
+        else:
+            logger.info(f"Waiting for in-flight {self.name} fetch")
+            flight.done.wait()
+
+        if flight.result is not None:
+            return flight.result
+        # The load failed; fall back to whatever we had before
+        with self._lock:
+            return self._value
+
+    def _load(self, flight, loader=None):
+        started = time.monotonic()
+        value = None
+        try:
+            value = (loader or self._loader)()
+        except Exception as e:
+            logger.error(f"Error refreshing {self.name} cache: {e}", exc_info=True)
+        elapsed = time.monotonic() - started
+
+        with self._lock:
+            if value is not None:
+                self._value = value
+                self._loaded_at = time.monotonic()
+                self.refreshes += 1
+            else:
+                self.refresh_failures += 1
+            self.last_refresh_seconds = elapsed
+            self.total_refresh_seconds += elapsed
+            if self._flight is flight:
+                self._flight = None
+        flight.result = value
+        flight.done.set()
+
+    def peek(self):
+        """Current snapshot without triggering a load"""
+        with self._lock:
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def stats(self):
+        with self._lock:
+            loads = self.refreshes + self.refresh_failures
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced_waits": self.coalesced,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "refresh_in_flight": self._flight is not None,
+                "last_refresh_seconds": round(self.last_refresh_seconds, 3) if self.last_refresh_seconds is not None else None,
+                "avg_refresh_seconds": round(self.total_refresh_seconds / loads, 3) if loads else None,
+                "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None,
+            }
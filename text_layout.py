@@ -0,0 +1,181 @@
+"""
+Fast text measuring and wrapping for FPDF's core fonts.
+
+FPDF measures text one character at a time in Python: get_string_width() for
+every word add_compact_field wraps, and a per-character loop in multi_cell().
+Here each font's width table is turned once into a lookup that sums in C,
+line breaks are found by bisecting the cumulative widths of the text, and
+layouts are memoized, so repeated values (caste labels, common preference
+lists) are wrapped only once per process. Line breaks, word spacing and the
+emitted PDF operators are identical to FPDF's own.
+"""
+
+import bisect
+import itertools
+from functools import lru_cache
+
+from fpdf.php import sprintf
+
+LAYOUT_CACHE_SIZE = 4096
+
+
+class _Widths(dict):
+    """A font's character widths; characters the font lacks are 0 wide, as in FPDF"""
+
+    def __missing__(self, char):
+        return 0
+
+
+_font_widths = {}
+
+
+def _widths(pdf):
+    name = pdf.current_font["name"]
+    widths = _font_widths.get(name)
+    if widths is None:
+        widths = _font_widths.setdefault(name, _Widths(pdf.current_font["cw"]))
+    return name, widths
+
+
+def _fast_path(pdf):
+    # TrueType (unicode) fonts measure by code point; leave them to FPDF
+    return not pdf.unifontsubset
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _text_units(font, text):
+    """Width of `text` in font units (1/1000 of the font size)"""
+    return sum(map(_font_widths[font].__getitem__, text))
+
+
+def string_width(pdf, text):
+    """pdf.get_string_width(text), from the cached width table"""
+    if not _fast_path(pdf):
+        return pdf.get_string_width(text)
+    font, _ = _widths(pdf)
+    return _text_units(font, text) * pdf.font_size / 1000.0
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _wrap_words(font, font_size, text, max_width):
+    lines = []
+    current_line = []
+    current_width = 0
+    for word in text.split():
+        word_width = _text_units(font, word + " ") * font_size / 1000.0
+        if current_width + word_width <= max_width:
+            current_line.append(word)
+            current_width += word_width
+        else:
+            # A first word wider than the line leaves an empty first line
+            lines.append(" ".join(current_line))
+            current_line = [word]
+            current_width = word_width
+    if current_line:
+        lines.append(" ".join(current_line))
+    return tuple(lines)
+
+
+def wrap_words(pdf, text, max_width):
+    """
+    Greedy word wrap in the current font, as add_compact_field always did it:
+    a word fits if its width plus a trailing space fits.
+    """
+    if not _fast_path(pdf):
+        return _wrap_words_slow(pdf, text, max_width)
+    font, _ = _widths(pdf)
+    return _wrap_words(font, pdf.font_size, text, max_width)
+
+
+def _wrap_words_slow(pdf, text, max_width):
+    lines = []
+    current_line = []
+    current_width = 0
+    for word in text.split():
+        word_width = pdf.get_string_width(word + " ")
+        if current_width + word_width <= max_width:
+            current_line.append(word)
+            current_width += word_width
+        else:
+            lines.append(" ".join(current_line))
+            current_line = [word]
+            current_width = word_width
+    if current_line:
+        lines.append(" ".join(current_line))
+    return tuple(lines)
+
+
+# Word spacing changes made before a multi_cell line is drawn
+_RESET_SPACING = None  # set spacing back to 0 if it was on
+_KEEP_SPACING = False  # leave it alone
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _split_multi_cell(font, font_size, wmax, text, justify):
+    """
+    multi_cell's line breaks as (text, spacing) pairs; spacing is the word
+    spacing to switch on before the line, or one of the markers above.
+    """
+    widths = _font_widths[font]
+    s = text.replace("\r", "")
+    nb = len(s)
+    if nb > 0 and s[nb - 1] == "\n":
+        nb -= 1
+    # cumulative[k] is the width of s[:k]
+    cumulative = [0]
+    cumulative.extend(itertools.accumulate(map(widths.__getitem__, s[:nb])))
+
+    lines = []
+    j = 0
+    while j < nb:
+        # First character whose width takes the line past wmax
+        start = cumulative[j]
+        overflow = bisect.bisect_right(cumulative, wmax, lo=j + 1, key=lambda width: width - start) - 1
+        newline = s.find("\n", j, nb)
+        if newline != -1 and (overflow >= nb or newline <= overflow):
+            lines.append((s[j:newline], _RESET_SPACING))
+            j = newline + 1
+            continue
+        if overflow >= nb:
+            break
+        i = overflow
+        sep = s.rfind(" ", j, i + 1)
+        if sep == -1:
+            if i == j:
+                i += 1
+            lines.append((s[j:i], _RESET_SPACING))
+            j = i
+        else:
+            if justify:
+                spaces = s.count(" ", j, i + 1)
+                line_width = cumulative[sep] - cumulative[j]
+                spacing = (wmax - line_width) / 1000.0 * font_size / (spaces - 1) if spaces > 1 else 0
+            else:
+                spacing = _KEEP_SPACING
+            lines.append((s[j:sep], spacing))
+            j = sep + 1
+    lines.append((s[j:nb], _RESET_SPACING))
+    return tuple(lines)
+
+
+def multi_cell(pdf, w, h, txt="", border=0, align="J", fill=0):
+    """
+    Drop-in for pdf.multi_cell(); produces the same page content. Cells with
+    borders, auto width or TrueType fonts are passed through to FPDF.
+    """
+    if border or w == 0 or not _fast_path(pdf):
+        return pdf.multi_cell(w, h, txt, border=border, align=align, fill=fill)
+
+    txt = pdf.normalize_text(txt)
+    font, _ = _widths(pdf)
+    wmax = (w - 2 * pdf.c_margin) * 1000.0 / pdf.font_size
+    for line, spacing in _split_multi_cell(font, pdf.font_size, wmax, txt, align == "J"):
+        if spacing is _RESET_SPACING:
+            if pdf.ws > 0:
+                pdf.ws = 0
+                pdf._out("0 Tw")
+        elif spacing is not _KEEP_SPACING:
+            pdf.ws = spacing
+            pdf._out(sprintf("%.3f Tw", spacing * pdf.k))
+        pdf.cell(w, h, line, 0, 2, align, fill)
+    pdf.x = pdf.l_margin
@@ -5,12 +5,15 @@ import logging
 import os
 from datetime import datetime
 import requests
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
 import json
 
 # Import the main processing function from app.py
-from app import process_new_matrimonial_registration, fetch_data_from_google_sheets, logger
+from app import process_new_matrimonial_registration, fetch_data_from_google_sheets, logger, sheets_cache_stats, data_backend
+from scoring import field_score_cache_stats
+from google_api_gateway import google_api_stats
+from schema_registry import schema_stats
+from bulk_reprocess import BulkReprocessJob
+from render_pool import get_render_pool, render_pool_stats
 
 app = Flask(__name__)
 
@@ -28,27 +31,13 @@ processing_status = {
     "current_submission_count": 0
 }
 
+# Bulk reprocessing jobs started through /reprocess, by job id
+bulk_jobs = {}
+
 def get_form_submissions_count():
     """Get the current number of form submissions"""
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, 
-            scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"]
-        )
-        
-        service = build("sheets", "v4", credentials=credentials)
-        sheet = service.spreadsheets()
-        
-        # Get the form responses
-        result = sheet.values().get(
-            spreadsheetId=SPREADSHEET_ID, 
-            range="'Form Responses 1'!A:A"
-        ).execute()
-        
-        values = result.get("values", [])
-        # Subtract 1 for header row, return 0 if no data
-        return max(0, len(values) - 1) if values else 0
-        
+        return data_backend.count_responses()
     except Exception as e:
         logger.error(f"Error getting form submissions count: {e}")
         return 0
@@ -66,7 +55,7 @@ def check_for_new_submissions():
             logger.info(f"New form submission detected! Previous: {processing_status['last_submission_count']}, Current: {current_count}")
             
             # Process the new submission
-            success = process_new_matrimonial_registration()
+            success = process_new_matrimonial_registration(submission_count=current_count)
             
             if success:
                 processing_status["last_processed"] = datetime.now().isoformat()
@@ -120,6 +109,13 @@ def webhook_handler():
             form_id = data.get('formId', '')
             response_id = data.get('responseId', '')
             create_time = data.get('createTime', '')
+            # The sheet row is found by the respondent's email and the submission time in the sheet's time zone
+            submission = data.get('submissionData') or {}
+            answers = submission.get('responses') or {}
+            email = data.get('respondentEmail') or next(
+                (answer for question, answer in answers.items() if 'email' in question.lower() and isinstance(answer, str)), None
+            )
+            submitted_at = data.get('sheetTimestamp')
             
             logger.info(f"Form submission detected - Form ID: {form_id}, Response ID: {response_id}")
             
@@ -127,7 +123,9 @@ def webhook_handler():
             def process_async():
                 try:
                     processing_status["is_processing"] = True
-                    success = process_new_matrimonial_registration()
+                    success = process_new_matrimonial_registration(
+                        response_id=response_id or None, email=email, submitted_at=submitted_at
+                    )
                     if success:
                         processing_status["last_processed"] = datetime.now().isoformat()
                         logger.info("Successfully processed webhook-triggered submission")
@@ -167,7 +165,13 @@ def get_status():
             "last_processed": processing_status["last_processed"],
             "last_submission_count": processing_status["last_submission_count"],
             "current_submission_count": current_count,
-            "new_submissions": current_count - processing_status["last_submission_count"]
+            "new_submissions": current_count - processing_status["last_submission_count"],
+            "data_backend": data_backend.name,
+            "scoring_cache": field_score_cache_stats(),
+            "sheets_cache": sheets_cache_stats(),
+            "google_api": google_api_stats(),
+            "schema": schema_stats(),
+            "render_pool": render_pool_stats()
         }), 200
     except Exception as e:
         logger.error(f"Error getting status: {e}")
@@ -211,6 +215,60 @@ def manual_trigger():
         logger.error(f"Error in manual trigger: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/reprocess', methods=['POST'])
+def start_bulk_reprocess():
+    """
+    Re-send matches to a list of users or to everyone who submitted in a date
+    range. Body: {"emails": [...]} or {"since": "YYYY-MM-DD", "until": "YYYY-MM-DD"},
+    optionally with "job_id"; {"job_id": ...} alone resumes an interrupted job.
+    """
+    try:
+        # Always authenticated: a job can mail the whole user base
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or auth_header != f"Bearer {WEBHOOK_SECRET}":
+            logger.warning("Unauthorized reprocess request")
+            return jsonify({"error": "Unauthorized"}), 401
+
+        data = request.get_json(silent=True) or {}
+        emails = data.get("emails")
+        if not emails and not (data.get("since") or data.get("until")) and not data.get("job_id"):
+            return jsonify({"error": "Provide emails, a since/until range or a job_id"}), 400
+
+        job_id = data.get("job_id")
+        if job_id in bulk_jobs and bulk_jobs[job_id].state == "running":
+            return jsonify({"error": f"Job {job_id} is already running"}), 409
+
+        if data.get("pdf_mode") not in (None, "separate", "combined"):
+            return jsonify({"error": "pdf_mode must be 'separate' or 'combined'"}), 400
+
+        try:
+            job = BulkReprocessJob(emails=emails, since=data.get("since"), until=data.get("until"), job_id=job_id,
+                                   pdf_mode=data.get("pdf_mode"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        bulk_jobs[job.job_id] = job
+        thread = threading.Thread(target=job.run)
+        thread.daemon = True
+        thread.start()
+
+        return jsonify({
+            "status": "success",
+            "job_id": job.job_id,
+            "progress_url": f"/reprocess/{job.job_id}"
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Error starting bulk reprocess: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/reprocess/<job_id>', methods=['GET'])
+def bulk_reprocess_progress(job_id):
+    """Live progress, throughput and failures of a bulk reprocessing job"""
+    job = bulk_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.progress()), 200
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -230,6 +288,7 @@ def home():
             "webhook": "/webhook (POST) - Handle form submission webhooks",
             "status": "/status (GET) - Get processing status",
             "trigger": "/trigger (POST) - Manually trigger processing",
+            "reprocess": "/reprocess (POST) - Re-send matches to many users; /reprocess/<job_id> (GET) - Progress",
             "health": "/health (GET) - Health check"
         },
         "form_id": GOOGLE_FORM_ID,
@@ -249,6 +308,9 @@ def initialize_processing():
 if __name__ == '__main__':
     # Initialize processing status
     initialize_processing()
+
+    # Start warming the render workers in the background; submissions render inline until they are ready
+    get_render_pool(wait=False)
     
     # Start periodic checking in background thread
     periodic_thread = threading.Thread(target=periodic_check)